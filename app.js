@@ -219,30 +219,82 @@ const App = {
   async loadSnapshots() {
       this.renderPlaceholder('Načítavam dostupné snapshoty...');
       try {
-        const res = await fetch(
-          `https://api.github.com/repos/${this.config.owner}/${this.config.repo}/contents/snapshots?ref=${this.config.branch}`
-        );
-        if (!res.ok) throw new Error(`GitHub API Error: ${res.statusText}`);
-        const files = await res.json();
+        // current.json ukazuje na nemennú verziu snapshotu (v/<id>/) – revaliduje sa len on,
+        // party sa dajú kešovať natrvalo; bez neho staré ploché rozloženie:
+        // manifest.json má party v správnom poradí – GitHub API je len záloha
+        let files = null;
+        let pointer = null;
+        try {
+          const cRes = await fetch(this.utils.baseStaticUrl() + 'current.json', { cache: 'no-cache' });
+          if (cRes.ok) {
+            pointer = await cRes.json();
+            if (pointer && pointer.path && Array.isArray(pointer.parts) && pointer.parts.length) {
+              const versionUrl = this.utils.baseStaticUrl() + pointer.path;
+              files = pointer.parts.map(name => ({ name, url: versionUrl + name }));
+            } else {
+              pointer = null;
+            }
+          }
+        } catch (e) {
+          pointer = null;
+        }
+        if (!files) {
+          try {
+            const mRes = await fetch(this.utils.baseStaticUrl() + 'manifest.json', { cache: 'no-cache' });
+            if (mRes.ok) {
+              const manifest = await mRes.json();
+              if (Array.isArray(manifest.parts) && manifest.parts.length) {
+                files = manifest.parts.map(p => ({ name: p.name }));
+              }
+            }
+          } catch (e) {
+            files = null;
+          }
+        }
+        if (!files) {
+          const res = await fetch(
+            `https://api.github.com/repos/${this.config.owner}/${this.config.repo}/contents/snapshots?ref=${this.config.branch}`
+          );
+          if (!res.ok) throw new Error(`GitHub API Error: ${res.statusText}`);
+          files = await res.json();
+        }
 
         // Získaj všetky CSV part súbory (bez skupinovania podľa dátumu)
         const partFiles = files
           .filter(f => f.name.endsWith('.csv.gz'))
-          .map(f => ({ name: f.name }))
+          .map(f => ({ name: f.name, url: f.url }))
           .sort((a, b) => {
-            const ma = a.name.match(/part(\d+)\.csv\.gz$/);
-            const mb = b.name.match(/part(\d+)\.csv\.gz$/);
-            if (ma && mb) return Number(ma[1]) - Number(mb[1]);
+            // firms_partNN.csv.gz alebo firms_<obdobie>_partNN.csv.gz (delenie podľa obdobia),
+            // obdobia od najnovšieho, "undated" na koniec
+            const re = /(?:_(\d{4}(?:-\d{2})?|undated))?_part(\d+)\.csv\.gz$/;
+            const ma = a.name.match(re);
+            const mb = b.name.match(re);
+            if (ma && mb) {
+              const pa = ma[1] || '';
+              const pb = mb[1] || '';
+              if (pa !== pb) {
+                if (pa === 'undated') return 1;
+                if (pb === 'undated') return -1;
+                return pb.localeCompare(pa);
+              }
+              return Number(ma[2]) - Number(mb[2]);
+            }
             return a.name.localeCompare(b.name, 'sk-SK');
           });
 
         if (!partFiles.length) throw new Error('Nenašli sa žiadne snapshoty.');
 
         // Načítaj last_updated.txt a nastav referenčný dátum + badge
+        // (pri verzii z current.json je dátum priamo v ňom)
         try {
-          const duRes = await fetch(this.utils.baseStaticUrl() + 'last_updated.txt');
-          if (duRes.ok) {
-            const txt = (await duRes.text()).trim();
+          let txt = null;
+          if (pointer && pointer.updated) {
+            txt = pointer.updated;
+          } else {
+            const duRes = await fetch(this.utils.baseStaticUrl() + 'last_updated.txt');
+            if (duRes.ok) txt = (await duRes.text()).trim();
+          }
+          if (txt !== null) {
             this.state.currentDate = txt || null;
             if (this.elements.lastUpdatedBox) {
               const display = this.utils.formatDmyForDisplay(txt);
@@ -292,7 +344,7 @@ const App = {
   
       for (let i = 0; i < files.length; i++) {
         const f = files[i];
-        const url = this.utils.baseStaticUrl() + f.name;
+        const url = f.url || this.utils.baseStaticUrl() + f.name;
   
         if (i > 0) {
           this.setHeaderStatus(`
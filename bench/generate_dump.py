@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Generátor syntetického pg_dump (plain text, gzip) s tabuľkami, ktoré číta
+sync_rpo_full.py:
+
+  rpo.organizations
+  rpo.organization_name_entries
+  rpo.organization_address_entries
+  rpo.organization_identifier_entries
+
+Dáta sú náhodné, ale "realistické": história záznamov (effective_from/to),
+\\N hodnoty, obce z data/obce.csv (aj tvar "Bratislava - mestská časť ..."
+a neznáme mestá), občas COPY escape sekvencie v názvoch. Okrem toho pribalí
+pár nesúvisiacich tabuliek, ktoré parser musí preskočiť.
+
+S --format custom vznikne namiesto toho archív vo formáte pg_dump -Fc
+(hlavička, TOC s offsetmi, zlib bloky dát) s rovnakými dátami; --no-offsets
+napodobní pg_dump zapisujúci do rúry (offsety v TOC chýbajú).
+
+Použitie:
+  python bench/generate_dump.py --orgs 100000 --out /tmp/rpo_100k.sql.gz
+  python bench/generate_dump.py --orgs 1000 --out /tmp/x.sql.gz --orgs-first
+  python bench/generate_dump.py --orgs 1000 --out /tmp/x.dump --format custom
+"""
+import argparse
+import csv
+import gzip
+import random
+import sys
+import zlib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+OBCE_CSV_PATH = ROOT / "data" / "obce.csv"
+
+NULL = r"\N"
+
+ORG_COLUMNS = [
+    "id", "ico", "established_on", "terminated_on", "actualized_at",
+    "created_at", "updated_at", "source_register", "registration_office_id",
+    "registration_number", "main_activity_code_id", "legal_form_id",
+]
+NAME_COLUMNS = [
+    "id", "organization_id", "name", "effective_from", "effective_to",
+    "created_at", "updated_at",
+]
+ADDRESS_COLUMNS = [
+    "id", "organization_id", "street", "reg_number", "building_number",
+    "postal_code", "municipality", "country_id", "effective_from", "effective_to",
+    "created_at", "updated_at",
+]
+IDENTIFIER_COLUMNS = [
+    "id", "organization_id", "ipo", "effective_from", "effective_to",
+    "created_at", "updated_at",
+]
+
+REGISTERS = [
+    ("Živnostenský register", 55),
+    ("Obchodný register", 30),
+    ("Register mimovládnych neziskových organizácií", 6),
+    ("Register právnických osôb", 5),
+    (None, 4),
+]
+LEGAL_SUFFIXES = ["s. r. o.", "a. s.", "k. s.", "v. o. s.", "", "o. z.", "n. o."]
+NAME_WORDS = [
+    "Agro", "Tech", "Stav", "Trans", "Servis", "Consulting", "Invest", "Real",
+    "Slovakia", "Danubia", "Tatra", "Metal", "Drevo", "Zdravie", "Energia",
+    "Dizajn", "Data", "Logistik", "Gastro", "Bau", "Group", "Holding",
+]
+FIRST_NAMES = ["Ján", "Peter", "Mária", "Jana", "Martin", "Zuzana", "Tomáš", "Eva", "Ľubomír", "Šimon"]
+LAST_NAMES = ["Novák", "Kováč", "Horváth", "Varga", "Tóth", "Nagy", "Baláž", "Szabó", "Molnár", "Čierna"]
+STREETS = ["Hlavná", "Štúrova", "Mierová", "Záhradná", "SNP", "Hviezdoslavova", "Nová", "Školská"]
+UNKNOWN_CITIES = ["Wien", "Praha", "Budapest", "Neznáma obec", "Brno"]
+
+
+def load_municipalities():
+    names = []
+    with OBCE_CSV_PATH.open("r", encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter=";"):
+            if row and row[0].strip():
+                names.append(row[0].strip())
+    return names
+
+
+def copy_escape(s: str) -> str:
+    return (
+        s.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def field(v) -> str:
+    return NULL if v is None else copy_escape(v)
+
+
+class Gen:
+    """Deterministické náhodné hodnoty; každá tabuľka má vlastný RNG odvodený zo seedu."""
+
+    def __init__(self, seed: int, table: str):
+        self.r = random.Random(f"{seed}:{table}")
+
+    def date(self, y0=1990, y1=2026):
+        r = self.r
+        return f"{r.randint(y0, y1):04d}-{r.randint(1, 12):02d}-{r.randint(1, 28):02d}"
+
+    def ts(self, y0=2015, y1=2026):
+        r = self.r
+        return (
+            f"{self.date(y0, y1)} {r.randint(0, 23):02d}:{r.randint(0, 59):02d}:"
+            f"{r.randint(0, 59):02d}.{r.randint(0, 999999):06d}"
+        )
+
+    def maybe(self, p, v):
+        return v if self.r.random() < p else None
+
+
+def org_profile(seed: int, org_id: int):
+    """Vlastnosti organizácie, ktoré musia sedieť medzi tabuľkami (počet záznamov histórie)."""
+    r = random.Random(seed * 1_000_003 + org_id)
+    return {
+        "has_name": r.random() > 0.02,
+        "has_address": r.random() > 0.03,
+        "has_ico": r.random() > 0.04,
+        "name_hist": 1 + (r.random() < 0.25) + (r.random() < 0.08),
+        "addr_hist": 1 + (r.random() < 0.35) + (r.random() < 0.12) + (r.random() < 0.05),
+        "ico_hist": 1 + (r.random() < 0.02),
+    }
+
+
+def company_name(g: Gen, org_id: int) -> str:
+    r = g.r
+    if r.random() < 0.45:
+        base = f"{r.choice(FIRST_NAMES)} {r.choice(LAST_NAMES)}"
+    else:
+        base = "".join(r.sample(NAME_WORDS, r.randint(1, 2)))
+        if r.random() < 0.3:
+            base += f" {r.choice(NAME_WORDS)}"
+    suffix = r.choice(LEGAL_SUFFIXES)
+    name = f"{base} {suffix}".strip()
+    if r.random() < 0.002:
+        # COPY escape sekvencie (tab / backslash / nový riadok v názve)
+        name = name.replace(" ", "\t", 1) if r.random() < 0.5 else name + " \\ " + str(org_id)
+    return name
+
+
+def write_copy(out, table, columns, rows):
+    out.write(f"COPY rpo.{table} ({', '.join(columns)}) FROM stdin;\n")
+    n = 0
+    for row in rows:
+        out.write("\t".join(row))
+        out.write("\n")
+        n += 1
+    out.write("\\.\n\n\n")
+    return n
+
+
+def gen_organizations(seed, orgs):
+    g = Gen(seed, "organizations")
+    r = g.r
+    registers = [v for v, _ in REGISTERS]
+    weights = [w for _, w in REGISTERS]
+    for org_id in range(1, orgs + 1):
+        created = g.ts(2015, 2026)
+        established = g.maybe(0.97, g.date())
+        yield [
+            str(org_id),
+            NULL,
+            field(established),
+            field(g.maybe(0.18, g.date(2000))),
+            field(g.maybe(0.7, g.ts())),
+            created,
+            field(g.maybe(0.9, g.ts())),
+            field(r.choices(registers, weights)[0]),
+            str(r.randint(1, 60)),
+            f"{r.randint(1000, 999999)}/{r.choice('BCLNRST')}",
+            field(g.maybe(0.6, str(r.randint(1, 900)))),
+            str(r.randint(100, 999)),
+        ]
+
+
+def gen_entries(seed, orgs, table, hist_key, has_key, make_row):
+    g = Gen(seed, table)
+    entry_id = 0
+    for org_id in range(1, orgs + 1):
+        prof = org_profile(seed, org_id)
+        if not prof[has_key]:
+            continue
+        n = prof[hist_key]
+        # história: staršie záznamy majú effective_to, posledný je otvorený (občas aj ten uzavretý)
+        starts = sorted(g.date() for _ in range(n))
+        for i, start in enumerate(starts):
+            entry_id += 1
+            if i + 1 < n:
+                end = starts[i + 1]
+            else:
+                end = g.maybe(0.03, g.date(2020))
+            yield make_row(g, entry_id, org_id, g.maybe(0.97, start), end, i)
+
+
+def name_row(g, entry_id, org_id, eff_from, eff_to, i):
+    return [
+        str(entry_id), str(org_id), field(g.maybe(0.995, company_name(g, org_id))),
+        field(eff_from), field(eff_to), g.ts(), field(g.maybe(0.8, g.ts())),
+    ]
+
+
+def make_address_row(municipalities):
+    def address_row(g, entry_id, org_id, eff_from, eff_to, i):
+        r = g.r
+        p = r.random()
+        if p < 0.08:
+            city = f"Bratislava - mestská časť {r.choice(['Petržalka', 'Ružinov', 'Staré Mesto', 'Rača', 'Dúbravka'])}"
+        elif p < 0.11:
+            city = f"Košice - mestská časť {r.choice(['Staré Mesto', 'Sever', 'Juh', 'Západ'])}"
+        elif p < 0.115:
+            city = r.choice(UNKNOWN_CITIES)
+        else:
+            city = r.choice(municipalities)
+        return [
+            str(entry_id), str(org_id),
+            field(g.maybe(0.85, r.choice(STREETS))),
+            field(g.maybe(0.7, str(r.randint(1, 5000)))),
+            field(g.maybe(0.9, str(r.randint(1, 120)))),
+            field(g.maybe(0.95, f"{r.randint(80000, 99999)}")),
+            field(g.maybe(0.98, city)),
+            "703",
+            field(eff_from), field(eff_to), g.ts(), field(g.maybe(0.8, g.ts())),
+        ]
+    return address_row
+
+
+def identifier_row(g, entry_id, org_id, eff_from, eff_to, i):
+    return [
+        str(entry_id), str(org_id), field(g.maybe(0.99, f"{g.r.randint(0, 99_999_999):08d}")),
+        field(eff_from), field(eff_to), g.ts(), field(g.maybe(0.8, g.ts())),
+    ]
+
+
+def sections(seed: int, orgs: int, orgs_first: bool):
+    municipalities = load_municipalities()
+    entries = [
+        ("organization_name_entries", NAME_COLUMNS,
+         gen_entries(seed, orgs, "organization_name_entries", "name_hist", "has_name", name_row)),
+        ("organization_address_entries", ADDRESS_COLUMNS,
+         gen_entries(seed, orgs, "organization_address_entries", "addr_hist", "has_address",
+                     make_address_row(municipalities))),
+        ("organization_identifier_entries", IDENTIFIER_COLUMNS,
+         gen_entries(seed, orgs, "organization_identifier_entries", "ico_hist", "has_ico",
+                     identifier_row)),
+    ]
+    organizations = ("organizations", ORG_COLUMNS, gen_organizations(seed, orgs))
+    noise = [
+        ("legal_forms", ["id", "name"], ([str(i), f"Forma {i}"] for i in range(1, 50))),
+        ("organization_activity_entries", ["id", "organization_id", "description"],
+         ([str(i), str(i), field(f"Činnosť\t{i}")] for i in range(1, min(orgs, 50_000) + 1))),
+    ]
+    ordered = [organizations] + entries if orgs_first else entries + [organizations]
+    return [noise[0]] + ordered[:2] + [noise[1]] + ordered[2:]
+
+
+def write_plain_dump(out_path: Path, orgs: int, seed: int = 1, orgs_first: bool = False, level: int = 6):
+    counts = {}
+    with gzip.open(out_path, "wt", encoding="utf-8", newline="", compresslevel=level) as out:
+        out.write("--\n-- PostgreSQL database dump (synthetic)\n--\n\n")
+        out.write("SET statement_timeout = 0;\nSET client_encoding = 'UTF8';\n\n")
+        for table, columns, rows in sections(seed, orgs, orgs_first):
+            counts[table] = write_copy(out, table, columns, rows)
+        out.write("--\n-- PostgreSQL database dump complete\n--\n")
+    return counts
+
+
+# --------- pg_dump custom formát (-Fc) ---------
+
+ARCHIVE_VERSIONS = {"1.14": (1, 14, 0), "1.15": (1, 15, 0), "1.16": (1, 16, 0)}
+INT_SIZE = 4
+OFF_SIZE = 8
+K_OFFSET_POS_NOT_SET, K_OFFSET_POS_SET, K_OFFSET_NO_DATA = 1, 2, 3
+BLK_DATA = 1
+SECTION_PRE_DATA, SECTION_DATA = 1, 2
+DATA_CHUNK = 64 * 1024
+
+
+def _int(v: int) -> bytes:
+    return bytes([1 if v < 0 else 0]) + abs(v).to_bytes(INT_SIZE, "little")
+
+
+def _str(v) -> bytes:
+    if v is None:
+        return _int(-1)
+    b = v.encode("utf-8")
+    return _int(len(b)) + b
+
+
+def _toc_entry(version, e, offset) -> bytes:
+    out = bytearray()
+    out += _int(e["dump_id"]) + _int(1 if e["data"] is not None else 0)
+    out += _str(str(e["dump_id"] + 16000)) + _str(str(e["dump_id"] + 20000))
+    out += _str(e["tag"]) + _str(e["desc"]) + _int(e["section"])
+    out += _str(e["defn"]) + _str(e["drop"]) + _str(e["copy"])
+    out += _str(e["namespace"]) + _str("") 
+    if version >= (1, 14, 0):
+        out += _str("heap" if e["desc"] == "TABLE" else "")
+    if version >= (1, 16, 0):
+        out += _int(ord("r") if e["desc"] in ("TABLE", "TABLE DATA") else 0)
+    out += _str("rpo_owner") + _str("false")
+    for dep in e["deps"]:
+        out += _str(str(dep))
+    out += _str(None)
+    if e["data"] is None:
+        out += bytes([K_OFFSET_NO_DATA]) + bytes(OFF_SIZE)
+    elif offset is None:
+        out += bytes([K_OFFSET_POS_NOT_SET]) + bytes(OFF_SIZE)
+    else:
+        out += bytes([K_OFFSET_POS_SET]) + offset.to_bytes(OFF_SIZE, "little")
+    return bytes(out)
+
+
+def _write_data_block(out, dump_id: int, rows, level: int) -> int:
+    """Blok dát tabuľky: typ, dumpId, chunky (int dĺžka + bajty) a 0; vráti počet riadkov."""
+    out.write(bytes([BLK_DATA]) + _int(dump_id))
+    deflater = zlib.compressobj(level) if level else None
+
+    def emit(data: bytes):
+        if deflater is not None:
+            data = deflater.compress(data)
+        if data:
+            out.write(_int(len(data)) + data)
+
+    n = 0
+    buf = []
+    size = 0
+    for row in rows:
+        line = "\t".join(row) + "\n"
+        buf.append(line)
+        size += len(line)
+        n += 1
+        if size >= DATA_CHUNK:
+            emit("".join(buf).encode("utf-8"))
+            buf, size = [], 0
+    if buf:
+        emit("".join(buf).encode("utf-8"))
+    if deflater is not None:
+        tail = deflater.flush()
+        if tail:
+            out.write(_int(len(tail)) + tail)
+    out.write(_int(0))
+    return n
+
+
+def write_custom_dump(
+    out_path: Path, orgs: int, seed: int = 1, orgs_first: bool = False, level: int = 6,
+    offsets: bool = True, version: str = "1.14",
+):
+    """
+    Zapíše tie isté tabuľky ako write_plain_dump vo formáte pg_dump -Fc:
+    hlavička, TOC (SCHEMA, TABLE a TABLE DATA položky), potom dátové bloky.
+    TOC sa po zápise dát prepíše so skutočnými offsetmi (ako pg_dump do súboru);
+    s offsets=False ostanú nenastavené (ako pg_dump do rúry).
+    """
+    ver = ARCHIVE_VERSIONS[version]
+    entries = [{
+        "dump_id": 1, "tag": "rpo", "desc": "SCHEMA", "section": SECTION_PRE_DATA,
+        "defn": "CREATE SCHEMA rpo;\n", "drop": "DROP SCHEMA rpo;\n", "copy": None,
+        "namespace": "", "deps": [], "data": None,
+    }]
+    data_entries = []
+    for table, columns, rows in sections(seed, orgs, orgs_first):
+        table_id = len(entries) + 1
+        entries.append({
+            "dump_id": table_id, "tag": table, "desc": "TABLE", "section": SECTION_PRE_DATA,
+            "defn": f"CREATE TABLE rpo.{table} ({', '.join(c + ' text' for c in columns)});\n",
+            "drop": f"DROP TABLE rpo.{table};\n", "copy": None,
+            "namespace": "rpo", "deps": [1], "data": None,
+        })
+        data_entries.append({
+            "dump_id": None, "tag": table, "desc": "TABLE DATA", "section": SECTION_DATA,
+            "defn": "", "drop": "", "copy": f"COPY rpo.{table} ({', '.join(columns)}) FROM stdin;\n",
+            "namespace": "rpo", "deps": [table_id], "data": rows,
+        })
+    for e in data_entries:
+        e["dump_id"] = len(entries) + 1
+        entries.append(e)
+
+    header = bytearray(b"PGDMP")
+    header += bytes(ver) + bytes([INT_SIZE, OFF_SIZE, 1])
+    if ver >= (1, 15, 0):
+        header += bytes([1 if level else 0])
+    else:
+        header += _int(level)
+    for v in (0, 0, 12, 1, 0, 126, 0):  # 1.1.2026 12:00:00
+        header += _int(v)
+    header += _str("rpo") + _str("16.4") + _str("16.4 (synthetic)")
+
+    counts = {}
+    data_offsets = {}
+    with out_path.open("wb") as out:
+        out.write(header)
+        toc_pos = out.tell()
+        toc = _int(len(entries)) + b"".join(_toc_entry(ver, e, None) for e in entries)
+        out.write(toc)
+        for e in data_entries:
+            data_offsets[e["dump_id"]] = out.tell()
+            counts[e["tag"]] = _write_data_block(out, e["dump_id"], e["data"], level)
+        if offsets:
+            # dĺžka TOC sa nemení (offset má vždy OFF_SIZE bajtov)
+            out.seek(toc_pos)
+            out.write(_int(len(entries)) + b"".join(
+                _toc_entry(ver, e, data_offsets.get(e["dump_id"])) for e in entries
+            ))
+    return counts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Syntetický RPO pg_dump pre benchmarky")
+    ap.add_argument("--orgs", type=int, default=100_000, help="počet organizácií")
+    ap.add_argument("--out", type=Path, required=True, help="výstupný .sql.gz")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--orgs-first", action="store_true",
+                    help="sekcia rpo.organizations pred entry tabuľkami")
+    ap.add_argument("--level", type=int, default=6, help="úroveň gzip / zlib kompresie (0 = bez)")
+    ap.add_argument("--format", choices=("plain", "custom"), default="plain",
+                    help="plain SQL (gzip) alebo pg_dump custom archív (-Fc)")
+    ap.add_argument("--no-offsets", action="store_true",
+                    help="custom archív bez offsetov dát v TOC (ako pg_dump do rúry)")
+    ap.add_argument("--archive-version", choices=sorted(ARCHIVE_VERSIONS), default="1.14",
+                    help="verzia formátu custom archívu")
+    args = ap.parse_args(argv)
+
+    print(f"🧪 Generujem {args.orgs} organizácií do {args.out} ({args.format}) ...")
+    if args.format == "custom":
+        counts = write_custom_dump(
+            args.out, args.orgs, args.seed, args.orgs_first, args.level,
+            offsets=not args.no_offsets, version=args.archive_version,
+        )
+    else:
+        counts = write_plain_dump(args.out, args.orgs, args.seed, args.orgs_first, args.level)
+    for table, n in counts.items():
+        print(f"  rpo.{table}: {n} riadkov")
+    print(f"✅ Hotovo ({args.out.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Benchmark jednotlivých fáz sync_rpo_full.py na syntetických dumpoch
+(bench/generate_dump.py) – bez sťahovania reálneho dumpu z RPO_DUMP_URL.
+
+Každá fáza beží v samostatnom procese, aby peak RSS patril len jej
+(plus príprave vstupov, ktorá sa nemeria do času – viď setup_rss_mb).
+
+Fázy:
+  city_index    načítanie data/obce.csv do CityRegionIndex (studená cache)
+  decompress    gunzip + iterácia riadkov dumpu
+  names         rpo.organization_name_entries -> mapa
+  addresses     rpo.organization_address_entries -> mapa
+  identifiers   rpo.organization_identifier_entries -> mapa
+  copy_decode   CopyRowDecoder nad riadkami entry tabuliek (riadky sú príprava);
+                baseline_wall_s = pôvodné split na tab + NULL -> None na tých istých riadkoch
+  organizations join rpo.organizations s mapami (mapy sú príprava)
+  write         triedenie + zápis partov (riadky sú príprava)
+  single_pass   celý beh parse_dump_single_pass
+
+Použitie:
+  python bench/run_benchmarks.py                       # 100k, 1M, 10M
+  python bench/run_benchmarks.py --sizes 100k --phases names,single_pass
+  python bench/run_benchmarks.py --sizes 100k --out new.json --compare old.json
+
+S --compare skončí s kódom 1, ak niektorá fáza spomalila (rows/s) o viac
+ako --tolerance oproti predchádzajúcemu výsledku.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+PHASES = [
+    "city_index", "decompress", "names", "addresses", "identifiers", "copy_decode",
+    "organizations", "write", "single_pass",
+]
+ENTRY_PHASES = {
+    "names": "organization_name_entries",
+    "addresses": "organization_address_entries",
+    "identifiers": "organization_identifier_entries",
+}
+
+
+def parse_size(s: str) -> int:
+    s = s.strip().lower().replace("_", "")
+    mult = 1
+    if s.endswith("k"):
+        mult, s = 1_000, s[:-1]
+    elif s.endswith("m"):
+        mult, s = 1_000_000, s[:-1]
+    return int(float(s) * mult)
+
+
+def size_label(n: int) -> str:
+    if n % 1_000_000 == 0:
+        return f"{n // 1_000_000}M"
+    if n % 1_000 == 0:
+        return f"{n // 1_000}k"
+    return str(n)
+
+
+def _peak_rss_mb() -> float:
+    # Linux: ru_maxrss je v kB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _cpu_s() -> float:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    ru_c = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime + ru_c.ru_utime + ru_c.ru_stime
+
+
+def ensure_dump(dump_dir: Path, orgs: int, seed: int, orgs_first: bool):
+    """Vygeneruje dump (ak ešte nie je v cache) a vráti (cesta, počty riadkov)."""
+    from generate_dump import write_plain_dump
+
+    stem = f"rpo_{size_label(orgs)}_s{seed}{'_of' if orgs_first else ''}"
+    dump_path = dump_dir / f"{stem}.sql.gz"
+    counts_path = dump_dir / f"{stem}.counts.json"
+    if dump_path.exists() and counts_path.exists():
+        return dump_path, json.loads(counts_path.read_text(encoding="utf-8"))
+
+    dump_dir.mkdir(parents=True, exist_ok=True)
+    print(f"🧪 Generujem syntetický dump {dump_path.name} ...", flush=True)
+    t0 = time.perf_counter()
+    tmp = dump_path.with_suffix(".tmp")
+    counts = write_plain_dump(tmp, orgs, seed, orgs_first, level=1)
+    tmp.replace(dump_path)
+    counts_path.write_text(json.dumps(counts), encoding="utf-8")
+    print(f"✅ {dump_path.name}: {dump_path.stat().st_size / 1e6:.1f} MB za {time.perf_counter() - t0:.1f} s")
+    return dump_path, counts
+
+
+# --------- fázy (bežia v child procese) ---------
+
+def _phase_inputs(phase: str, counts):
+    """Počet vstupných COPY riadkov, z ktorých sa počíta rows/s."""
+    if phase in ENTRY_PHASES:
+        return counts.get(ENTRY_PHASES[phase], 0)
+    if phase == "copy_decode":
+        return sum(counts.get(t, 0) for t in ENTRY_PHASES.values())
+    if phase in ("organizations", "write"):
+        return counts.get("organizations", 0)
+    if phase == "single_pass":
+        return counts.get("organizations", 0) + sum(counts.get(t, 0) for t in ENTRY_PHASES.values())
+    return 0
+
+
+class _SectionLines:
+    """Handler pre scan_dump, ktorý si len odloží hlavičku a riadky sekcie."""
+
+    def __init__(self):
+        self.col_order = None
+        self.lines = []
+
+    def start(self, col_order):
+        self.col_order = col_order
+
+    def feed(self, line):
+        self.lines.append(line)
+
+    def finish(self):
+        pass
+
+    def flush(self):
+        pass
+
+
+def _baseline_split(lines, indexes):
+    # pôvodné parsovanie entry tabuliek (pred CopyRowDecoder)
+    for line in lines:
+        parts = [None if p == r"\N" else p for p in line.split("\t")]
+        tuple(parts[i] for i in indexes)
+
+
+def run_phase(phase: str, dump_path: Path, work_dir: Path, counts, workers: int):
+    import sync_rpo_full as s
+
+    # výstupy aj cache idú do pracovného adresára, nie do snapshots/
+    s.SNAP_DIR = work_dir / "snapshots"
+    s.SNAP_DIR.mkdir(parents=True, exist_ok=True)
+    s.CACHE_DIR = work_dir / "cache"
+
+    # --- príprava (nemeria sa do času) ---
+    crm = None
+    maps = None
+    rows = None
+    if phase in ("organizations", "write", "single_pass"):
+        crm = s.load_city_region_map()
+    if phase in ("organizations", "write"):
+        maps = (
+            s.parse_names_map(dump_path),
+            s.parse_address_map(dump_path),
+            s.parse_identifier_map(dump_path),
+        )
+    sections = None
+    if phase == "copy_decode":
+        sections = {t: _SectionLines() for t in ENTRY_PHASES.values()}
+        s.scan_dump_file(dump_path, sections)
+    if phase == "write":
+        orgs = s.OrganizationsHandler(*maps, crm)
+        with s.open_dump_lines(dump_path) as gz:
+            s.scan_dump(gz, {"organizations": orgs})
+        rows = orgs.rows
+    setup_rss = _peak_rss_mb()
+
+    # --- meraná časť ---
+    result = {"rows": _phase_inputs(phase, counts)}
+    cpu0 = _cpu_s()
+    t0 = time.perf_counter()
+    if phase == "city_index":
+        index = s.load_city_region_map()
+        result["rows"] = len(index.records)
+    elif phase == "decompress":
+        n = 0
+        size = 0
+        with s.open_dump_lines(dump_path) as gz:
+            for line in gz:
+                n += 1
+                size += len(line)
+        result["rows"] = n
+        result["bytes"] = size
+    elif phase in ENTRY_PHASES:
+        m = s._parse_entry_map(dump_path, ENTRY_PHASES[phase])
+        result["out_rows"] = len(m)
+    elif phase == "copy_decode":
+        for table, sec in sections.items():
+            decode = s._entry_decoder(table, sec.col_order).decode
+            for line in sec.lines:
+                decode(line)
+    elif phase == "organizations":
+        orgs = s.OrganizationsHandler(*maps, crm)
+        with s.open_dump_lines(dump_path) as gz:
+            s.scan_dump(gz, {"organizations": orgs})
+        result["out_rows"] = len(orgs.rows)
+    elif phase == "write":
+        result["out_rows"] = s.write_slim_parts(rows, "firms")
+    elif phase == "single_pass":
+        result["out_rows"] = s.parse_dump_single_pass(dump_path, crm, workers)
+    else:
+        raise SystemExit(f"❌ neznáma fáza {phase}")
+    wall = time.perf_counter() - t0
+    cpu = _cpu_s() - cpu0
+
+    result.update(
+        {
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu, 3),
+            "rows_per_s": round(result["rows"] / wall, 1) if wall > 0 else None,
+            "dump_mb_per_s": round(dump_path.stat().st_size / 1e6 / wall, 2) if wall > 0 else None,
+            "setup_rss_mb": round(setup_rss, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        }
+    )
+    if phase == "copy_decode":
+        t1 = time.perf_counter()
+        for table, sec in sections.items():
+            dec = s._entry_decoder(table, sec.col_order)
+            _baseline_split(sec.lines, dec.indexes)
+        result["baseline_wall_s"] = round(time.perf_counter() - t1, 3)
+        result["speedup"] = round(result["baseline_wall_s"] / wall, 2) if wall > 0 else None
+    if phase == "write":
+        out_files = list(s.SNAP_DIR.iterdir())
+        result["bytes_written"] = sum(p.stat().st_size for p in out_files if p.is_file())
+    return result
+
+
+def child_main(args):
+    counts = json.loads(args.counts.read_text(encoding="utf-8"))
+    result = run_phase(args.child, args.dump, args.work, counts, args.workers)
+    args.result.write_text(json.dumps(result), encoding="utf-8")
+
+
+# --------- orchestrácia ---------
+
+def run_in_child(phase, dump_path, counts_path, workers, verbose):
+    work = Path(tempfile.mkdtemp(prefix=f"rpo_bench_{phase}_"))
+    result_path = work / "result.json"
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()),
+        "--child", phase, "--dump", str(dump_path), "--counts", str(counts_path),
+        "--work", str(work), "--result", str(result_path), "--workers", str(workers),
+    ]
+    try:
+        out = None if verbose else subprocess.DEVNULL
+        proc = subprocess.run(cmd, stdout=out, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            raise SystemExit(f"❌ fáza {phase} zlyhala (exit {proc.returncode})")
+        return json.loads(result_path.read_text(encoding="utf-8"))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def _git_rev():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare_results(current, baseline, tolerance: float):
+    """Vráti zoznam regresií (rows/s pokleslo o viac ako tolerance)."""
+    base = {(r["orgs"], r["phase"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current["results"]:
+        old = base.get((r["orgs"], r["phase"]))
+        if not old or not old.get("rows_per_s") or not r.get("rows_per_s"):
+            continue
+        ratio = r["rows_per_s"] / old["rows_per_s"]
+        mem = r["peak_rss_mb"] / old["peak_rss_mb"] if old.get("peak_rss_mb") else 1.0
+        flag = ratio < 1 - tolerance
+        print(
+            f"  {'❌' if flag else '✅'} {size_label(r['orgs']):>5} {r['phase']:<13} "
+            f"{ratio:6.2f}× rows/s, {mem:5.2f}× peak RSS"
+        )
+        if flag:
+            regressions.append((r["orgs"], r["phase"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark fáz sync_rpo_full.py")
+    ap.add_argument("--sizes", default="100k,1M,10M", help="počty organizácií, napr. 100k,1M")
+    ap.add_argument("--phases", default=",".join(PHASES))
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--orgs-first", action="store_true", help="organizácie pred entry tabuľkami")
+    ap.add_argument("--workers", type=int, default=0, help="RPO_WORKERS pre single_pass")
+    ap.add_argument("--dump-dir", type=Path, default=Path(tempfile.gettempdir()) / "rpo_bench")
+    ap.add_argument("--out", type=Path, default=None, help="výstupný JSON s výsledkami")
+    ap.add_argument("--compare", type=Path, default=None, help="JSON z predchádzajúceho behu")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    ap.add_argument("--verbose", action="store_true", help="zobraz výstup fáz")
+    # interné: beh jednej fázy v child procese
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--dump", type=Path, help=argparse.SUPPRESS)
+    ap.add_argument("--counts", type=Path, help=argparse.SUPPRESS)
+    ap.add_argument("--work", type=Path, help=argparse.SUPPRESS)
+    ap.add_argument("--result", type=Path, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        return child_main(args)
+
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+    unknown = [p for p in phases if p not in PHASES]
+    if unknown:
+        raise SystemExit(f"❌ neznáme fázy: {', '.join(unknown)}")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "seed": args.seed,
+        "results": [],
+    }
+    for orgs in (parse_size(s) for s in args.sizes.split(",")):
+        dump_path, counts = ensure_dump(args.dump_dir, orgs, args.seed, args.orgs_first)
+        counts_path = dump_path.with_name(dump_path.name.replace(".sql.gz", ".counts.json"))
+        for phase in phases:
+            print(f"⏱️ {size_label(orgs)} / {phase} ...", flush=True)
+            r = run_in_child(phase, dump_path, counts_path, args.workers, args.verbose)
+            r = {"orgs": orgs, "phase": phase, **r}
+            report["results"].append(r)
+            print(
+                f"   {r['wall_s']:.2f} s wall, {r['cpu_s']:.2f} s CPU, "
+                f"{r['rows_per_s'] or 0:,.0f} rows/s, peak RSS {r['peak_rss_mb']:.0f} MB"
+            )
+            if "baseline_wall_s" in r:
+                print(f"   pôvodný split: {r['baseline_wall_s']:.2f} s ({r['speedup']:.2f}× rýchlejšie)")
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"📝 Výsledky zapísané do {args.out}")
+
+    if args.compare:
+        print(f"🔍 Porovnanie s {args.compare} (tolerancia {args.tolerance:.0%}):")
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare_results(report, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ Regresie: {len(regressions)}")
+            return 1
+        print("✅ Bez regresií")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
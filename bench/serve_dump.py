@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Lokálny HTTP server pre dump (napr. z bench/generate_dump.py) na skúšanie
+sťahovania v sync_rpo_full.py: ETag, Last-Modified, podmienené požiadavky
+(304), Range / If-Range (206) a voliteľne simulované výpadky spojenia.
+
+Použitie:
+  python bench/serve_dump.py /tmp/rpo_bench/rpo_100k_s1.sql.gz --port 8765
+  python bench/serve_dump.py dump.sql.gz --drop-every 3 --drop-after 1000000
+  RPO_DUMP_URL=http://127.0.0.1:8765/dump.sql.gz python sync_rpo_full.py
+
+--drop-every N  každá N-tá odpoveď s telom sa preruší po --drop-after bajtoch
+--no-range      server ignoruje Range (vždy 200 s celým telom)
+--no-validators bez ETag / Last-Modified
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def make_handler(path: Path, args):
+    counter = {"n": 0}
+    lock = threading.Lock()
+
+    class DumpHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *a):
+            if args.verbose:
+                super().log_message(fmt, *a)
+
+        def _validators(self):
+            st = path.stat()
+            etag = '"%s"' % hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:16]
+            return st.st_size, etag, formatdate(st.st_mtime, usegmt=True), int(st.st_mtime)
+
+        def _not_modified(self, etag, mtime):
+            inm = self.headers.get("If-None-Match")
+            if inm is not None:
+                return etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+            ims = self.headers.get("If-Modified-Since")
+            if ims:
+                try:
+                    return mtime <= int(parsedate_to_datetime(ims).timestamp())
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def do_GET(self):
+            size, etag, last_modified, mtime = self._validators()
+            if not args.no_validators and self._not_modified(etag, mtime):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            start, end = 0, size - 1
+            status = 200
+            rng = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            if rng and not args.no_range and (if_range is None or if_range in (etag, last_modified)):
+                m = RANGE_RE.match(rng.strip())
+                if m and (m.group(1) or m.group(2)):
+                    if m.group(1):
+                        start = int(m.group(1))
+                        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+                    else:
+                        start = max(0, size - int(m.group(2)))
+                    if start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    status = 206
+
+            length = end - start + 1
+            self.send_response(status)
+            self.send_header("Content-Type", "application/gzip")
+            self.send_header("Content-Length", str(length))
+            if not args.no_range:
+                self.send_header("Accept-Ranges", "bytes")
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            if not args.no_validators:
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+
+            with lock:
+                counter["n"] += 1
+                drop = args.drop_every and length > 1 and counter["n"] % args.drop_every == 0
+            limit = min(length, args.drop_after) if drop else length
+            sent = 0
+            with path.open("rb") as f:
+                f.seek(start)
+                while sent < limit:
+                    chunk = f.read(min(256 * 1024, limit - sent))
+                    if not chunk:
+                        break
+                    try:
+                        self.wfile.write(chunk)
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    sent += len(chunk)
+            if drop:
+                print(f"💥 prerušené spojenie po {sent} B ({self.headers.get('Range') or 'celé telo'})")
+                self.close_connection = True
+                self.connection.shutdown(2)
+
+    return DumpHandler
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Lokálny HTTP server pre RPO dump (Range, ETag, výpadky)")
+    ap.add_argument("dump", type=Path)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--drop-every", type=int, default=0)
+    ap.add_argument("--drop-after", type=int, default=1_000_000)
+    ap.add_argument("--no-range", action="store_true")
+    ap.add_argument("--no-validators", action="store_true")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args(argv)
+
+    if not args.dump.is_file():
+        raise SystemExit(f"❌ {args.dump} neexistuje")
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.dump, args))
+    print(f"🌐 http://{args.host}:{args.port}/{args.dump.name} ({os.path.getsize(args.dump) / 1e6:.1f} MB)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Voliteľná lokálna HTTP služba (asyncio, bez ďalších závislostí) nad posledným
+snapshotom v snapshots/. Party sa načítajú do kompaktného stĺpcového úložiska
+v pamäti a dotazy vracajú len požadovanú stránku – klient nemusí sťahovať
+všetky firms_part*.csv.gz ako app.js.
+
+Endpointy (GET, odpoveď JSON):
+  /health   stav, počet riadkov, dátum snapshotu
+  /meta     hlavička, počty podľa kategórie a kraja
+  /firms    filtrované riadky po stránkach, parametre:
+              category=all|orsr|zrsr|other   (ako v app.js)
+              city=<podreťazec>              (bez diakritiky, ako v app.js)
+              region=<kraj>                  (presná zhoda)
+              from=, to=                     established_on v YYYY-MM-DD alebo DD.MM.YYYY
+              q=<podreťazec názvu>           (bez diakritiky)
+              ico=<IČO>                      (presná zhoda)
+              offset=0, limit=50 (max 1000), count=1 (aj celkový počet zhôd)
+  /reload   vynúti opätovné načítanie snapshotu
+
+Nový snapshot (zmena current.json / manifest.json / last_updated.txt) sa zistí periodicky
+(--poll sekúnd), načíta sa na pozadí a až hotový sa atomicky vymení –
+rozbehnuté dotazy dobehnú nad starým.
+
+Použitie:
+  python serve_snapshot.py --port 8080
+  curl 'http://127.0.0.1:8080/firms?category=orsr&city=kosice&limit=20'
+"""
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import re
+import signal
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from datetime import date
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import sync_rpo_full as rpo
+
+CATEGORIES = ("orsr", "zrsr", "other")
+MAX_LIMIT = 1000
+DEFAULT_LIMIT = 50
+_SEP = "\x00"
+_PART_RE = re.compile(r"(?:_(\d{4}(?:-\d{2})?|undated))?_part(\d+)\.csv\.gz$")
+
+
+# --------- stĺpcové úložisko ---------
+
+class _TextColumn:
+    """
+    Reťazce v jednom UTF-8 bloku s offsetmi; voliteľne aj normalizovaný text
+    všetkých hodnôt v jednom stringu oddelenom \\x00 na hľadanie podreťazca cez str.find.
+    """
+
+    def __init__(self, searchable: bool = False):
+        self.chunks = []
+        self.offsets = array("Q", [0])
+        self.size = 0
+        self.searchable = searchable
+        self.norm_parts = [] if searchable else None
+        self.blob = b""
+        self.norm = ""
+        self.norm_starts = array("Q")
+
+    def extend(self, values):
+        for v in values:
+            b = v.encode("utf-8")
+            self.chunks.append(b)
+            self.size += len(b)
+            self.offsets.append(self.size)
+            if self.searchable:
+                self.norm_parts.append(rpo.normalize_search_text(v))
+
+    def freeze(self):
+        self.blob = b"".join(self.chunks)
+        self.chunks = None
+        if self.searchable:
+            pos = 1
+            for s in self.norm_parts:
+                self.norm_starts.append(pos)
+                pos += len(s) + 1
+            self.norm = _SEP + _SEP.join(self.norm_parts) + _SEP
+            self.norm_parts = None
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def find_rows(self, needle: str, exact: bool = False):
+        """Zoradené indexy riadkov, ktorých normalizovaná hodnota obsahuje needle (alebo sa jej rovná)."""
+        if exact:
+            needle = _SEP + needle + _SEP
+        text, starts = self.norm, self.norm_starts
+        pos = text.find(needle)
+        last = -1
+        while pos >= 0:
+            row = bisect_right(starts, pos + (1 if exact else 0)) - 1
+            if row != last:
+                yield row
+                last = row
+            # ďalšie hľadanie až od nasledujúceho riadku (pri exact od jeho úvodného \x00)
+            if row + 1 >= len(starts):
+                break
+            pos = text.find(needle, starts[row + 1] - (1 if exact else 0))
+
+
+class _DictColumn:
+    """Slovníkovo kódovaný stĺpec (mestá, kraje, registre, dátumy)."""
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self.codes = array("I")
+
+    def extend(self, values):
+        index, codes = self.index, self.codes
+        for v in values:
+            code = index.get(v)
+            if code is None:
+                code = index[v] = len(self.values)
+                self.values.append(v)
+            codes.append(code)
+
+    def freeze(self):
+        pass
+
+    def __getitem__(self, i: int) -> str:
+        return self.values[self.codes[i]]
+
+    def codes_where(self, pred):
+        return {code for code, v in enumerate(self.values) if pred(v)}
+
+
+def _parse_day(val: str):
+    """YYYY-MM-DD alebo DD.MM.YYYY -> počet dní (ordinál); None pri nečitateľnej hodnote."""
+    val = (val or "").strip()
+    try:
+        if re.match(r"^\d{4}-\d{2}-\d{2}$", val):
+            return date.fromisoformat(val).toordinal()
+        dd, mm, yyyy = val.split(".")
+        return date(int(yyyy), int(mm), int(dd)).toordinal()
+    except ValueError:
+        return None
+
+
+def snapshot_parts(snap_dir: Path):
+    """
+    (dátum snapshotu, [cesty k partom v poradí]) – podľa manifest.json,
+    bez neho podľa názvov (ako v app.js: novšie obdobie prvé, undated na konci).
+    Pri stĺpcovom parte (.col.gz) sa uprednostní ten. Ak existuje current.json
+    (RPO_PUBLISH), číta sa verzia, na ktorú ukazuje.
+    """
+    updated_path = snap_dir / "last_updated.txt"
+    updated = updated_path.read_text(encoding="utf-8").strip() if updated_path.exists() else ""
+    pointer = rpo.load_current_pointer(snap_dir)
+    if pointer is not None and (snap_dir / pointer["path"]).is_dir():
+        updated = pointer.get("updated") or updated
+        snap_dir = snap_dir / pointer["path"]
+    manifest = snap_dir / "manifest.json"
+    if manifest.exists():
+        doc = json.loads(manifest.read_text(encoding="utf-8"))
+        paths = []
+        for part in doc["parts"]:
+            col = part.get("columnar")
+            if col and (snap_dir / col["name"]).exists():
+                paths.append(snap_dir / col["name"])
+            else:
+                paths.append(snap_dir / part["name"])
+        return doc.get("updated") or updated, paths
+
+    def part_key(p):
+        m = _PART_RE.search(p.name)
+        return (m.group(1) or "", int(m.group(2))) if m else ("", 0)
+
+    # v rámci obdobia podľa čísla partu, obdobia zostupne (stabilné triedenie), undated na koniec
+    paths = sorted(snap_dir.glob("firms_*part*.csv.gz"), key=lambda p: part_key(p)[1])
+    paths.sort(key=lambda p: (part_key(p)[0] != "undated", part_key(p)[0]), reverse=True)
+    return updated, paths
+
+
+def _read_part_columns(path: Path):
+    """{stĺpec: zoznam hodnôt} z .col.gz alebo .csv.gz partu."""
+    if path.name.endswith(".col.gz"):
+        return rpo.read_columnar_part(path)[1]
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    cols = list(zip(*rows)) if rows else [()] * len(header)
+    return {name: list(vals) for name, vals in zip(header, cols)}
+
+
+class SnapshotStore:
+    """Nemenné stĺpcové úložisko jedného snapshotu; dotazy sú čisté funkcie nad ním."""
+
+    TEXT = ("organization_id", "ico", "name")
+    DICT = ("city", "region", "established_on", "terminated_on", "last_modified", "source_register")
+
+    def __init__(self, snap_dir: Path):
+        t0 = time.perf_counter()
+        self.updated, paths = snapshot_parts(snap_dir)
+        self.header = list(rpo.SLIM_HEADER)
+        self.cols = {
+            "organization_id": _TextColumn(),
+            "ico": _TextColumn(searchable=True),
+            "name": _TextColumn(searchable=True),
+        }
+        for name in self.DICT:
+            self.cols[name] = _DictColumn()
+        self.rows = 0
+        for path in paths:
+            part = _read_part_columns(path)
+            n = len(part.get("organization_id", ()))
+            for name, col in self.cols.items():
+                col.extend(part.get(name) or [""] * n)
+            self.rows += n
+        for col in self.cols.values():
+            col.freeze()
+
+        # kategória podľa registra a deň založenia podľa kódu dátumu – raz pre slovník
+        reg = self.cols["source_register"]
+        self.register_category = [rpo.classify_source_register(v) for v in reg.values]
+        est = self.cols["established_on"]
+        self.established_day = [_parse_day(v) for v in est.values]
+        self.paths = paths
+        self.load_seconds = time.perf_counter() - t0
+
+    def row(self, i: int):
+        return {name: self.cols[name][i] for name in self.header}
+
+    def meta(self):
+        reg_codes = Counter(self.cols["source_register"].codes)
+        categories = Counter()
+        for code, n in reg_codes.items():
+            categories[self.register_category[code]] += n
+        region = self.cols["region"]
+        regions = Counter()
+        for code, n in Counter(region.codes).items():
+            regions[region.values[code]] += n
+        return {
+            "updated": self.updated,
+            "rows": self.rows,
+            "header": self.header,
+            "categories": {"all": self.rows, **{c: categories.get(c, 0) for c in CATEGORIES}},
+            "regions": dict(sorted(regions.items())),
+            "parts": [p.name for p in self.paths],
+        }
+
+    def query(self, params):
+        """
+        Vráti (riadky stránky, next_offset, total alebo None). Riadky idú v poradí
+        partov (established_on zostupne), takže prvá stránka sa nájde bez prechodu všetkým.
+        """
+        offset = max(0, int(params.get("offset") or 0))
+        limit = min(MAX_LIMIT, max(1, int(params.get("limit") or DEFAULT_LIMIT)))
+        want_total = params.get("count") in ("1", "true")
+
+        checks = []
+        category = (params.get("category") or "all").strip()
+        if category != "all":
+            if category not in CATEGORIES:
+                raise ValueError(f"neznáma kategória {category!r}")
+            codes = {c for c, cat in enumerate(self.register_category) if cat == category}
+            checks.append((self.cols["source_register"].codes, codes))
+        city = rpo.normalize_search_text((params.get("city") or "").strip())
+        if city:
+            col = self.cols["city"]
+            checks.append((col.codes, col.codes_where(lambda v: city in rpo.normalize_search_text(v))))
+        region = (params.get("region") or "").strip()
+        if region:
+            col = self.cols["region"]
+            checks.append((col.codes, col.codes_where(lambda v: v == region)))
+        day_from = day_to = None
+        if params.get("from"):
+            day_from = _parse_day(params["from"])
+            if day_from is None:
+                raise ValueError("neplatný dátum from")
+        if params.get("to"):
+            day_to = _parse_day(params["to"])
+            if day_to is None:
+                raise ValueError("neplatný dátum to")
+        if day_from is not None or day_to is not None:
+            codes = {
+                code for code, d in enumerate(self.established_day)
+                if d is not None
+                and (day_from is None or d >= day_from)
+                and (day_to is None or d <= day_to)
+            }
+            checks.append((self.cols["established_on"].codes, codes))
+
+        # kandidáti: zhody v názve / IČO cez str.find nad normalizovaným textom, inak všetky riadky
+        q = rpo.normalize_search_text((params.get("q") or "").strip())
+        ico = (params.get("ico") or "").strip()
+        if ico:
+            candidates = self.cols["ico"].find_rows(ico, exact=True)
+            if q:
+                name_rows = set(self.cols["name"].find_rows(q))
+                candidates = (r for r in candidates if r in name_rows)
+        elif q:
+            candidates = self.cols["name"].find_rows(q)
+        else:
+            candidates = range(self.rows)
+
+        page = []
+        matched = 0
+        for i in candidates:
+            ok = True
+            for codes, allowed in checks:
+                if codes[i] not in allowed:
+                    ok = False
+                    break
+            if not ok:
+                continue
+            if matched >= offset and len(page) < limit:
+                page.append(i)
+            matched += 1
+            if len(page) >= limit and not want_total:
+                # vieme, že existuje aspoň ďalšia zhoda? stačí pokračovať po prvú
+                if matched > offset + limit:
+                    break
+        has_more = matched > offset + len(page)
+        next_offset = offset + len(page) if has_more else None
+        return [self.row(i) for i in page], next_offset, (matched if want_total else None)
+
+
+# --------- HTTP ---------
+
+class SnapshotService:
+    def __init__(self, snap_dir: Path, poll: float):
+        self.snap_dir = snap_dir
+        self.poll = poll
+        self.store = None
+        self._stamp = None
+        self._reloading = None
+
+    def _current_stamp(self):
+        stamp = []
+        for name in ("current.json", "manifest.json", "last_updated.txt"):
+            p = self.snap_dir / name
+            try:
+                st = p.stat()
+                stamp.append((name, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append((name, None, None))
+        return tuple(stamp)
+
+    async def reload(self, force: bool = False):
+        """Načíta snapshot v samostatnom vlákne a až potom vymení referenciu na store."""
+        if self._reloading is not None:
+            await self._reloading
+            return False
+        stamp = self._current_stamp()
+        if not force and stamp == self._stamp and self.store is not None:
+            return False
+        loop = asyncio.get_running_loop()
+        self._reloading = loop.run_in_executor(None, SnapshotStore, self.snap_dir)
+        try:
+            store = await self._reloading
+        except Exception as e:
+            print(f"⚠️ Načítanie snapshotu zlyhalo, ostáva predchádzajúci: {e}")
+            return False
+        finally:
+            self._reloading = None
+        self.store = store
+        self._stamp = stamp
+        print(
+            f"📦 Načítaný snapshot {store.updated or '?'}: {store.rows} riadkov "
+            f"z {len(store.paths)} partov za {store.load_seconds:.1f} s"
+        )
+        return True
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll)
+            if self._current_stamp() != self._stamp:
+                await self.reload()
+
+    async def handle(self, method: str, target: str):
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if method != "GET":
+            return 405, {"error": "povolený je len GET"}
+        if url.path == "/reload":
+            changed = await self.reload(force=True)
+            return 200, {"reloaded": changed, "rows": self.store.rows if self.store else 0}
+        store = self.store  # jedna referencia na celý dotaz, reload ju nezmení uprostred
+        if store is None:
+            return 503, {"error": "snapshot sa ešte načítava"}
+        if url.path == "/health":
+            return 200, {"status": "ok", "updated": store.updated, "rows": store.rows}
+        if url.path == "/meta":
+            return 200, store.meta()
+        if url.path == "/firms":
+            t0 = time.perf_counter()
+            try:
+                loop = asyncio.get_running_loop()
+                rows, next_offset, total = await loop.run_in_executor(None, store.query, params)
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            body = {
+                "updated": store.updated,
+                "offset": max(0, int(params.get("offset") or 0)),  # ako v query
+                "rows": rows,
+                "next_offset": next_offset,
+                "took_ms": round((time.perf_counter() - t0) * 1000, 2),
+            }
+            if total is not None:
+                body["total"] = total
+            return 200, body
+        return 404, {"error": "neznámy endpoint"}
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                try:
+                    status, doc = await self.handle(method, target)
+                except Exception as e:
+                    # chyba v obsluhe nesmie zhodiť spojenie bez odpovede
+                    print(f"⚠️ Chyba pri {method} {target}: {e!r}")
+                    status, doc = 500, {"error": "interná chyba servera"}
+                payload = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+                        "Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(payload)}\r\n"
+                        "Access-Control-Allow-Origin: *\r\n"
+                        "Cache-Control: no-cache\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    ).encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+async def run(args):
+    service = SnapshotService(args.snapshots, args.poll)
+    await service.reload(force=True)
+    server = await asyncio.start_server(service.serve_client, args.host, args.port)
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(service.reload(force=True)))
+    except (NotImplementedError, AttributeError):
+        pass
+    print(f"🌐 Počúvam na http://{args.host}:{args.port} (snapshot {args.snapshots})")
+    async with server:
+        await asyncio.gather(server.serve_forever(), service.watch())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HTTP dotazy nad posledným RPO snapshotom")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--snapshots", type=Path, default=rpo.SNAP_DIR)
+    ap.add_argument("--poll", type=float, default=30.0, help="ako často kontrolovať nový snapshot (s)")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,49 @@
 #!/usr/bin/env python3
 import os
 import re
+import sys
+import struct
+import io
 import csv
+import json
 import gzip
+import heapq
+import shutil
+import pickle
+import sqlite3
+import hashlib
+import zlib
+import codecs
+import queue
+import tempfile
+import threading
 import unicodedata
+import time
+import cProfile
+import pstats
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from operator import itemgetter
 import requests
-from datetime import datetime
+
+try:  # peak RSS a CPU čas detí pre run report (len Unix)
+    import resource
+except ImportError:
+    resource = None
+
+try:  # voliteľné kodeky pre party (RPO_CODECS)
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
 RPO_DUMP_URL = os.getenv("RPO_DUMP_URL")
@@ -19,47 +57,668 @@ OBCE_CSV_PATH = DATA_DIR / "obce.csv"  # číselník obcí: mesto -> kraj
 
 TMP_DUMP_PATH = Path("/tmp/rpo.sql.gz")
 
+# lokálna cache (index obcí, ...) – mimo repozitára
+CACHE_DIR = Path(os.getenv("RPO_CACHE_DIR", "/tmp/rpo_cache"))
+CITY_INDEX_VERSION = 1
+
+# checkpoint rozparsovaných máp + sekcie organizácií v CACHE_DIR/checkpoints, kľúčom je
+# SHA-256 dumpu a CHECKPOINT_VERSION (zvýšiť pri zmene formátu máp / parsovania);
+# RPO_CHECKPOINT=1 zapne (predvolene vypnuté – v CI sa cache medzi behmi nedrží, bol by to
+# len zápis navyše), RPO_CHECKPOINT_MAX_MB = strop, najdlhšie nepoužité sa zmažú
+CHECKPOINT = os.getenv("RPO_CHECKPOINT", "") == "1"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_MAX_MB = int(os.getenv("RPO_CHECKPOINT_MAX_MB", "2048"))
+
+# RPO_PUBLISH=1: build sa zapíše do vlastného nemenného adresára snapshots/v/<id>/
+# (id = hash obsahu partov) a zverejní sa atomickým prepisom snapshots/current.json;
+# starý snapshot ostáva dostupný, kým nový nie je hotový. Predvolene vypnuté – workflow
+# commituje celé snapshots/ do gitu a GitHub Pages z nemenných URL nič nemá.
+# RPO_PUBLISH_KEEP = koľko posledných verzií (vrátane aktuálnej) ponechať
+PUBLISH = os.getenv("RPO_PUBLISH", "") == "1"
+PUBLISH_KEEP = max(1, int(os.getenv("RPO_PUBLISH_KEEP", "3")))
+
+# RPO_HISTORY=1: popri aktuálnych mapách sa drží celá história intervalov entry tabuliek
+# (EntryHistory) a ukladá sa do checkpointu (vyžaduje RPO_CHECKPOINT=1); RPO_AS_OF=YYYY-MM-DD[,...] potom z checkpointu
+# vyrobí snapshot k dátumu do snapshots/asof/<dátum>/ bez sťahovania a parsovania dumpu
+HISTORY = os.getenv("RPO_HISTORY", "") == "1"
+AS_OF = [d.strip() for d in os.getenv("RPO_AS_OF", "").split(",") if d.strip()]
+
+# RPO_STREAM=1: dump sa parsuje priamo počas sťahovania, bez dočasného súboru;
+# RPO_STREAM_TEE=<cesta> navyše uloží stiahnutý dump aj na disk
+STREAM_DUMP = os.getenv("RPO_STREAM", "") == "1"
+STREAM_TEE_PATH = Path(os.environ["RPO_STREAM_TEE"]) if os.getenv("RPO_STREAM_TEE") else None
+
 ROWS_PER_PART = 100_000   # doladíš podľa veľkosti výstupu
 
+# počet worker procesov na parsovanie entry tabuliek (0 = všetko v hlavnom procese)
+PARSE_WORKERS = int(os.getenv("RPO_WORKERS", "0"))
+PARSE_BATCH_LINES = 50_000  # riadkov COPY v jednej dávke pre workera
+
+# RPO_JOIN_BUCKETS=<n>: entry tabuľky aj organizácie sa počas prechodu rozdelia podľa
+# organization_id do n bucketov na disku a každý bucket sa zredukuje a spojí zvlášť
+# (v pamäti sú naraz len mapy jedného bucketu); 0 = celé mapy v pamäti
+JOIN_BUCKETS = int(os.getenv("RPO_JOIN_BUCKETS", "0"))
+JOIN_SPILL_CHUNK = 256 * 1024  # bajtov riadkov v pamäti na bucket pred zápisom na disk
+
+# RPO_INCREMENTAL=1: prepisujú sa len zmenené party, vedie sa stav (hash riadku
+# na organizáciu) a zapisuje sa delta voči minulému behu
+INCREMENTAL = os.getenv("RPO_INCREMENTAL", "") == "1"
+STATE_VERSION = 1
+
+# RPO_SORT_MEMORY_MB=<n>: po prekročení ~n MB sa zoradené riadky odkladajú na disk
+# (external sort), 0 = všetko sa triedi v pamäti
+SORT_MEMORY_MB = int(os.getenv("RPO_SORT_MEMORY_MB", "0"))
+
+# RPO_COLUMNAR=1: ku každému CSV partu aj stĺpcový binárny part (.col.gz)
+COLUMNAR = os.getenv("RPO_COLUMNAR", "") == "1"
+
+# RPO_PARTITION=year|month: party podľa obdobia established_on (stabilné hranice),
+# v rámci obdobia najviac RPO_PARTITION_MAX_ROWS riadkov; prázdne = po ROWS_PER_PART
+PARTITION = os.getenv("RPO_PARTITION", "")
+if PARTITION not in ("", "year", "month"):
+    raise SystemExit(f"❌ neznáme RPO_PARTITION={PARTITION!r} (year | month)")
+PARTITION_MAX_ROWS = int(os.getenv("RPO_PARTITION_MAX_ROWS", str(ROWS_PER_PART)))
+
+GZIP_LEVEL = 9  # pevná úroveň → deterministické bajty partov
+
+# RPO_CODECS="gzip:9,zstd:19,br:11": kodeky a úrovne partov (gzip je vždy),
+# RPO_COMPRESS_WORKERS: počet vlákien na kompresiu (predvolene počet jadier)
+CODECS_SPEC = os.getenv("RPO_CODECS", f"gzip:{GZIP_LEVEL}")
+COMPRESS_WORKERS = int(os.getenv("RPO_COMPRESS_WORKERS", str(os.cpu_count() or 1)))
+
+# RPO_SEARCH_INDEX=1: vedľa partov aj indexy mesto / kraj / kategória / trigramy názvu
+SEARCH_INDEX = os.getenv("RPO_SEARCH_INDEX", "") == "1"
+
+# RPO_MANIFEST=0 vypne snapshots/manifest.json (počty, zóny dátumov a hashe partov)
+MANIFEST = os.getenv("RPO_MANIFEST", "1") == "1"
+
+# RPO_SQLITE_PATH=<cesta>: aj SQLite databáza s indexmi a FTS5 nad názvami
+SQLITE_PATH = Path(os.environ["RPO_SQLITE_PATH"]) if os.getenv("RPO_SQLITE_PATH") else None
+
+# RPO_ROLLUPS=0 vypne snapshots/firms_rollup_*.json (predpočítané súčty pre dashboardy a mapy)
+ROLLUPS = os.getenv("RPO_ROLLUPS", "1") == "1"
+
+# Sťahovanie: RPO_DOWNLOAD_SEGMENTS paralelných Range požiadaviek (1 = jedno spojenie),
+# RPO_DUMP_SHA256 = očakávaný hash dumpu, RPO_FORCE=1 = rebuild aj pri nezmenenom dumpe
+DOWNLOAD_SEGMENTS = int(os.getenv("RPO_DOWNLOAD_SEGMENTS", "4"))
+DOWNLOAD_MIN_SEGMENT = 8 * 1024 * 1024
+DOWNLOAD_RETRIES = int(os.getenv("RPO_DOWNLOAD_RETRIES", "5"))
+DOWNLOAD_BACKOFF = 1.0  # násobok čakania medzi pokusmi (2, 4, 8 ... s)
+DOWNLOAD_TIMEOUT = (30, 120)  # (connect, read) sekundy
+DUMP_SHA256 = os.getenv("RPO_DUMP_SHA256") or None
+FORCE_REBUILD = os.getenv("RPO_FORCE", "") == "1"
+
+# RPO_RUN_REPORT=0 vypne snapshots/run_report.json (časy, CPU, rows/s a RSS po fázach)
+RUN_REPORT = os.getenv("RPO_RUN_REPORT", "1") == "1"
+# RPO_PROFILE="cpu", "mem" alebo "cpu,mem": cProfile / tracemalloc pre každú fázu,
+# .prof súbory idú do RPO_PROFILE_DIR, top položky aj do run reportu
+PROFILE = {p.strip() for p in os.getenv("RPO_PROFILE", "").split(",") if p.strip()}
+PROFILE_DIR = Path(os.getenv("RPO_PROFILE_DIR", "/tmp/rpo_profile"))
+PROFILE_TOP = 15
+RUN_HISTORY_KEEP = 104  # ~2 roky týždenných behov v snapshots/run_history.jsonl
+
+
+# --------- meranie fáz ---------
+
+def _rss_mb():
+    """(aktuálny RSS, peak RSS procesu) v MB; mimo Linuxu None."""
+    current = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # Linux: ru_maxrss v kB
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return current, peak
+
+
+def _timed_call(fn, *args):
+    """
+    Beží vo worker procese: vráti (CPU čas volania, výsledok). Živé worker
+    procesy RUSAGE_CHILDREN nevidí, ich čas sa do fáz pridáva cez
+    RunStats.add_worker_cpu.
+    """
+    t0 = time.process_time()
+    result = fn(*args)
+    return time.process_time() - t0, result
+
+
+class RunStats:
+    """
+    Zber metrík po fázach behu (sťahovanie, obce, jednotlivé tabuľky, join,
+    triedenie, zápis): wall a CPU čas, počet riadkov, prečítané bajty, RSS.
+    CPU čas = hlavný proces + úlohy worker procesov (_timed_call) dokončené
+    počas fázy; tie sú zvlášť aj vo worker_cpu_s.
+
+    Fázy sa nevnárajú – každá sa začne begin() a skončí end(); pre bloky
+    kódu je pohodlnejšie `with RUN_STATS.phase("obce") as ph: ph["rows"] = ...`.
+    Peak RSS je maximum procesu od štartu po koniec fázy (Linux ru_maxrss),
+    rss_mb je stav na konci fázy.
+
+    S PROFILE sa fáza zároveň profiluje cez cProfile / tracemalloc.
+    """
+
+    def __init__(self, profile=frozenset()):
+        self.phases = []
+        self.profile = set(profile)
+        self.started_at = datetime.utcnow()
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self.worker_cpu = 0.0
+
+    def add_worker_cpu(self, seconds: float):
+        self.worker_cpu += seconds
+
+    def begin(self, name: str):
+        ph = {"name": name, "rows": 0, "bytes_read": 0}
+        ph["_t"] = time.perf_counter()
+        ph["_cpu"] = time.process_time()
+        ph["_wcpu"] = self.worker_cpu
+        if "cpu" in self.profile:
+            ph["_prof"] = cProfile.Profile()
+            ph["_prof"].enable()
+        if "mem" in self.profile:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            ph["_mem0"] = tracemalloc.get_traced_memory()[0]
+        return ph
+
+    def end(self, ph, **extra):
+        wall = time.perf_counter() - ph.pop("_t")
+        worker_cpu = self.worker_cpu - ph.pop("_wcpu")
+        cpu = time.process_time() - ph.pop("_cpu") + worker_cpu
+        prof = ph.pop("_prof", None)
+        mem0 = ph.pop("_mem0", None)
+        if prof is not None:
+            prof.disable()
+            ph["profile_top"] = self._dump_profile(ph["name"], prof)
+        if mem0 is not None:
+            cur, peak = tracemalloc.get_traced_memory()
+            ph["py_alloc_peak_mb"] = round((peak - mem0) / 2 ** 20, 1)
+            ph["alloc_top"] = [
+                f"{s.traceback[0].filename.rsplit('/', 1)[-1]}:{s.traceback[0].lineno} "
+                f"{s.size / 2 ** 20:.1f} MB"
+                for s in tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP]
+            ]
+        ph.update(extra)
+        rss, peak_rss = _rss_mb()
+        ph["wall_s"] = round(wall, 3)
+        ph["cpu_s"] = round(cpu, 3)
+        if worker_cpu:
+            ph["worker_cpu_s"] = round(worker_cpu, 3)
+        ph["rows_per_s"] = round(ph["rows"] / wall, 1) if wall > 0 and ph["rows"] else None
+        ph["rss_mb"] = round(rss, 1) if rss is not None else None
+        ph["peak_rss_mb"] = round(peak_rss, 1) if peak_rss is not None else None
+        self.phases.append(ph)
+        print(
+            f"⏱️ {ph['name']}: {wall:.2f} s, CPU {cpu:.2f} s"
+            + (f", {ph['rows_per_s']:,.0f} riadkov/s" if ph["rows_per_s"] else "")
+        )
+        return ph
+
+    @contextmanager
+    def phase(self, name: str):
+        ph = self.begin(name)
+        try:
+            yield ph
+        finally:
+            self.end(ph)
+
+    @staticmethod
+    def _dump_profile(name: str, prof):
+        try:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            prof.dump_stats(PROFILE_DIR / f"{name}.prof")
+        except OSError as e:
+            print(f"⚠️ Nepodarilo sa uložiť profil {name}: {e}")
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return [l.strip() for l in buf.getvalue().splitlines() if l.strip()][-PROFILE_TOP:]
+
+    def report(self, **meta):
+        _, peak_rss = _rss_mb()
+        return {
+            "version": 1,
+            "started_at": self.started_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "finished_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            **meta,
+            "total_wall_s": round(time.perf_counter() - self._t0, 3),
+            "total_cpu_s": round(time.process_time() - self._cpu0 + self.worker_cpu, 3),
+            "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+            "phases": self.phases,
+        }
+
+    def write_report(self, path: Path = None, history_path: Path = None, **meta):
+        """
+        Zapíše run_report.json a pridá skrátený riadok (časy a peak RSS fáz)
+        do run_history.jsonl, kde ostáva posledných RUN_HISTORY_KEEP behov –
+        história gitu sa v workflow maže, takže trend držíme v samotnom súbore.
+        """
+        path = path or SNAP_DIR / "run_report.json"
+        history_path = history_path or SNAP_DIR / "run_history.jsonl"
+        doc = self.report(**meta)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(doc, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        tmp.replace(path)
+
+        summary = {
+            "finished_at": doc["finished_at"],
+            **meta,
+            "total_wall_s": doc["total_wall_s"],
+            "peak_rss_mb": doc["peak_rss_mb"],
+            "phases": {p["name"]: [p["wall_s"], p["cpu_s"], p["rows"]] for p in self.phases},
+        }
+        lines = []
+        if history_path.exists():
+            lines = history_path.read_text(encoding="utf-8").splitlines()
+        lines.append(json.dumps(summary, ensure_ascii=False))
+        tmp = history_path.with_name(history_path.name + ".tmp")
+        tmp.write_text("\n".join(lines[-RUN_HISTORY_KEEP:]) + "\n", encoding="utf-8")
+        tmp.replace(history_path)
+        print(f"📈 Zapísaný {path.name} ({len(self.phases)} fáz, {doc['total_wall_s']:.1f} s)")
+        return doc
+
+
+RUN_STATS = RunStats(PROFILE)
+
 
 # --------- pomocné ---------
 
-def download_dump(url: str, dest: Path):
-    print(f"📥 Sťahujem dump z {url} ...")
-    with requests.get(url, stream=True, timeout=60) as r:
+def dump_meta_path() -> Path:
+    return SNAP_DIR / "dump_meta.json"
+
+
+def load_dump_meta():
+    """Metadáta dumpu z posledného úspešného behu (url, etag, last_modified, size, sha256)."""
+    try:
+        return json.loads(dump_meta_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_dump_meta(meta):
+    path = dump_meta_path()
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    tmp.replace(path)
+
+
+class DumpChangedError(RuntimeError):
+    """Dump sa počas sťahovania na serveri zmenil (If-Range nesedel)."""
+
+
+def probe_dump(url: str, prev_meta=None):
+    """
+    Zistí stav dumpu na serveri jedným GET s Range: bytes=0-4 (HEAD niektoré
+    podpísané URL nepovoľujú) a podmienkami If-None-Match / If-Modified-Since
+    z minulého behu. Z prvých bajtov sa pozná pg_dump custom archív (PGDMP).
+
+    Vráti {"unchanged", "size", "etag", "last_modified", "ranges", "custom"};
+    unchanged=True znamená odpoveď 304.
+    """
+    headers = {"Range": f"bytes=0-{len(PGDMP_MAGIC) - 1}"}
+    if prev_meta and prev_meta.get("url") == url:
+        if prev_meta.get("etag"):
+            headers["If-None-Match"] = prev_meta["etag"]
+        if prev_meta.get("last_modified"):
+            headers["If-Modified-Since"] = prev_meta["last_modified"]
+    with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+        if r.status_code == 304:
+            return {
+                "unchanged": True,
+                "size": prev_meta.get("size"),
+                "etag": prev_meta.get("etag"),
+                "last_modified": prev_meta.get("last_modified"),
+                "ranges": False,
+                "custom": False,
+            }
         r.raise_for_status()
+        size = None
+        ranges = r.status_code == 206
+        if ranges:
+            # Content-Range: bytes 0-4/<celková veľkosť>
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            size = int(total) if total.isdigit() else None
+            ranges = size is not None
+        elif r.headers.get("Content-Length", "").isdigit():
+            size = int(r.headers["Content-Length"])
+        return {
+            "unchanged": False,
+            "size": size,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "ranges": ranges,
+            "custom": next(r.iter_content(chunk_size=len(PGDMP_MAGIC)), b"") == PGDMP_MAGIC,
+        }
+
+
+def _segment_bounds(size: int, segments: int):
+    segments = max(1, min(segments, size // DOWNLOAD_MIN_SEGMENT or 1))
+    step = -(-size // segments)
+    return [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+
+
+def _fetch_segment(url: str, dest: Path, seg, validator, on_bytes):
+    """
+    Stiahne bajty seg = [start, end, hotovo] do dest na správny offset.
+    Po výpadku pokračuje od posledného zapísaného bajtu (max DOWNLOAD_RETRIES pokusov).
+    """
+    start, end, _ = seg
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        if start + seg[2] > end:
+            return
+        headers = {"Range": f"bytes={start + seg[2]}-{end}"}
+        if validator:
+            # ak sa dump medzičasom zmenil, server vráti 200 s celým telom
+            headers["If-Range"] = validator
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+                if r.status_code != 206:
+                    raise DumpChangedError(
+                        f"server vrátil {r.status_code} namiesto 206 pre {headers['Range']}"
+                    )
+                with dest.open("r+b") as f:
+                    f.seek(start + seg[2])
+                    # menšie chunky: pri výpadku sa stratí najviac rozčítaný chunk
+                    for chunk in r.iter_content(chunk_size=64 * 1024):
+                        if chunk:
+                            chunk = chunk[: end + 1 - start - seg[2]]
+                            f.write(chunk)
+                            seg[2] += len(chunk)
+                            on_bytes(len(chunk))
+            if start + seg[2] > end:
+                return
+            print(f"⚠️ Segment {start}-{end} skončil predčasne, pokračujem (pokus {attempt})")
+        except (requests.RequestException, OSError) as e:
+            print(f"⚠️ Segment {start}-{end} zlyhal na {start + seg[2]}: {e} (pokus {attempt})")
+        if attempt < DOWNLOAD_RETRIES:
+            time.sleep(min(2 ** attempt, 30) * DOWNLOAD_BACKOFF)
+    raise RuntimeError(f"❌ Segment {start}-{end} sa nepodarilo stiahnuť ani na {DOWNLOAD_RETRIES} pokusov")
+
+
+def _progress_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".progress.json")
+
+
+def _download_ranges(url: str, dest: Path, probe, segments: int, on_bytes):
+    """Paralelné sťahovanie po Range segmentoch s obnovením z .progress.json."""
+    size = probe["size"]
+    validator = probe["etag"] or probe["last_modified"]
+    progress_path = _progress_path(dest)
+    segs = None
+    try:
+        prev = json.loads(progress_path.read_text(encoding="utf-8"))
+        if (
+            validator
+            and prev.get("url") == url
+            and prev.get("validator") == validator
+            and prev.get("size") == size
+            and dest.exists()
+            and dest.stat().st_size == size
+        ):
+            segs = prev["segments"]
+            done = sum(s[2] for s in segs)
+            print(f"⏯️ Pokračujem v rozpracovanom sťahovaní ({done / 1e6:.1f} z {size / 1e6:.1f} MB)")
+    except (OSError, ValueError, KeyError):
+        pass
+    if segs is None:
+        segs = _segment_bounds(size, segments)
         with dest.open("wb") as f:
-            for chunk in r.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    f.write(chunk)
+            f.truncate(size)
+
+    def save_progress():
+        progress_path.write_text(
+            json.dumps({"url": url, "validator": validator, "size": size, "segments": segs}),
+            encoding="utf-8",
+        )
+
+    print(f"📥 Sťahujem {size / 1e6:.1f} MB v {len(segs)} segmentoch ...")
+    save_progress()
+    try:
+        with ThreadPoolExecutor(max_workers=len(segs)) as pool:
+            futures = [pool.submit(_fetch_segment, url, dest, seg, validator, on_bytes) for seg in segs]
+            for fut in futures:
+                fut.result()
+    except BaseException:
+        save_progress()
+        raise
+    progress_path.unlink(missing_ok=True)
+
+
+def _download_single(url: str, dest: Path, on_bytes):
+    """Sťahovanie na jedno spojenie (server nepodporuje Range) – pri chybe odznova."""
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        try:
+            with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+                r.raise_for_status()
+                with dest.open("wb") as f:
+                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                        if chunk:
+                            f.write(chunk)
+                            on_bytes(len(chunk))
+            return
+        except (requests.RequestException, OSError) as e:
+            print(f"⚠️ Sťahovanie zlyhalo: {e} (pokus {attempt})")
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            time.sleep(min(2 ** attempt, 30) * DOWNLOAD_BACKOFF)
+
+
+def verify_dump(dest: Path, size=None, sha256: str = None) -> str:
+    """Overí veľkosť (a voliteľne SHA-256) stiahnutého dumpu, vráti jeho SHA-256."""
+    actual = dest.stat().st_size
+    if size is not None and actual != size:
+        raise RuntimeError(f"❌ Dump má {actual} B, server hlásil {size} B")
+    digest = hashlib.sha256()
+    with dest.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    hexdigest = digest.hexdigest()
+    if sha256 and hexdigest != sha256.lower():
+        raise RuntimeError(f"❌ SHA-256 dumpu {hexdigest} nesedí s očakávaným {sha256}")
+    print(f"🔐 Dump overený ({actual / 1e6:.1f} MB, sha256 {hexdigest[:12]}…)")
+    return hexdigest
+
+
+def download_dump(url: str, dest: Path, probe=None, segments: int = None):
+    """
+    Stiahne dump do dest a overí ho. Ak server podporuje Range, sťahuje
+    paralelne po segmentoch (RPO_DOWNLOAD_SEGMENTS) a po prerušení pokračuje
+    od zapísaných bajtov – aj v ďalšom behu, kým sa nezmení ETag/Last-Modified.
+
+    Vráti metadáta dumpu pre dump_meta.json.
+    """
+    probe = probe or probe_dump(url)
+    segments = DOWNLOAD_SEGMENTS if segments is None else segments
+    print(f"📥 Sťahujem dump z {url} ...")
+    with RUN_STATS.phase("download") as ph:
+        def on_bytes(n):
+            ph["bytes_read"] += n
+
+        if probe["ranges"] and probe["size"] and segments > 1:
+            try:
+                _download_ranges(url, dest, probe, segments, on_bytes)
+            except DumpChangedError as e:
+                print(f"⚠️ {e}, sťahujem celý dump odznova na jedno spojenie")
+                _progress_path(dest).unlink(missing_ok=True)
+                probe = probe_dump(url)
+                _download_single(url, dest, on_bytes)
+        else:
+            _download_single(url, dest, on_bytes)
+        sha256 = verify_dump(dest, probe["size"], DUMP_SHA256)
     print(f"✅ Stiahnuté do {dest}")
+    return {
+        "url": url,
+        "etag": probe["etag"],
+        "last_modified": probe["last_modified"],
+        "size": dest.stat().st_size,
+        "sha256": sha256,
+    }
+
+
+def iter_remote_dump_lines(url: str, tee_path: Path = None, chunk_size: int = 1024 * 1024):
+    """
+    Generátor riadkov gzip dumpu priamo zo streamu HTTP odpovede.
+
+    Sťahovanie beží vo vlákne a posiela chunky cez ohraničenú frontu, takže
+    sieť a parsovanie sa prekrývajú. Voliteľne sa telo odpovede zapisuje aj do
+    tee_path (najprv ako .part, premenuje sa až po stiahnutí celého dumpu).
+    Keď volajúci prestane čítať skôr (scan_dump skončí po posledne potrebnej
+    tabuľke), sťahovanie sa preruší – s tee_path sa zvyšok dumpu ešte dočíta
+    do súboru (bez dekompresie), aby bol uložený dump celý.
+
+    pg_dump custom archív (-Fc) sa takto čítať nedá (potrebuje náhodný prístup
+    podľa TOC), na ten je ValueError – main ho podľa probe_dump sťahuje na disk.
+    """
+    print(f"📥 Streamujem dump z {url} (parsovanie počas sťahovania) ...")
+    chunks = queue.Queue(maxsize=16)
+    stop = threading.Event()
+    tee_tmp = tee_path.with_name(tee_path.name + ".part") if tee_path else None
+
+    def fetch():
+        try:
+            with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+                r.raise_for_status()
+                tee = tee_tmp.open("wb") if tee_tmp else None
+                try:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        if stop.is_set() and not tee:
+                            return
+                        if chunk:
+                            if tee:
+                                tee.write(chunk)
+                            if not stop.is_set():
+                                chunks.put(chunk)
+                finally:
+                    if tee:
+                        tee.close()
+            if tee_tmp:
+                tee_tmp.replace(tee_path)
+                print(f"💾 Dump uložený aj do {tee_path}")
+            chunks.put(None)
+        except BaseException as e:  # chybu prepošleme čitateľovi
+            chunks.put(e)
+
+    fetcher = threading.Thread(target=fetch, name="rpo-download", daemon=True)
+    fetcher.start()
+
+    # 16 + MAX_WBITS = gzip hlavička; po konci jedného gzip membera pokračujeme ďalším
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    first = True
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, BaseException):
+                raise chunk
+            if first and chunk.startswith(PGDMP_MAGIC):
+                raise ValueError(f"{url} je pg_dump custom archív (-Fc), ten sa nedá parsovať počas sťahovania")
+            first = False
+
+            data = inflater.decompress(chunk)
+            while inflater.eof and inflater.unused_data:
+                rest = inflater.unused_data
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                data += inflater.decompress(rest)
+
+            text = pending + decoder.decode(data)
+            lines = text.split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + "\n"
+
+        pending += decoder.decode(inflater.flush(), final=True)
+        if pending:
+            yield pending
+    finally:
+        stop.set()
+        if tee_tmp and fetcher.is_alive():
+            print(f"📥 Parsovanie skončilo, dočítavam zvyšok dumpu do {tee_path} ...")
+        # uvoľníme miesto vo fronte, aby sa sťahovacie vlákno mohlo ukončiť (alebo dočítať tee)
+        while fetcher.is_alive():
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if tee_tmp and tee_tmp.exists():
+            tee_tmp.unlink()
+            print(f"⚠️ Dump nebol stiahnutý celý, {tee_path} nezapisujem")
+
+
+def part_path(base_name: str, part_index: int, period: str = None) -> Path:
+    if period:
+        return SNAP_DIR / f"{base_name}_{period}_part{part_index:02d}.csv.gz"
+    return SNAP_DIR / f"{base_name}_part{part_index:02d}.csv.gz"
+
+
+def columnar_path_for(csv_path: Path) -> Path:
+    return csv_path.with_name(csv_path.name[: -len(".csv.gz")] + ".col.gz")
+
+
+def list_part_files(base_name: str):
+    """Všetky existujúce party (CSV vo všetkých kodekoch aj stĺpcové, s obdobím aj bez)."""
+    return sorted(
+        p
+        for ext in (".csv.gz", ".csv.zst", ".csv.br", ".col.gz")
+        for p in SNAP_DIR.glob(f"{base_name}_*part*{ext}")
+    )
+
+
+class _DeterministicGzipFile(gzip.GzipFile):
+    """
+    Gzip bez mtime a názvu súboru v hlavičke a s pevnou úrovňou kompresie –
+    rovnaký obsah dá vždy rovnaké bajty (nezmenené party nemenia git/CDN).
+    """
+
+    def __init__(self, path: Path):
+        self._raw = open(path, "wb")
+        super().__init__(filename="", mode="wb", fileobj=self._raw, compresslevel=GZIP_LEVEL, mtime=0)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._raw.close()
 
 
-def open_part_writer(base_name: str, part_index: int):
-    part_str = f"{part_index:02d}"
-    out_path = SNAP_DIR / f"{base_name}_part{part_str}.csv.gz"
-    f = gzip.open(out_path, "wt", encoding="utf-8", newline="")
-    writer = csv.writer(f)
-    return out_path, f, writer
+def open_deterministic_gzip(path: Path):
+    return _DeterministicGzipFile(path)
+
+
+_YMD_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
+_DMY_CACHE = {}
+_DMY_CACHE_MAX = 200_000  # rôznych dátumov je v dumpe málo, strop len pre istotu
 
 
 def _to_dmy(val: str) -> str:
+    """YYYY-MM-DD[ čas] -> DD.MM.YYYY; výsledok sa kešuje podľa dátumovej časti."""
     if not val:
         return ""
-    date_part = val.split(" ")[0].split("T")[0]
-    m = re.match(r"^(\d{4})-(\d{2})-(\d{2})$", date_part)
-    if not m:
-        m2 = re.match(r"^(\d{4})-(\d{2})-(\d{2}).*", date_part)
-        if not m2:
-            return date_part
-        yyyy, mm, dd = m2.group(1), m2.group(2), m2.group(3)
-        return f"{dd}.{mm}.{yyyy}"
-    yyyy, mm, dd = m.group(1), m.group(2), m.group(3)
-    return f"{dd}.{mm}.{yyyy}"
+    date_part = val.split(" ", 1)[0].split("T", 1)[0]
+    out = _DMY_CACHE.get(date_part)
+    if out is None:
+        m = _YMD_RE.match(date_part)
+        out = f"{m.group(3)}.{m.group(2)}.{m.group(1)}" if m else date_part
+        if len(_DMY_CACHE) < _DMY_CACHE_MAX:
+            _DMY_CACHE[date_part] = out
+    return out
 
 
 # --------- normalizácia názvov miest ---------
 
+_DASH_RE = re.compile(r"[-–—]")
+_SPACES_RE = re.compile(r"\s+")
+_DASH_SPLIT_RE = re.compile(r"\s*[-–—]\s*")
+
+
 def normalize_city_key(s: str) -> str:
     """
     Normalizuje názov mesta pre porovnávanie:
@@ -73,16 +732,88 @@ def normalize_city_key(s: str) -> str:
     s = unicodedata.normalize("NFD", s)
     s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")  # bez diakritiky
     s = s.lower()
-    s = re.sub(r"[-–—]", " ", s)   # pomlčky → medzera
-    s = re.sub(r"\s+", " ", s)     # viac medzier → jedna
+    s = _DASH_RE.sub(" ", s)     # pomlčky → medzera
+    s = _SPACES_RE.sub(" ", s)   # viac medzier → jedna
     return s.strip()
 
 
 # --------- mapovanie mesto → kraj ---------
 
+Municipality = namedtuple("Municipality", "name district region lat lon")
+
+
+class CityRegionIndex(dict):
+    """
+    Index obcí z data/obce.csv: {NORMALIZED_KEY: KRAJ} (ako slovník), navyše:
+      records     – zoznam Municipality (názov, okres, kraj, lat, lon)
+      key_record  – {NORMALIZED_KEY: index do records}
+    Kľúče aj aliasy platia ako doteraz: vyhráva prvý výskyt v číselníku.
+
+    resolve(city) je memoizované – každý rôzny reťazec mesta sa normalizuje
+    a vyhľadá iba raz za beh; mestá, ktoré sa nenašli, sa počítajú v `unresolved`.
+    """
+
+    def __init__(self, records=(), key_record=None):
+        super().__init__()
+        self.records = list(records)
+        self.key_record = dict(key_record or {})
+        for key, i in self.key_record.items():
+            self[key] = self.records[i].region
+        self._memo = {}
+        self.unresolved = Counter()
+
+    def add(self, rec: Municipality):
+        i = len(self.records)
+        self.records.append(rec)
+        keys = [normalize_city_key(rec.name)]
+        parts = _DASH_SPLIT_RE.split(rec.name)
+        if len(parts) >= 2:
+            keys += [normalize_city_key(p.strip()) for p in parts if p.strip()]
+        for k in keys:
+            if k and k not in self.key_record:
+                self.key_record[k] = i
+                self[k] = rec.region
+
+    def resolve(self, city: str):
+        """Vráti Municipality pre názov mesta (alebo None)."""
+        try:
+            return self._memo[city]
+        except KeyError:
+            pass
+        rec = None
+        i = self.key_record.get(normalize_city_key(city))
+        if i is None:
+            # skúsime rozdeliť vstup (napr. "Bratislava - mestská časť Petržalka") podľa pomlčky
+            # a pre každú časť skúsiť nájsť obec v číselníku
+            for part in _DASH_SPLIT_RE.split(city):
+                i = self.key_record.get(normalize_city_key(part))
+                if i is not None:
+                    break
+        if i is not None:
+            rec = self.records[i]
+        self._memo[city] = rec
+        return rec
+
+    def region_for(self, city: str) -> str:
+        if not city:
+            return ""
+        rec = self.resolve(city)
+        if rec is None:
+            self.unresolved[city] += 1
+            return ""
+        return rec.region
+
+    def __reduce__(self):
+        return (CityRegionIndex, (self.records, self.key_record))
+
+
+def _city_index_cache_path() -> Path:
+    return CACHE_DIR / f"obce_index_v{CITY_INDEX_VERSION}.pickle"
+
+
 def load_city_region_map():
     """
-    Načíta mapu {NORMALIZED_KEY: KRAJ} z data/obce.csv.
+    Načíta CityRegionIndex (mapa {NORMALIZED_KEY: KRAJ} + okres, lat, lon) z data/obce.csv.
 
     Očakávaný formát BEZ HLAVIČKY:
       názov;okres;kraj;lat;lon
@@ -94,47 +825,80 @@ def load_city_region_map():
       - "bratislava ruzinov"
       - "bratislava"
       - "ruzinov"
+
+    Hotový index sa kešuje do CACHE_DIR ako pickle (platí, kým sa nezmení obsah CSV).
     """
-    city_to_region = {}
     if not OBCE_CSV_PATH.exists():
         print(f"⚠️ Varovanie: {OBCE_CSV_PATH} neexistuje, mapovanie mesto → kraj bude prázdne.")
-        return city_to_region
+        return CityRegionIndex()
 
-    with OBCE_CSV_PATH.open("r", encoding="utf-8") as f:
-        reader = csv.reader(f, delimiter=";")
-        for line_no, row in enumerate(reader, start=1):
-            if not row or len(row) < 3:
-                continue
+    raw = OBCE_CSV_PATH.read_bytes()
+    csv_hash = hashlib.sha256(raw).hexdigest()
+    cache_path = _city_index_cache_path()
+    try:
+        with cache_path.open("rb") as f:
+            cached_hash, index = pickle.load(f)
+        if cached_hash == csv_hash:
+            print(f"🗺️ Načítaných {len(index)} normalizovaných kľúčov obcí → kraj z cache {cache_path}")
+            return index
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+        pass
 
-            # keby sa časom objavila hlavička
-            if line_no == 1 and (
-                "kraj" in row[2].lower()
-                or "názov" in row[0].lower()
-                or "nazov" in row[0].lower()
-            ):
-                continue
+    index = CityRegionIndex()
+    reader = csv.reader(io.StringIO(raw.decode("utf-8")), delimiter=";")
+    for line_no, row in enumerate(reader, start=1):
+        if not row or len(row) < 3:
+            continue
 
-            name = (row[0] or "").strip()
-            region = (row[2] or "").strip()
-            if not name or not region:
-                continue
+        # keby sa časom objavila hlavička
+        if line_no == 1 and (
+            "kraj" in row[2].lower()
+            or "názov" in row[0].lower()
+            or "nazov" in row[0].lower()
+        ):
+            continue
 
-            main_key = normalize_city_key(name)
-            if main_key and main_key not in city_to_region:
-                city_to_region[main_key] = region
+        name = (row[0] or "").strip()
+        region = (row[2] or "").strip()
+        if not name or not region:
+            continue
 
-            parts = re.split(r"\s*[-–—]\s*", name)
-            if len(parts) >= 2:
-                for p in parts:
-                    p = p.strip()
-                    if not p:
-                        continue
-                    k = normalize_city_key(p)
-                    if k and k not in city_to_region:
-                        city_to_region[k] = region
+        index.add(Municipality(
+            name,
+            (row[1] or "").strip(),
+            region,
+            _parse_coord(row[3]) if len(row) > 3 else None,
+            _parse_coord(row[4]) if len(row) > 4 else None,
+        ))
+
+    print(f"🗺️ Načítaných {len(index)} normalizovaných kľúčov obcí → kraj z {OBCE_CSV_PATH}")
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(cache_path.name + ".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump((csv_hash, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(cache_path)
+    except OSError as e:
+        print(f"⚠️ Nepodarilo sa uložiť cache obcí: {e}")
+    return index
 
-    print(f"🗺️ Načítaných {len(city_to_region)} normalizovaných kľúčov obcí → kraj z {OBCE_CSV_PATH}")
-    return city_to_region
+
+def _parse_coord(val):
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def report_unresolved_cities(city_region_map, top: int = 20):
+    """Vypíše mestá, ku ktorým sa nenašiel kraj (najčastejšie prvé)."""
+    unresolved = getattr(city_region_map, "unresolved", None)
+    if not unresolved:
+        return
+    total = sum(unresolved.values())
+    print(f"❓ Bez kraja: {total} organizácií, {len(unresolved)} rôznych miest. Najčastejšie:")
+    for city, n in unresolved.most_common(top):
+        print(f"    {n:>7}  {city}")
 
 
 def guess_region(city: str, city_region_map):
@@ -145,13 +909,15 @@ def guess_region(city: str, city_region_map):
     """
     if not city:
         return ""
+    if isinstance(city_region_map, CityRegionIndex):
+        return city_region_map.region_for(city)
     key = normalize_city_key(city)
     region = city_region_map.get(key)
     if region:
         return region
     # skúsime rozdeliť vstup (napr. "Bratislava - mestská časť Petržalka") podľa pomlčky
     # a pre každú časť skúsiť nájsť kraj v číselníku obcí
-    for part in re.split(r"\s*[-–—]\s*", city):
+    for part in _DASH_SPLIT_RE.split(city):
         part_key = normalize_city_key(part)
         if not part_key:
             continue
@@ -161,7 +927,7 @@ def guess_region(city: str, city_region_map):
     return ""
 
 
-# --------- parsovanie názvov ---------
+# --------- výber "aktuálneho" záznamu z histórie ---------
 
 def _better_name(old, new):
     if old is None:
@@ -176,72 +942,6 @@ def _better_name(old, new):
     return False
 
 
-def parse_names_map(dump_path: Path):
-    print("🔎 Parsujem názvy z rpo.organization_name_entries ...")
-    in_copy = False
-    col_lc = []
-    idx_org = idx_name = idx_eff_from = idx_eff_to = idx_updated = None
-    best = {}
-
-    with gzip.open(dump_path, "rt", encoding="utf-8", newline="") as gz:
-        for raw in gz:
-            line = raw.rstrip("\n")
-            if not in_copy:
-                if line.startswith("COPY rpo.organization_name_entries"):
-                    m = re.search(
-                        r"COPY\s+rpo\.organization_name_entries\s*\((.*?)\)\s+FROM", line
-                    )
-                    if not m:
-                        raise RuntimeError(
-                            "Nenašiel som zoznam stĺpcov v COPY rpo.organization_name_entries"
-                        )
-                    col_order = [c.strip().strip('"') for c in m.group(1).split(",")]
-                    col_lc = [c.lower() for c in col_order]
-
-                    def idx(name):
-                        try:
-                            return col_lc.index(name)
-                        except ValueError:
-                            return None
-
-                    idx_org = idx("organization_id")
-                    idx_name = idx("name")
-                    idx_eff_from = idx("effective_from")
-                    idx_eff_to = idx("effective_to")
-                    idx_updated = idx("updated_at")
-                    in_copy = True
-                    print(f"🧱 rpo.organization_name_entries: {len(col_order)} stĺpcov")
-                continue
-
-            if line == r"\.":
-                in_copy = False
-                continue
-
-            parts = line.split("\t")
-            parts = [None if p == r"\N" else p for p in parts]
-            if idx_org is None or idx_name is None:
-                continue
-            org_id = parts[idx_org]
-            name = parts[idx_name]
-            if not org_id or not name:
-                continue
-
-            rec = {
-                "name": name,
-                "effective_from": parts[idx_eff_from] if idx_eff_from is not None else None,
-                "effective_to": parts[idx_eff_to] if idx_eff_to is not None else None,
-                "updated_at": parts[idx_updated] if idx_updated is not None else None,
-            }
-            old = best.get(org_id)
-            if _better_name(old, rec):
-                best[org_id] = rec
-
-    print(f"🧾 Nájdených názvov: {len(best)} organizácií")
-    return best
-
-
-# --------- parsovanie adries (mesto) ---------
-
 def _better_address(old, new):
     if old is None:
         return True
@@ -255,74 +955,6 @@ def _better_address(old, new):
     return False
 
 
-def parse_address_map(dump_path: Path):
-    print("🔎 Parsujem adresy z rpo.organization_address_entries ...")
-    in_copy = False
-    col_lc = []
-    idx_org = idx_mun = idx_eff_from = idx_eff_to = idx_updated = None
-    best = {}
-
-    with gzip.open(dump_path, "rt", encoding="utf-8", newline="") as gz:
-        for raw in gz:
-            line = raw.rstrip("\n")
-            if not in_copy:
-                if line.startswith("COPY rpo.organization_address_entries"):
-                    m = re.search(
-                        r"COPY\s+rpo\.organization_address_entries\s*\((.*?)\)\s+FROM",
-                        line,
-                    )
-                    if not m:
-                        raise RuntimeError(
-                            "Nenašiel som zoznam stĺpcov v COPY rpo.organization_address_entries"
-                        )
-                    col_order = [c.strip().strip('"') for c in m.group(1).split(",")]
-                    col_lc = [c.lower() for c in col_order]
-
-                    def idx(name):
-                        try:
-                            return col_lc.index(name)
-                        except ValueError:
-                            return None
-
-                    idx_org = idx("organization_id")
-                    idx_mun = idx("municipality")
-                    idx_eff_from = idx("effective_from")
-                    idx_eff_to = idx("effective_to")
-                    idx_updated = idx("updated_at")
-                    in_copy = True
-                    print(
-                        f"🧱 rpo.organization_address_entries: {len(col_order)} stĺpcov"
-                    )
-                continue
-
-            if line == r"\.":
-                in_copy = False
-                continue
-
-            parts = line.split("\t")
-            parts = [None if p == r"\N" else p for p in parts]
-            if idx_org is None:
-                continue
-            org_id = parts[idx_org]
-            if not org_id:
-                continue
-
-            rec = {
-                "municipality": parts[idx_mun] if idx_mun is not None else None,
-                "effective_from": parts[idx_eff_from] if idx_eff_from is not None else None,
-                "effective_to": parts[idx_eff_to] if idx_eff_to is not None else None,
-                "updated_at": parts[idx_updated] if idx_updated is not None else None,
-            }
-            old = best.get(org_id)
-            if _better_address(old, rec):
-                best[org_id] = rec
-
-    print(f"🧾 Nájdených adries: {len(best)} organizácií")
-    return best
-
-
-# --------- parsovanie IČO ---------
-
 def _better_identifier(old, new):
     if old is None:
         return True
@@ -335,305 +967,3490 @@ def _better_identifier(old, new):
         return ts(new.get("updated_at")) > ts(old.get("updated_at"))
     return False
 
-def parse_identifier_map(dump_path: Path):
-    """
-    Načíta IČO (IPO) z rpo.organization_identifier_entries.
 
-    Štruktúra tabuľky podľa dokumentácie:
-      id, organization_id, ipo, effective_from, effective_to, created_at, updated_at
+# Tabuľky s históriou, z ktorých berieme jeden aktuálny záznam na organizáciu.
+#   column   – stĺpec v dumpe, ktorého hodnotu chceme
+#   field    – kľúč, pod ktorým ju uložíme do záznamu
+#   required – riadky bez hodnoty preskočíme
+ENTRY_TABLES = {
+    "organization_name_entries": {
+        "column": "name",
+        "field": "name",
+        "required": True,
+        "better": _better_name,
+        "intro": "🔎 Parsujem názvy z rpo.organization_name_entries ...",
+        "summary": "🧾 Nájdených názvov: {n} organizácií",
+    },
+    "organization_address_entries": {
+        "column": "municipality",
+        "field": "municipality",
+        "required": False,
+        "better": _better_address,
+        "dict_encode": True,  # obcí je pár tisíc, opakujú sa milióny krát
+        "intro": "🔎 Parsujem adresy z rpo.organization_address_entries ...",
+        "summary": "🧾 Nájdených adries: {n} organizácií",
+    },
+    "organization_identifier_entries": {
+        # ipo používame ako IČO
+        "column": "ipo",
+        "field": "ico",
+        "required": True,
+        "better": _better_identifier,
+        "intro": "🔎 Parsujem IČO z rpo.organization_identifier_entries ...",
+        "summary": "🧾 Nájdených ICO pre {n} organizácií",
+    },
+}
 
-    ipo používame ako IČO.
-    """
-    print("🔎 Parsujem IČO z rpo.organization_identifier_entries ...")
-    in_copy = False
-    col_lc = []
-    idx_org = idx_ipo = idx_eff_from = idx_eff_to = idx_updated = None
-    best = {}
-
-    with gzip.open(dump_path, "rt", encoding="utf-8", newline="") as gz:
-        for raw in gz:
-            line = raw.rstrip("\n")
-
-            if not in_copy:
-                if line.startswith("COPY rpo.organization_identifier_entries"):
-                    m = re.search(
-                        r"COPY\s+rpo\.organization_identifier_entries\s*\((.*?)\)\s+FROM",
-                        line,
-                    )
-                    if not m:
-                        raise RuntimeError(
-                            "Nenašiel som zoznam stĺpcov v COPY rpo.organization_identifier_entries"
-                        )
-                    col_order = [c.strip().strip('"') for c in m.group(1).split(",")]
-                    col_lc = [c.lower() for c in col_order]
-
-                    def idx(name):
-                        try:
-                            return col_lc.index(name)
-                        except ValueError:
-                            return None
-
-                    idx_org = idx("organization_id")
-                    idx_ipo = idx("ipo")
-                    idx_eff_from = idx("effective_from")
-                    idx_eff_to = idx("effective_to")
-                    idx_updated = idx("updated_at")
-
-                    in_copy = True
-                    print(f"🧱 rpo.organization_identifier_entries: {len(col_order)} stĺpcov")
-                continue
 
-            if line == r"\.":
-                in_copy = False
-                continue
+# --------- kompaktné mapy organizácia → záznam ---------
 
-            parts = line.split("\t")
-            parts = [None if p == r"\N" else p for p in parts]
+_TS_NULL = -(2 ** 63)
+_TS_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})(?: (\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?)?$")
 
-            if idx_org is None or idx_ipo is None:
-                # bez organization_id alebo ipo nemáme čo mapovať
-                continue
 
-            org_id = parts[idx_org]
-            ipo = parts[idx_ipo]
+def _pack_ts(val):
+    """
+    Zabalí dátum / timestamp z dumpu do int64 bez straty:
+      ((ordinál dňa * 86400 + sekundy) * 10^6 + mikrosekundy) * 8 + formát
+    formát: 0 = len dátum, 1 = s časom, 2..7 = s 1..6 desatinnými miestami.
+    Vráti None, ak sa hodnota takto nedá presne uložiť (napr. s časovou zónou).
+    """
+    if val is None:
+        return _TS_NULL
+    m = _TS_RE.match(val)
+    if not m:
+        return None
+    yyyy, mm, dd, hh, mi, ss, frac = m.groups()
+    try:
+        day = date(int(yyyy), int(mm), int(dd)).toordinal()
+    except ValueError:
+        return None
+    if hh is None:
+        return day * 86400 * 1_000_000 * 8
+    if int(hh) > 23 or int(mi) > 59 or int(ss) > 59:
+        return None
+    secs = int(hh) * 3600 + int(mi) * 60 + int(ss)
+    micro = int(frac.ljust(6, "0")) if frac else 0
+    kind = 1 + len(frac) if frac else 1
+    return ((day * 86400 + secs) * 1_000_000 + micro) * 8 + kind
 
-            if not org_id or not ipo:
-                continue
 
-            rec = {
-                "ico": ipo,  # tu priamo mapujeme IPO ako IČO
-                "effective_from": parts[idx_eff_from] if idx_eff_from is not None else None,
-                "effective_to": parts[idx_eff_to] if idx_eff_to is not None else None,
-                "updated_at": parts[idx_updated] if idx_updated is not None else None,
-            }
+def _unpack_ts(packed: int):
+    if packed == _TS_NULL:
+        return None
+    packed, kind = divmod(packed, 8)
+    packed, micro = divmod(packed, 1_000_000)
+    day, secs = divmod(packed, 86400)
+    d = date.fromordinal(day).isoformat()
+    if kind == 0:
+        return d
+    hh, rest = divmod(secs, 3600)
+    mi, ss = divmod(rest, 60)
+    out = f"{d} {hh:02d}:{mi:02d}:{ss:02d}"
+    if kind > 1:
+        out += "." + f"{micro:06d}"[: kind - 1]
+    return out
 
-            old = best.get(org_id)
-            if _better_identifier(old, rec):
-                best[org_id] = rec
 
-    print(f"🧾 Nájdených ICO pre {len(best)} organizácií")
-    return best
+class CompactEntryMap:
+    """
+    Kompaktná náhrada {organization_id: {field, effective_from, effective_to, updated_at}}.
 
+    - číselné organization_id sú v zoradenom array('q'), záznam sa hľadá bisectom
+    - dátumy/timestampy sú zabalené do int64 (_pack_ts), čo sa nedá, ide do `overflow`
+    - hodnoty sú buď slovníkovo kódované (opakujúce sa obce), alebo v jednom
+      UTF-8 bloku s offsetmi (názvy, IČO)
+    - nečíselné ID (v RPO by nemali byť) ostávajú v obyčajnom slovníku `extra`
 
-# --------- hlavné parsovanie + SORT podľa created_at ---------
-def parse_dump_to_slim_csv(
-    dump_path: Path, date_str: str, names_map, addr_map, ident_map, city_region_map
-):
+    Vzniká z EntryReducer (freeze), ktorý má časy zabalené už počas parsovania.
+    Lookup API je rovnaké ako pri slovníku: `m.get(org_id, {})` vráti objekt
+    s `.get(kľúč)`; hodnoty sa dekódujú až pri prístupe.
     """
-    Prečíta rpo.organizations, poskladá finálne riadky do pamäte,
-    ZORADÍ ich podľa established_on (najnovšie prvé) a až potom
-    ich rozseká do partov:
 
-      snapshots/firms_<date>_part01.csv.gz, part02...
+    TS_FIELDS = ("effective_from", "effective_to", "updated_at")
 
-    stĺpce:
-      organization_id, ico, name, city, region,
-      established_on, terminated_on, last_modified, source_register
-    """
-    print(f"🔎 Parsujem organizácie z {dump_path} (slim export, sort podľa established_on) ...")
-    in_copy = False
-    col_order = []
-    col_lc = []
-    id_idx = est_idx = term_idx = act_idx = created_idx = updated_idx = source_reg_idx = None
+    def __init__(self, reducer: "EntryReducer"):
+        self.field = reducer.field
+        self.extra = {}
+        self.overflow = {}
 
-    # Bez dátumu v názve – držíme vždy len jeden aktuálny snapshot
-    base_name = "firms"
-    rows = []
-
-    with gzip.open(dump_path, "rt", encoding="utf-8", newline="") as gz:
-        for raw in gz:
-            line = raw.rstrip("\n")
-
-            if not in_copy:
-                if line.startswith("COPY rpo.organizations"):
-                    in_copy = True
-                    m = re.search(
-                        r"COPY\s+rpo\.organizations\s*\((.*?)\)\s+FROM", line
-                    )
-                    if not m:
-                        raise RuntimeError(
-                            "Nenašiel som zoznam stĺpcov v COPY rpo.organizations"
-                        )
-                    col_order = [c.strip().strip('"') for c in m.group(1).split(",")]
-                    col_lc = [c.lower() for c in col_order]
-
-                    def idx(name):
-                        try:
-                            return col_lc.index(name)
-                        except ValueError:
-                            return None
-
-                    id_idx = idx("id")
-                    est_idx = idx("established_on")
-                    term_idx = idx("terminated_on")
-                    act_idx = idx("actualized_at")
-                    created_idx = idx("created_at")
-                    updated_idx = idx("updated_at")
-                    source_reg_idx = idx("source_register")
-
-                    print(f"🧱 rpo.organizations má {len(col_order)} stĺpcov")
-                continue
+        ids, slots = array("q"), array("q")
+        for org_id, slot in reducer.slots.items():
+            if org_id.isdigit() and len(org_id) < 19 and str(int(org_id)) == org_id:
+                ids.append(int(org_id))
+                slots.append(slot)
+            else:
+                self.extra[org_id] = reducer.record(slot)
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        slots = array("q", (slots[i] for i in order))
 
-            if line == r"\.":
-                print("🔚 Koniec COPY rpo.organizations")
-                break
+        self.ids = array("q", (ids[i] for i in order))
+        del ids, order
+        self.ts = {f: array("q", map(reducer.ts[f].__getitem__, slots)) for f in self.TS_FIELDS}
+        if reducer.overflow:
+            overflow_slots = {slot for _, slot in reducer.overflow}
+            for pos, slot in enumerate(slots):
+                if slot in overflow_slots:
+                    for f in self.TS_FIELDS:
+                        raw = reducer.overflow.get((f, slot))
+                        if raw is not None:
+                            self.overflow[(f, pos)] = raw
 
-            parts = line.split("\t")
-            parts = ["" if p == r"\N" else p for p in parts]
-            if len(parts) < len(col_order):
-                parts += [""] * (len(col_order) - len(parts))
+        values = map(reducer.value, slots)
+        if reducer.dict_encode:
+            self.dictionary = []
+            codes = {}
+            self.codes = array("i")
+            for v in values:
+                if v is None:
+                    self.codes.append(-1)
+                    continue
+                code = codes.get(v)
+                if code is None:
+                    code = codes[v] = len(self.dictionary)
+                    self.dictionary.append(v)
+                self.codes.append(code)
+            self.blob = self.offsets = None
+        else:
+            self.dictionary = self.codes = None
+            self.nulls = set()
+            chunks = []
+            self.offsets = array("Q", [0])
+            size = 0
+            for pos, v in enumerate(values):
+                if v is None:
+                    self.nulls.add(pos)
+                    v = ""
+                b = v.encode("utf-8")
+                chunks.append(b)
+                size += len(b)
+                self.offsets.append(size)
+            self.blob = b"".join(chunks)
 
-            org_id = parts[id_idx] if id_idx is not None else None
-            if not org_id:
-                continue
+    def __len__(self):
+        return len(self.ids) + len(self.extra)
 
-            # názov
-            name_info = names_map.get(org_id, {}) or {}
-            name_val = name_info.get("name") or ""
-            if not name_val:
-                for alt in ("business_name", "name", "full_name"):
-                    try:
-                        ai = col_lc.index(alt)
-                    except ValueError:
-                        ai = None
-                    if ai is not None and parts[ai]:
-                        name_val = parts[ai]
-                        break
-
-            # mesto
-            addr_info = addr_map.get(org_id, {}) or {}
-            city = addr_info.get("municipality") or ""
-
-            # kraj
-            region = guess_region(city, city_region_map)
-
-            # IČO
-            ident_info = ident_map.get(org_id, {}) or {}
-            ico = ident_info.get("ico") or ""
-
-            established_on_raw = parts[est_idx] if est_idx is not None else ""
-            terminated_on_raw = parts[term_idx] if term_idx is not None else ""
-
-            # last_modified len na informáciu (na stĺpec v CSV), NIE na sort
-            candidates = []
-            for idx_val in (act_idx, updated_idx, created_idx):
-                if idx_val is not None and parts[idx_val]:
-                    candidates.append(parts[idx_val])
-            if name_info.get("updated_at"):
-                candidates.append(name_info["updated_at"])
-            if addr_info.get("updated_at"):
-                candidates.append(addr_info["updated_at"])
-            if ident_info.get("updated_at"):
-                candidates.append(ident_info["updated_at"])
-            last_modified_raw = max(candidates) if candidates else ""
-
-            established_on_out = _to_dmy(established_on_raw)
-            terminated_on_out = _to_dmy(terminated_on_raw)
-            last_modified_out = _to_dmy(last_modified_raw)
-
-            created_raw = parts[created_idx] if created_idx is not None else ""
+    def _pos(self, org_id):
+        try:
+            key = int(org_id)
+        except (TypeError, ValueError):
+            return None
+        pos = bisect_left(self.ids, key)
+        if pos < len(self.ids) and self.ids[pos] == key and str(key) == org_id:
+            return pos
+        return None
 
-            # 🔑 TERAZ: triedime primárne podľa established_on (novšie prvé),
-            # fallback len keď established_on chýba, použijeme created_at.
-            sort_key = established_on_raw or created_raw or ""
+    def __contains__(self, org_id):
+        return org_id in self.extra or self._pos(org_id) is not None
 
-            row_values = [
-                org_id,
-                ico,
-                name_val,
-                city,
-                region,
-                established_on_out,
-                terminated_on_out,
-                last_modified_out,
-                parts[source_reg_idx] if source_reg_idx is not None else "",
-            ]
-            rows.append((sort_key, row_values))
+    def get(self, org_id, default=None):
+        rec = self.extra.get(org_id)
+        if rec is not None:
+            return rec
+        pos = self._pos(org_id)
+        if pos is None:
+            return default
+        return _CompactEntry(self, pos)
 
-    print(f"📊 Načítaných {len(rows)} organizácií, triedim podľa established_on ...")
-    # formát je YYYY-MM-DD, takže stringovo triedenie funguje
-    rows.sort(key=lambda t: t[0], reverse=True)  # najnovšie založené prvé
+    def __getitem__(self, org_id):
+        rec = self.get(org_id)
+        if rec is None:
+            raise KeyError(org_id)
+        return rec
 
-    part_index = 0
-    part_rows = 0
-    out_file = None
-    writer = None
-    wrote_total = 0
+    def lookup(self, org_id):
+        """
+        (hodnota, updated_at) pre join bez _CompactEntry a bez rozbaľovania času:
+        updated_at je zabalený int (_pack_ts), surový string (overflow / nečíselné ID)
+        alebo None. Zabalené inty sa dajú porovnávať – poradie je rovnaké ako pri
+        porovnaní pôvodných ISO stringov.
+        """
+        rec = self.extra.get(org_id)
+        if rec is not None:
+            return rec.get(self.field), rec.get("updated_at") or None
+        pos = self._pos(org_id)
+        if pos is None:
+            return None, None
+        packed = self.ts["updated_at"][pos]
+        if packed == _TS_NULL:
+            packed = self.overflow.get(("updated_at", pos))
+        return self.value_at(pos), packed
 
-    def start_new_part():
-        nonlocal part_index, part_rows, out_file, writer
-        if out_file:
-            out_file.close()
-        part_index += 1
-        part_rows = 0
-        out_path, out_file, writer = open_part_writer(base_name, part_index)
-        header = [
-            "organization_id",
-            "ico",
-            "name",
-            "city",
-            "region",
-            "established_on",
-            "terminated_on",
-            "last_modified",
-            "source_register",
-        ]
-        writer.writerow(header)
-        print(f"📝 píšem do {out_path}")
-
-    for sort_key, row_values in rows:
-        if writer is None or part_rows >= ROWS_PER_PART:
-            start_new_part()
-        writer.writerow(row_values)
-        wrote_total += 1
-        part_rows += 1
-        if wrote_total % 100_000 == 0:
-            print(f"  ... {wrote_total} riadkov (part {part_index}, v parte {part_rows})")
-
-    if out_file:
-        out_file.close()
-    print(f"✅ Uzatvorený posledný part ({part_rows} riadkov)")
-    print(f"🎉 Celkovo zapísaných {wrote_total} riadkov, počet partov: {part_index}")
-    return wrote_total
+    def value_at(self, pos: int):
+        if self.codes is not None:
+            code = self.codes[pos]
+            return self.dictionary[code] if code >= 0 else None
+        if pos in self.nulls:
+            return None
+        return self.blob[self.offsets[pos]:self.offsets[pos + 1]].decode("utf-8")
 
+    def ts_at(self, field: str, pos: int):
+        raw = self.overflow.get((field, pos))
+        if raw is not None:
+            return raw
+        return _unpack_ts(self.ts[field][pos])
 
-def main():
-    if not RPO_DUMP_URL:
-        raise SystemExit("❌ chýba env RPO_DUMP_URL")
 
-    today_date = datetime.utcnow().date()
-    today_dmy = today_date.strftime("%d-%m-%Y")
+class _CompactEntry:
+    """Jeden záznam CompactEntryMap so slovníkovým `.get` (hodnoty sa dekódujú lenivo)."""
 
-    # Pred generovaním vyčisti existujúce part súbory (držíme iba jeden snapshot)
-    removed = 0
-    for p in SNAP_DIR.glob("firms_part*.csv.gz"):
-        try:
-            p.unlink()
-            removed += 1
-        except Exception as e:
-            print(f"⚠️ Nepodarilo sa zmazať {p}: {e}")
-    if removed:
-        print(f"🧹 Vymazaných starých partov: {removed}")
+    __slots__ = ("m", "pos")
 
-    download_dump(RPO_DUMP_URL, TMP_DUMP_PATH)
+    def __init__(self, m: CompactEntryMap, pos: int):
+        self.m = m
+        self.pos = pos
 
-    city_region_map = load_city_region_map()
-    names_map = parse_names_map(TMP_DUMP_PATH)
-    addr_map = parse_address_map(TMP_DUMP_PATH)
-    ident_map = parse_identifier_map(TMP_DUMP_PATH)
+    def get(self, key, default=None):
+        if key == self.m.field:
+            v = self.m.value_at(self.pos)
+        elif key in CompactEntryMap.TS_FIELDS:
+            v = self.m.ts_at(key, self.pos)
+        else:
+            return default
+        return default if v is None else v
 
-    total = parse_dump_to_slim_csv(
-        TMP_DUMP_PATH, today_dmy, names_map, addr_map, ident_map, city_region_map
-    )
-    print(f"🎉 Hotovo. Spolu {total} riadkov, vytvorených viacero part súborov.")
+    def __getitem__(self, key):
+        if key != self.m.field and key not in CompactEntryMap.TS_FIELDS:
+            raise KeyError(key)
+        return self.get(key)
 
-    # Zapíš posledný dátum aktualizácie (DD-MM-YYYY)
-    try:
-        (SNAP_DIR / "last_updated.txt").write_text(f"{today_dmy}\n", encoding="utf-8")
-        print("🕒 Zapísané snapshots/last_updated.txt")
+    def __bool__(self):
+        return True
+
+
+_PACK_CACHE = {}
+_PACK_CACHE_MAX = 200_000  # rôznych dátumov je v dumpe málo, strop len pre istotu
+
+
+def _pack_ts_cached(val):
+    """_pack_ts pre effective_from / effective_to; holé dátumy sa kešujú."""
+    try:
+        return _PACK_CACHE[val]
+    except KeyError:
+        packed = _pack_ts(val)
+        if (val is None or len(val) == 10) and len(_PACK_CACHE) < _PACK_CACHE_MAX:
+            _PACK_CACHE[val] = packed
+        return packed
+
+
+class EntryReducer:
+    """
+    Výber "aktuálneho" záznamu jednej z ENTRY_TABLES rovno do stĺpcov,
+    bez slovníka slovníkov {organization_id: {...}} počas parsovania:
+
+    - `slots` = {organization_id: slot}, časy slotu sú zabalené (_pack_ts)
+      v array('q') `ts`, nezabaliteľné ako surový string v `overflow`
+    - hodnoty sú v zozname `values`, pri dict_encode ako kódy do `dictionary`
+
+    Poradie záznamov je rovnaké ako v better funkcii tabuľky (zabalené časy
+    sa porovnávajú ako pôvodné stringy); ak je v hre overflow, rozhodne priamo
+    better funkcia. freeze() z výsledku urobí CompactEntryMap.
+    """
+
+    def __init__(self, table: str):
+        spec = ENTRY_TABLES[table]
+        self.table = table
+        self.field = spec["field"]
+        self.dict_encode = spec.get("dict_encode", False)
+        self.slots = {}
+        self.ts = {f: array("q") for f in CompactEntryMap.TS_FIELDS}
+        self.overflow = {}
+        if self.dict_encode:
+            self.values = array("i")
+            self.dictionary = []
+            self._codes = {}
+        else:
+            self.values = []
+
+    def __len__(self):
+        return len(self.slots)
+
+    def value(self, slot: int):
+        v = self.values[slot]
+        if self.dict_encode:
+            return self.dictionary[v] if v >= 0 else None
+        return v
+
+    def record(self, slot: int):
+        """Záznam slotu ako slovník (pre better funkciu a nečíselné ID)."""
+        rec = {self.field: self.value(slot)}
+        for f in CompactEntryMap.TS_FIELDS:
+            raw = self.overflow.get((f, slot))
+            rec[f] = raw if raw is not None else _unpack_ts(self.ts[f][slot])
+        return rec
+
+    def _has_overflow(self, slot: int):
+        overflow = self.overflow
+        return bool(overflow) and any((f, slot) in overflow for f in CompactEntryMap.TS_FIELDS)
+
+    def _store(self, slot, org_id, value, pf, pt, pu, raws=None):
+        """
+        Zapíše zabalený záznam do slotu (None = nový slot); `raws` sú pri
+        nezabaliteľných časoch trojica overflow stringov (alebo None).
+        """
+        if self.dict_encode:
+            if value is None:
+                value = -1
+            else:
+                code = self._codes.get(value)
+                if code is None:
+                    code = self._codes[value] = len(self.dictionary)
+                    self.dictionary.append(value)
+                value = code
+        ts = self.ts
+        if slot is None:
+            slot = self.slots[org_id] = len(self.values)
+            self.values.append(value)
+            ts["effective_from"].append(pf)
+            ts["effective_to"].append(pt)
+            ts["updated_at"].append(pu)
+        else:
+            self.values[slot] = value
+            ts["effective_from"][slot] = pf
+            ts["effective_to"][slot] = pt
+            ts["updated_at"][slot] = pu
+        if raws is not None or self.overflow:
+            for f, raw in zip(CompactEntryMap.TS_FIELDS, raws or (None, None, None)):
+                if raw is not None:
+                    self.overflow[(f, slot)] = raw
+                else:
+                    self.overflow.pop((f, slot), None)
+
+    def add(self, org_id, value, eff_from, eff_to, updated):
+        """Ponúkne záznam z dumpu; pri zhode ostáva skorší."""
+        slot = self.slots.get(org_id)
+        ts = self.ts
+        pf = _pack_ts_cached(eff_from)
+        pu = None
+        if slot is not None:
+            if pf is None or self._has_overflow(slot):
+                rec = {self.field: value, "effective_from": eff_from, "effective_to": eff_to, "updated_at": updated}
+                if not ENTRY_TABLES[self.table]["better"](self.record(slot), rec):
+                    return
+            else:
+                old_open = ts["effective_to"][slot] == _TS_NULL
+                if (eff_to is None) != old_open:
+                    if old_open:
+                        return
+                else:
+                    old = ts["effective_from"][slot]
+                    if pf < old:
+                        return
+                    if pf == old:
+                        pu = _pack_ts(updated)
+                        if pu is None:
+                            rec = {self.field: value, "effective_from": eff_from,
+                                   "effective_to": eff_to, "updated_at": updated}
+                            if not ENTRY_TABLES[self.table]["better"](self.record(slot), rec):
+                                return
+                        elif pu <= ts["updated_at"][slot]:
+                            return
+
+        pt = _pack_ts_cached(eff_to)
+        if pu is None:
+            pu = _pack_ts(updated)
+        if pf is None or pt is None or pu is None:
+            raws = (
+                eff_from if pf is None else None,
+                eff_to if pt is None else None,
+                updated if pu is None else None,
+            )
+            self._store(
+                slot, org_id, value,
+                _TS_NULL if pf is None else pf,
+                _TS_NULL if pt is None else pt,
+                _TS_NULL if pu is None else pu,
+                raws,
+            )
+        else:
+            self._store(slot, org_id, value, pf, pt, pu)
+
+    def merge(self, other: "EntryReducer"):
+        """
+        Pripojí čiastkový výsledok z neskoršej dávky. Pri zhode necháva starší
+        záznam, takže pri zlučovaní v poradí dávok je výsledok rovnaký ako pri
+        sériovom prechode.
+        """
+        ts, ots = self.ts, other.ts
+        better = ENTRY_TABLES[self.table]["better"]
+        for org_id, oslot in other.slots.items():
+            slot = self.slots.get(org_id)
+            pf, pt, pu = ots["effective_from"][oslot], ots["effective_to"][oslot], ots["updated_at"][oslot]
+            if slot is not None:
+                if self._has_overflow(slot) or other._has_overflow(oslot):
+                    if not better(self.record(slot), other.record(oslot)):
+                        continue
+                else:
+                    old_open = ts["effective_to"][slot] == _TS_NULL
+                    new_open = pt == _TS_NULL
+                    if old_open != new_open:
+                        if old_open:
+                            continue
+                    elif (pf, pu) <= (ts["effective_from"][slot], ts["updated_at"][slot]):
+                        continue
+            raws = None
+            if other._has_overflow(oslot):
+                raws = tuple(other.overflow.get((f, oslot)) for f in CompactEntryMap.TS_FIELDS)
+            self._store(slot, org_id, other.value(oslot), pf, pt, pu, raws)
+
+    def freeze(self) -> CompactEntryMap:
+        return CompactEntryMap(self)
+
+
+def _pack_history_ts(val):
+    """Ako _pack_ts, ale nezabaliteľnú hodnotu (napr. s časovou zónou) zaokrúhli na deň."""
+    packed = _pack_ts(val)
+    if packed is None:
+        packed = _pack_ts(val[:10])
+    return _TS_NULL if packed is None else packed
+
+
+class EntryHistory:
+    """
+    Celá história jednej z ENTRY_TABLES: pre každú organizáciu všetky záznamy
+    (effective_from, effective_to, updated_at, hodnota) v poradí z dumpu.
+
+    - číselné organization_id sú v zoradenom array('q') `ids`, ostatné v `extra`
+      ({org_id: slot}); záznamy slotu i sú start[i] .. start[i + 1] - 1
+    - časy sú zabalené _pack_ts v array('q') (_TS_NULL = NULL)
+    - hodnoty sú slovníkovo kódované alebo v jednom UTF-8 bloku (ako CompactEntryMap)
+
+    as_of(org_id, lo, hi) vyberie záznam platný k dňu rovnakým poradím ako better
+    funkcie tabuliek, len "otvorený" znamená platný v ten deň a záznamy začínajúce
+    neskôr sa ignorujú.
+    """
+
+    def __init__(self, field: str, records, dict_encode: bool = False):
+        self.field = field
+        numeric, extra = [], []
+        for org_id, recs in records.items():
+            if org_id.isdigit() and len(org_id) < 19 and str(int(org_id)) == org_id:
+                numeric.append((int(org_id), recs))
+            else:
+                extra.append((org_id, recs))
+        numeric.sort(key=lambda t: t[0])
+        self.ids = array("q", (k for k, _ in numeric))
+        self.extra = {org_id: len(numeric) + i for i, (org_id, _) in enumerate(extra)}
+
+        self.start = array("Q", [0])
+        self.eff_from, self.eff_to, self.updated = array("q"), array("q"), array("q")
+        values = []
+        for _, recs in numeric + extra:
+            for eff_from, eff_to, updated, value in recs:
+                self.eff_from.append(_pack_history_ts(eff_from))
+                self.eff_to.append(_pack_history_ts(eff_to))
+                self.updated.append(_pack_history_ts(updated))
+                values.append(value)
+            self.start.append(len(values))
+
+        if dict_encode:
+            self.dictionary = []
+            codes = {}
+            self.codes = array("i")
+            for v in values:
+                if v is None:
+                    self.codes.append(-1)
+                    continue
+                code = codes.get(v)
+                if code is None:
+                    code = codes[v] = len(self.dictionary)
+                    self.dictionary.append(v)
+                self.codes.append(code)
+            self.blob = self.offsets = None
+        else:
+            self.dictionary = self.codes = None
+            self.nulls = set()
+            self.offsets = array("Q", [0])
+            chunks = []
+            size = 0
+            for pos, v in enumerate(values):
+                if v is None:
+                    self.nulls.add(pos)
+                    v = ""
+                b = v.encode("utf-8")
+                chunks.append(b)
+                size += len(b)
+                self.offsets.append(size)
+            self.blob = b"".join(chunks)
+
+    def __len__(self):
+        return len(self.start) - 1
+
+    def intervals(self) -> int:
+        return len(self.eff_from)
+
+    def _slot(self, org_id):
+        slot = self.extra.get(org_id)
+        if slot is not None:
+            return slot
+        try:
+            key = int(org_id)
+        except (TypeError, ValueError):
+            return None
+        pos = bisect_left(self.ids, key)
+        if pos < len(self.ids) and self.ids[pos] == key and str(key) == org_id:
+            return pos
+        return None
+
+    def value_at(self, pos: int):
+        if self.codes is not None:
+            code = self.codes[pos]
+            return self.dictionary[code] if code >= 0 else None
+        if pos in self.nulls:
+            return None
+        return self.blob[self.offsets[pos]:self.offsets[pos + 1]].decode("utf-8")
+
+    def as_of(self, org_id, lo: int, hi: int):
+        """
+        (hodnota, updated_at) k dňu: lo = _pack_ts(deň), hi = _pack_ts(nasledujúci deň).
+        updated_at (zabalený int) len ak nie je z budúcnosti, inak None.
+        """
+        slot = self._slot(org_id)
+        if slot is None:
+            return None, None
+        eff_from, eff_to, updated = self.eff_from, self.eff_to, self.updated
+        best = best_key = None
+        for i in range(self.start[slot], self.start[slot + 1]):
+            f = eff_from[i]
+            if f >= hi:
+                continue
+            t = eff_to[i]
+            key = (t == _TS_NULL or t > lo, f, updated[i])
+            if best is None or key > best_key:
+                best, best_key = i, key
+        if best is None:
+            return None, None
+        upd = updated[best]
+        return self.value_at(best), (upd if upd != _TS_NULL and upd < hi else None)
+
+    def view(self, day: str) -> "EntryHistoryView":
+        return EntryHistoryView(self, day)
+
+
+class EntryHistoryView:
+    """EntryHistory k pevnému dňu (YYYY-MM-DD) s rovnakým lookup ako CompactEntryMap."""
+
+    def __init__(self, history: EntryHistory, day: str):
+        d = date.fromisoformat(day)
+        self.history = history
+        self.lo = _pack_ts(d.isoformat())
+        # 9999-12-31 = "všetko", ďalší deň už date nevie
+        self.hi = _pack_ts((d + timedelta(days=1)).isoformat()) if d < date.max else 2 ** 63 - 1
+
+    def __len__(self):
+        return len(self.history)
+
+    def lookup(self, org_id):
+        return self.history.as_of(org_id, self.lo, self.hi)
+
+
+# --------- jeden prechod dumpom ---------
+
+COPY_HEADER_RE = re.compile(r"COPY\s+rpo\.(\w+)\s*\((.*?)\)\s+FROM")
+
+
+def open_dump_lines(dump_path: Path):
+    return gzip.open(dump_path, "rt", encoding="utf-8", newline="")
+
+
+def _column_index(col_lc, name):
+    try:
+        return col_lc.index(name)
+    except ValueError:
+        return None
+
+
+# COPY text formát: \b \f \n \r \t \v \\, \<1-3 osmičkové číslice>, \x<1-2 hex>;
+# ostatné "\c" znamenajú samotné c. Osmičkové/hex escapy sú bajty v kódovaní dumpu (UTF-8).
+_COPY_ESCAPE_RE = re.compile(r"\\(?:([0-7]{1,3})|x([0-9A-Fa-f]{1,2})|(.))", re.DOTALL)
+_COPY_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v"}
+COPY_NULL = r"\N"
+
+
+def copy_unescape(s: str) -> str:
+    """Odstráni COPY escape sekvencie z jednej hodnoty (nie z \\N – to rieši volajúci)."""
+    if "\\" not in s:
+        return s
+    out = bytearray()
+    pos = 0
+    for m in _COPY_ESCAPE_RE.finditer(s):
+        out += s[pos:m.start()].encode("utf-8")
+        octal, hexa, char = m.groups()
+        if octal is not None:
+            out.append(int(octal, 8) & 0xFF)
+        elif hexa is not None:
+            out.append(int(hexa, 16))
+        else:
+            out += _COPY_ESCAPES.get(char, char).encode("utf-8")
+        pos = m.end()
+    out += s[pos:].encode("utf-8")
+    return out.decode("utf-8", errors="replace")
+
+
+class CopyRowDecoder:
+    """
+    Dekóder riadkov jednej COPY sekcie, zostavený raz z hlavičky stĺpcov.
+
+    decoder(line) (v horúcich slučkách radšej priamo decoder.decode) vráti
+    tuple hodnôt LEN pre požadované `columns` (v ich poradí): riadok sa delí
+    len po posledný potrebný stĺpec (split s maxsplit), \\N aj chýbajúci stĺpec
+    sa zmenia na `null` a escape sekvencie sa odstránia.
+
+    decode sa generuje pre konkrétne indexy stĺpcov (ako namedtuple), takže
+    projekcia aj NULL / escape kontrola sú priamo vo výraze bez slučky:
+    riadok bez spätnej lomky (bežný prípad) ide bez ďalšej práce a inak sa
+    NULL mení až po projekcii a copy_unescape beží len na vybraných hodnotách,
+    ktoré lomku naozaj obsahujú.
+    """
+
+    def __init__(self, col_order, columns, null=None):
+        self.col_order = list(col_order)
+        self.columns = list(columns)
+        self.null = null
+        col_lc = [c.lower() for c in self.col_order]
+        self.indexes = [_column_index(col_lc, c.lower()) for c in self.columns]
+        present = [i for i in self.indexes if i is not None]
+        self.width = max(present) + 1 if present else 0
+        self.complete = None not in self.indexes
+        self.decode = self._compile()
+
+    def _compile(self):
+        plain = ", ".join("null" if i is None else f"p[{i}]" for i in self.indexes)
+        unescaped = ", ".join(
+            "null" if i is None
+            else f'null if (v := p[{i}]) == COPY_NULL else v if v is null or "\\\\" not in v else unescape(v)'
+            for i in self.indexes
+        )
+        src = (
+            "def decode(line):\n"
+            f"    p = line.split('\\t', {self.width})\n"
+            f"    if len(p) < {self.width}:\n"
+            "        # kratší riadok: chýbajúce hodnoty ako NULL\n"
+            f"        p += [null] * ({self.width} - len(p))\n"
+            "    if '\\\\' not in line:\n"
+            f"        return ({plain},)\n"
+            f"    return ({unescaped},)\n"
+        )
+        namespace = {"null": self.null, "COPY_NULL": COPY_NULL, "unescape": copy_unescape}
+        exec(src, namespace)
+        return namespace["decode"]
+
+    def __reduce__(self):
+        # posiela sa do worker procesov; decode sa vygeneruje znova
+        return (CopyRowDecoder, (self.col_order, self.columns, self.null))
+
+    def has(self, column: str) -> bool:
+        return self.indexes[self.columns.index(column)] is not None
+
+    def __call__(self, line: str):
+        return self.decode(line)
+
+
+def scan_dump(lines, handlers):
+    """
+    Jeden prechod dumpom. Každú sekciu `COPY rpo.<tabuľka>` pošle handleru
+    registrovanému pre danú tabuľku, ostatné sekcie preskočí.
+
+    Handler má metódy:
+      start(col_order) – hlavička COPY so zoznamom stĺpcov
+      feed(line)       – jeden dátový riadok (bez koncového \\n)
+      finish()         – koniec sekcie (riadok "\\.")
+      flush()          – po skončení prechodu (dobehnutie odložených dát)
+
+    Prechod skončí hneď, ako sú všetky registrované tabuľky spracované.
+    """
+    pending = set(handlers)
+    handler = None
+    phase = None
+    n_rows = n_bytes = 0
+
+    for raw in lines:
+        line = raw.rstrip("\n")
+
+        if handler is None:
+            if not line.startswith("COPY rpo."):
+                continue
+            table = re.split(r"[\s(]", line[len("COPY rpo."):], maxsplit=1)[0]
+            if table not in pending:
+                continue
+            m = COPY_HEADER_RE.match(line)
+            if not m:
+                raise RuntimeError(f"Nenašiel som zoznam stĺpcov v COPY rpo.{table}")
+            col_order = [c.strip().strip('"') for c in m.group(2).split(",")]
+            handler = handlers[table]
+            phase = RUN_STATS.begin(table)
+            n_rows = n_bytes = 0
+            handler.start(col_order)
+            continue
+
+        if line == r"\.":
+            handler.finish()
+            # bajty = dĺžka dekomprimovaného textu sekcie (znaky vrátane \n)
+            RUN_STATS.end(phase, rows=n_rows, bytes_read=n_bytes)
+            handler = None
+            pending.discard(table)
+            if not pending:
+                break
+            continue
+
+        n_rows += 1
+        n_bytes += len(raw)
+        handler.feed(line)
+
+    for h in handlers.values():
+        h.flush()
+
+
+# --------- pg_dump custom formát (-Fc) ---------
+#
+# Archív pg_dump -Fc (pg_backup_archiver.c, pg_backup_custom.c):
+#   "PGDMP", verzia (major, minor, rev), intSize, offSize, formát (1 = custom),
+#   kompresia – do 1.14 int úroveň (0 = bez, inak zlib), od 1.15 bajt algoritmu
+#   (0 none, 1 gzip, 2 lz4, 3 zstd), čas vytvorenia (7 intov), názov DB,
+#   verzia servera a pg_dump
+#   TOC: počet položiek, každá: dumpId, hadDumper, tableoid, oid, tag, desc,
+#   section, defn, dropStmt, copyStmt, namespace, tablespace, tableam (1.14+),
+#   relkind (1.16+), owner, withOids, závislosti (do NULL), offset dát (flag + offSize B)
+#   dátové bloky: typ (1 = dáta tabuľky, 3 = bloby), dumpId, chunky (int dĺžka + bajty)
+#   až po dĺžku 0; pri kompresii tvoria chunky bloku jeden stream
+# int = bajt znamienka + intSize bajtov little-endian, str = int dĺžka (-1 = NULL) + bajty.
+#
+# Položka "TABLE DATA" má v copyStmt hlavičku "COPY rpo.<t> (...) FROM stdin;" a dáta
+# sú samotné riadky COPY. Čítajú sa len bloky potrebných tabuliek (skok na offset),
+# nič iné sa nedekomprimuje. Ak offsety v TOC chýbajú (pg_dump písal do rúry), zistia
+# sa prechodom hlavičiek blokov, ktorý dáta len preskakuje.
+
+PGDMP_MAGIC = b"PGDMP"
+PGDMP_MIN_VERSION = (1, 10, 0)
+PGDMP_MAX_VERSION = (1, 16, 0)
+_K_OFFSET_POS_NOT_SET, _K_OFFSET_POS_SET, _K_OFFSET_NO_DATA = 1, 2, 3
+_BLK_DATA, _BLK_BLOBS = 1, 3
+PGDMP_COMPRESSION = {0: "none", 1: "gzip", 2: "lz4", 3: "zstd"}
+CUSTOM_READ_CHUNK = 1024 * 1024  # dekomprimovaných bajtov na jednu dávku riadkov
+CUSTOM_PREFETCH = 4  # dávok dopredu na tabuľku (dekompresia beží vo vlákne)
+
+PgDumpTocEntry = namedtuple("PgDumpTocEntry", "dump_id desc namespace tag copy_stmt data_state offset")
+
+
+class CustomDumpReader:
+    """
+    Čítač pg_dump custom archívu: pri otvorení prečíta hlavičku a TOC,
+    dáta jednotlivých položiek potom číta na požiadanie (každé volanie
+    iter_line_batches má vlastný súbor, takže tabuľky môžu ísť paralelne).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._offsets = None
+        with self.path.open("rb") as f:
+            self._read_header(f)
+            self.entries = self._read_toc(f)
+            self.data_start = f.tell()
+
+    # --- primitíva formátu ---
+
+    @staticmethod
+    def _byte(f) -> int:
+        b = f.read(1)
+        if not b:
+            raise EOFError("Neočakávaný koniec pg_dump archívu")
+        return b[0]
+
+    def _int(self, f) -> int:
+        data = f.read(1 + self.int_size)
+        if len(data) < 1 + self.int_size:
+            raise EOFError("Neočakávaný koniec pg_dump archívu")
+        value = int.from_bytes(data[1:], "little")
+        return -value if data[0] else value
+
+    def _str(self, f):
+        n = self._int(f)
+        if n < 0:
+            return None
+        data = f.read(n)
+        if len(data) < n:
+            raise EOFError("Neočakávaný koniec pg_dump archívu")
+        return data.decode("utf-8")
+
+    def _offset(self, f):
+        state = self._byte(f)
+        return state, int.from_bytes(f.read(self.off_size), "little")
+
+    # --- hlavička a TOC ---
+
+    def _read_header(self, f):
+        if f.read(5) != PGDMP_MAGIC:
+            raise ValueError(f"{self.path} nie je pg_dump custom archív (chýba PGDMP)")
+        self.version = (self._byte(f), self._byte(f), self._byte(f))
+        if not PGDMP_MIN_VERSION <= self.version <= PGDMP_MAX_VERSION:
+            raise ValueError(f"Nepodporovaná verzia pg_dump archívu: {'.'.join(map(str, self.version))}")
+        self.int_size = self._byte(f)
+        self.off_size = self._byte(f)
+        fmt = self._byte(f)
+        if fmt != 1:
+            raise ValueError(f"Nie je to custom formát pg_dump (formát {fmt})")
+        if self.version >= (1, 15, 0):
+            self.compression = PGDMP_COMPRESSION.get(self._byte(f), "?")
+        else:
+            self.compression = "gzip" if self._int(f) != 0 else "none"
+        for _ in range(7):  # sec, min, hour, mday, mon, year, isdst
+            self._int(f)
+        self.dbname = self._str(f)
+        self.server_version = self._str(f)
+        self.pg_dump_version = self._str(f)
+
+    def _read_toc(self, f):
+        v = self.version
+        entries = []
+        for _ in range(self._int(f)):
+            dump_id = self._int(f)
+            self._int(f)  # hadDumper
+            self._str(f)  # tableoid
+            self._str(f)  # oid
+            tag = self._str(f)
+            desc = self._str(f)
+            if v >= (1, 11, 0):
+                self._int(f)  # section
+            self._str(f)  # defn
+            self._str(f)  # dropStmt
+            copy_stmt = self._str(f)
+            namespace = self._str(f)
+            self._str(f)  # tablespace
+            if v >= (1, 14, 0):
+                self._str(f)  # tableam
+            if v >= (1, 16, 0):
+                self._int(f)  # relkind
+            self._str(f)  # owner
+            self._str(f)  # withOids
+            while self._str(f) is not None:  # závislosti
+                pass
+            state, offset = self._offset(f)
+            entries.append(PgDumpTocEntry(dump_id, desc, namespace, tag, copy_stmt, state, offset))
+        return entries
+
+    def table_data(self, namespace: str, table: str):
+        for e in self.entries:
+            if e.desc == "TABLE DATA" and e.namespace == namespace and e.tag == table:
+                return e
+        return None
+
+    # --- dáta ---
+
+    def _scan_blocks(self):
+        """{dumpId: offset bloku} prechodom dátových blokov (dáta sa len preskočia)."""
+        offsets = {}
+        with self.path.open("rb") as f:
+            f.seek(self.data_start)
+            while True:
+                pos = f.tell()
+                blk = f.read(1)
+                if not blk:
+                    return offsets
+                dump_id = self._int(f)
+                offsets[dump_id] = pos
+                if blk[0] == _BLK_BLOBS:
+                    # bloby: (oid, chunky) ... až po oid 0
+                    while self._int(f) != 0:
+                        self._skip_chunks(f)
+                elif blk[0] == _BLK_DATA:
+                    self._skip_chunks(f)
+                else:
+                    raise ValueError(f"Neznámy typ bloku {blk[0]} na pozícii {pos}")
+
+    def _skip_chunks(self, f):
+        while True:
+            n = self._int(f)
+            if n <= 0:
+                return
+            f.seek(n, os.SEEK_CUR)
+
+    def data_offset(self, entry: PgDumpTocEntry):
+        if entry.data_state == _K_OFFSET_POS_SET:
+            return entry.offset
+        if entry.data_state == _K_OFFSET_NO_DATA:
+            return None
+        if self._offsets is None:
+            print("🔎 Archív nemá offsety dát, prechádzam hlavičky blokov ...")
+            self._offsets = self._scan_blocks()
+        return self._offsets.get(entry.dump_id)
+
+    def _decompressor(self):
+        if self.compression == "none":
+            return None
+        if self.compression == "gzip":
+            return zlib.decompressobj()
+        if self.compression == "zstd" and zstandard is not None:
+            return zstandard.ZstdDecompressor().decompressobj()
+        raise RuntimeError(f"Kompresia pg_dump archívu {self.compression!r} nie je podporovaná")
+
+    def iter_data(self, entry: PgDumpTocEntry):
+        """Dekomprimované bajty dát položky po chunkoch archívu."""
+        offset = self.data_offset(entry)
+        if offset is None:
+            return
+        inflater = self._decompressor()
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            blk = self._byte(f)
+            dump_id = self._int(f)
+            if blk != _BLK_DATA or dump_id != entry.dump_id:
+                raise ValueError(f"Na offsete {offset} nie sú dáta položky {entry.dump_id} ({entry.tag})")
+            while True:
+                n = self._int(f)
+                if n <= 0:
+                    break
+                data = f.read(n)
+                if len(data) < n:
+                    raise EOFError("Neočakávaný koniec pg_dump archívu")
+                yield inflater.decompress(data) if inflater else data
+        if inflater is not None:
+            tail = inflater.flush()
+            if tail:
+                yield tail
+
+    def iter_line_batches(self, entry: PgDumpTocEntry, chunk_size: int = CUSTOM_READ_CHUNK):
+        """Riadky COPY (bez konca riadku) po dávkach ~chunk_size bajtov; prípadný koniec "\\." sa vynechá."""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pending = ""
+        buf = []
+        size = 0
+
+        def split(data, final=False):
+            nonlocal pending
+            lines = (pending + decoder.decode(data, final=final)).split("\n")
+            pending = lines.pop()
+            if final and pending:
+                lines.append(pending)
+                pending = ""
+            if "\\." in lines:
+                return lines[:lines.index("\\.")], True
+            return lines, False
+
+        for data in self.iter_data(entry):
+            buf.append(data)
+            size += len(data)
+            if size >= chunk_size:
+                lines, end = split(b"".join(buf))
+                buf, size = [], 0
+                if lines:
+                    yield lines
+                if end:
+                    return
+        lines, _ = split(b"".join(buf), final=True)
+        if lines:
+            yield lines
+
+
+class _BackgroundIter:
+    """
+    Iterátor, ktorý `items` číta vo vlákne cez ohraničenú frontu (prefetch).
+    Vlákno beží od vytvorenia, nie až od prvého next() – viac takých
+    čitateľov sa tak prekrýva, aj keď sa konzumujú jeden po druhom.
+    close() vlákno zastaví (aj keď sa z iterátora nič nečítalo).
+    """
+
+    def __init__(self, items, maxsize: int):
+        self._out = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, args=(items,), name="rpo-inflate", daemon=True)
+        self._worker.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self, items):
+        try:
+            for item in items:
+                if not self._put(item):
+                    return
+            self._put(None)
+        except BaseException as e:  # chybu prepošleme čitateľovi
+            self._put(e)
+
+    def __iter__(self):
+        while True:
+            item = self._out.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def close(self):
+        self._stop.set()
+        self._worker.join()
+
+
+def is_custom_dump(dump_path: Path) -> bool:
+    with Path(dump_path).open("rb") as f:
+        return f.read(len(PGDMP_MAGIC)) == PGDMP_MAGIC
+
+
+def scan_custom_dump(dump_path: Path, handlers, prefetch: int = CUSTOM_PREFETCH):
+    """
+    scan_dump pre pg_dump custom archív: handlerom pošle len dáta ich tabuliek
+    (rovnaké rozhranie start/feed/finish/flush). Entry tabuľky idú pred
+    organizáciami, takže OrganizationsHandler nemusí nič odkladať na disk.
+    Každá tabuľka sa dekomprimuje vo vlastnom vlákne s prefetch dávkami dopredu;
+    všetky vlákna sa spustia hneď, takže neskoršie tabuľky sa rozbaľujú už počas
+    spracovania skorších.
+    """
+    reader = CustomDumpReader(dump_path)
+    print(
+        f"🗂️ pg_dump custom archív v{'.'.join(map(str, reader.version))} ({reader.pg_dump_version}), "
+        f"{len(reader.entries)} položiek TOC, kompresia {reader.compression}"
+    )
+    jobs = []
+    for table in sorted(handlers, key=lambda t: t == "organizations"):
+        entry = reader.table_data("rpo", table)
+        if entry is None:
+            continue
+        m = COPY_HEADER_RE.match(entry.copy_stmt or "")
+        if not m:
+            raise RuntimeError(f"Nenašiel som zoznam stĺpcov v COPY rpo.{table}")
+        col_order = [c.strip().strip('"') for c in m.group(2).split(",")]
+        reader.data_offset(entry)  # prípadný prechod blokov ešte pred spustením vlákien
+        jobs.append((table, col_order, entry))
+
+    streams = [_BackgroundIter(reader.iter_line_batches(entry), prefetch) for _, _, entry in jobs]
+    try:
+        for (table, col_order, _), stream in zip(jobs, streams):
+            handler = handlers[table]
+            phase = RUN_STATS.begin(table)
+            n_rows = n_bytes = 0
+            handler.start(col_order)
+            feed = handler.feed
+            for lines in stream:
+                n_rows += len(lines)
+                for line in lines:
+                    n_bytes += len(line) + 1
+                    feed(line)
+            handler.finish()
+            RUN_STATS.end(phase, rows=n_rows, bytes_read=n_bytes)
+    finally:
+        for stream in streams:
+            stream.close()
+
+    for h in handlers.values():
+        h.flush()
+
+
+def scan_dump_file(dump_path: Path, handlers):
+    """scan_dump nad súborom – plain SQL dump (gzip) alebo pg_dump custom archív podľa magic."""
+    if is_custom_dump(dump_path):
+        scan_custom_dump(dump_path, handlers)
+        return
+    with open_dump_lines(dump_path) as gz:
+        scan_dump(gz, handlers)
+
+
+def _reduce_entry_lines(table: str, decoder, lines, best, history=None):
+    """
+    Zredukuje dávku riadkov jednej z ENTRY_TABLES do `best` (EntryReducer;
+    na organizáciu ostane jeden záznam podľa better funkcie tabuľky).
+    decoder = CopyRowDecoder na (org, hodnota, effective_from, effective_to, updated_at).
+    S `history` (slovník) sa doň navyše pridávajú všetky záznamy
+    {org_id: [(effective_from, effective_to, updated_at, hodnota), ...]}.
+    """
+    required = ENTRY_TABLES[table]["required"]
+    decode = decoder.decode
+    add = best.add
+
+    for line in lines:
+        org_id, value, eff_from, eff_to, updated = decode(line)
+        if not org_id or (required and not value):
+            continue
+
+        add(org_id, value, eff_from, eff_to, updated)
+        if history is not None:
+            recs = history.get(org_id)
+            if recs is None:
+                recs = history[org_id] = []
+            recs.append((eff_from, eff_to, updated, value))
+    return best
+
+
+def _reduce_entry_batch(table: str, decoder, text: str, keep_history: bool = False):
+    # beží vo worker procese; riadky prídu spojené jedným stringom (lacnejší pickle)
+    history = {} if keep_history else None
+    best = _reduce_entry_lines(table, decoder, text.split("\n"), EntryReducer(table), history)
+    return best, history
+
+
+def _entry_decoder(table: str, col_order):
+    """CopyRowDecoder pre _reduce_entry_lines; None, ak sekcia nemá čo mapovať."""
+    spec = ENTRY_TABLES[table]
+    decoder = CopyRowDecoder(
+        col_order,
+        ["organization_id", spec["column"], "effective_from", "effective_to", "updated_at"],
+    )
+    if not decoder.has("organization_id") or (spec["required"] and not decoder.has(spec["column"])):
+        # bez organization_id alebo povinnej hodnoty nemáme čo mapovať
+        return None
+    return decoder
+
+
+class EntryMapHandler:
+    """
+    Handler pre jednu z ENTRY_TABLES: z histórie záznamov si pre každú
+    organizáciu nechá jeden "aktuálny" (podľa better funkcie tabuľky).
+    Počas parsovania je `best` EntryReducer, po konci sekcie sa zmrazí
+    do CompactEntryMap.
+
+    Riadky sa spracúvajú po dávkach. S `executor` (ProcessPoolExecutor) idú
+    dávky do worker procesov a čiastkové mapy sa zlúčia v poradí dávok;
+    rozpracovaných je naraz najviac 2 * `workers` dávok.
+
+    S history=True (RPO_HISTORY) sa zbierajú aj všetky záznamy a po konci
+    sekcie z nich vznikne `history` (EntryHistory).
+    """
+
+    def __init__(self, table: str, executor=None, workers: int = 1, history: bool = HISTORY):
+        self.table = table
+        self.spec = ENTRY_TABLES[table]
+        self.best = EntryReducer(table)
+        self.history = None
+        self._history = {} if history else None
+        self.done = False
+        self.executor = executor
+        self._decoder = None
+        self._batch = []
+        self._futures = deque()
+        self._max_inflight = 2 * max(1, workers)
+
+    def start(self, col_order):
+        print(self.spec["intro"])
+        self._decoder = _entry_decoder(self.table, col_order)
+        print(f"🧱 rpo.{self.table}: {len(col_order)} stĺpcov")
+
+    def feed(self, line):
+        self._batch.append(line)
+        if len(self._batch) >= PARSE_BATCH_LINES:
+            self._dispatch()
+
+    def _dispatch(self):
+        lines, self._batch = self._batch, []
+        if not lines or self._decoder is None:
+            return
+        if self.executor is None:
+            _reduce_entry_lines(self.table, self._decoder, lines, self.best, self._history)
+            return
+        self._futures.append(self.executor.submit(
+            _timed_call, _reduce_entry_batch,
+            self.table, self._decoder, "\n".join(lines), self._history is not None,
+        ))
+        while len(self._futures) > self._max_inflight:
+            self._merge(self._futures.popleft().result())
+
+    def _merge(self, result):
+        cpu, (partial, history) = result
+        RUN_STATS.add_worker_cpu(cpu)
+        self.best.merge(partial)
+        if history:
+            # dávky prichádzajú v poradí, takže záznamy organizácie ostávajú v poradí z dumpu
+            for org_id, recs in history.items():
+                old = self._history.get(org_id)
+                if old is None:
+                    self._history[org_id] = recs
+                else:
+                    old.extend(recs)
+
+    def finish(self):
+        self._dispatch()
+        while self._futures:
+            self._merge(self._futures.popleft().result())
+        dict_encode = self.spec.get("dict_encode", False)
+        self.best = self.best.freeze()
+        if self._history is not None:
+            self.history = EntryHistory(self.spec["field"], self._history, dict_encode=dict_encode)
+            self._history = None
+            print(f"🕰️ História rpo.{self.table}: {self.history.intervals()} záznamov")
+        self.done = True
+        print(self.spec["summary"].format(n=len(self.best)))
+
+    def flush(self):
+        pass
+
+
+# stĺpce rpo.organizations, ktoré potrebujeme (v poradí rozbaľovania v _compile_join)
+ORG_COLUMNS = [
+    "id", "established_on", "terminated_on", "actualized_at",
+    "created_at", "updated_at", "source_register",
+]
+# keď názov nie je v organization_name_entries, skúsime tieto stĺpce organizácie
+ORG_NAME_FALLBACKS = ["business_name", "name", "full_name"]
+
+
+class OrganizationsHandler:
+    """
+    Handler pre rpo.organizations: pripojí názov, mesto, kraj a IČO
+    z entry máp a nazbiera finálne riadky (sort_key, row_values).
+
+    Mapy môžu byť hotové slovníky alebo EntryMapHandler-y z toho istého
+    prechodu. Ak sekcia organizácií príde skôr, než sú tie handlery hotové,
+    riadky sa odložia do dočasného súboru a spracujú sa až vo flush().
+
+    S as_of (YYYY-MM-DD, mapy sú potom EntryHistoryView k tomu dňu) sa vynechajú
+    organizácie založené neskôr, neskorší zánik sa nezobrazí a last_modified
+    berie len časy do toho dňa.
+    """
+
+    def __init__(self, names_map, addr_map, ident_map, city_region_map, as_of: str = None):
+        self.sources = (names_map, addr_map, ident_map)
+        self.city_region_map = city_region_map
+        self.as_of = as_of
+        self.rows = RowSorter()
+        self.col_order = []
+        self._spill = None
+        self._spill_path = None
+
+    def _ready(self):
+        return all(
+            not isinstance(s, EntryMapHandler) or s.done for s in self.sources
+        )
+
+    def _maps(self):
+        return [s.best if isinstance(s, EntryMapHandler) else s for s in self.sources]
+
+    def start(self, col_order):
+        self.col_order = col_order
+        print(f"🧱 rpo.organizations má {len(col_order)} stĺpcov")
+        if not self._ready():
+            fd, path = tempfile.mkstemp(prefix="rpo_orgs_", suffix=".txt.gz")
+            os.close(fd)
+            self._spill_path = Path(path)
+            self._spill = gzip.open(self._spill_path, "wt", encoding="utf-8", compresslevel=1)
+            print("⏳ Entry tabuľky ešte nie sú načítané, odkladám organizácie na disk ...")
+        else:
+            self._begin_join()
+
+    def _begin_join(self):
+        self._process = self._compile_join()
+
+    def feed(self, line):
+        if self._spill is not None:
+            self._spill.write(line)
+            self._spill.write("\n")
+        else:
+            self._process(line)
+
+    def finish(self):
+        print("🔚 Koniec COPY rpo.organizations")
+        if self._spill is not None:
+            self._spill.close()
+
+    def flush(self):
+        if self._spill_path is None:
+            return
+        print("🔁 Spracúvam odložené organizácie ...")
+        self._begin_join()
+        try:
+            with RUN_STATS.phase("organizations_join") as ph, \
+                    gzip.open(self._spill_path, "rt", encoding="utf-8", newline="") as f:
+                for raw in f:
+                    self._process(raw.rstrip("\n"))
+                    ph["rows"] += 1
+        finally:
+            self._spill = None
+            self._spill_path.unlink()
+            self._spill_path = None
+
+    def _compile_join(self):
+        """
+        Zostaví spracovanie jedného riadku organizácie pre aktuálnu COPY sekciu:
+        dekóder len potrebných stĺpcov, lookupy do entry máp a prevod dátumov
+        sú naviazané vopred, v slučke sa už nič nehľadá.
+        """
+        # z ORG_NAME_FALLBACKS len stĺpce, ktoré v sekcii naozaj sú
+        col_lc = [c.lower() for c in self.col_order]
+        fallbacks = [c for c in ORG_NAME_FALLBACKS if _column_index(col_lc, c) is not None]
+        decode = CopyRowDecoder(self.col_order, ORG_COLUMNS + fallbacks, null="").decode
+        name_lookup, addr_lookup, ident_lookup = (
+            _entry_lookup(m, field) for m, field in zip(self._maps(), ("name", "municipality", "ico"))
+        )
+        crm = self.city_region_map
+        if isinstance(crm, CityRegionIndex):
+            region_for = crm.region_for
+        else:
+            def region_for(city):
+                return guess_region(city, crm)
+        to_dmy = _to_dmy
+        unpack_ts = _unpack_ts
+        add_row = self.rows.add
+        as_of = self.as_of
+
+        def process(line):
+            (
+                org_id, established_on_raw, terminated_on_raw, actualized_raw,
+                created_raw, updated_raw, source_register, *name_fallbacks,
+            ) = decode(line)
+            if not org_id:
+                return
+            if as_of is not None:
+                # stav k dňu as_of: firma ešte neexistovala / ešte nezanikla / neskoršie zmeny
+                if (established_on_raw or created_raw)[:10] > as_of:
+                    return
+                if terminated_on_raw[:10] > as_of:
+                    terminated_on_raw = ""
+                actualized_raw, updated_raw = (
+                    v if v[:10] <= as_of else "" for v in (actualized_raw, updated_raw)
+                )
+                last_created_raw = created_raw if created_raw[:10] <= as_of else ""
+            else:
+                last_created_raw = created_raw
+
+            # názov (fallback na stĺpce organizácie), mesto, kraj, IČO
+            name_val, name_updated = name_lookup(org_id)
+            if not name_val:
+                name_val = next((alt for alt in name_fallbacks if alt), "")
+            city, addr_updated = addr_lookup(org_id)
+            city = city or ""
+            region = region_for(city) if city else ""
+            ico, ident_updated = ident_lookup(org_id)
+
+            # last_modified len na informáciu (na stĺpec v CSV), NIE na sort:
+            # najväčší z časov organizácie a updated_at jej záznamov ("" je najmenší)
+            last_modified_raw = max(actualized_raw, updated_raw, last_created_raw)
+            packed = None
+            for upd in (name_updated, addr_updated, ident_updated):
+                if upd is None:
+                    continue
+                if upd.__class__ is int:
+                    if packed is None or upd > packed:
+                        packed = upd
+                elif upd > last_modified_raw:
+                    last_modified_raw = upd
+            if packed is not None:
+                upd = unpack_ts(packed)
+                if upd > last_modified_raw:
+                    last_modified_raw = upd
+
+            # 🔑 TERAZ: triedime primárne podľa established_on (novšie prvé),
+            # fallback len keď established_on chýba, použijeme created_at.
+            add_row(established_on_raw or created_raw, [
+                org_id,
+                ico or "",
+                name_val,
+                city,
+                region,
+                to_dmy(established_on_raw),
+                to_dmy(terminated_on_raw),
+                to_dmy(last_modified_raw),
+                source_register,
+            ])
+
+        return process
+
+
+def _entry_lookup(m, field: str):
+    """org_id -> (hodnota, updated_at) pre CompactEntryMap, EntryHistoryView aj obyčajný slovník."""
+    if isinstance(m, (CompactEntryMap, EntryHistoryView)):
+        return m.lookup
+
+    def lookup(org_id):
+        rec = m.get(org_id)
+        if not rec:
+            return None, None
+        return rec.get(field), rec.get("updated_at") or None
+    return lookup
+
+
+# --------- join po bucketoch (hash podľa organization_id) ---------
+
+def _bucket_of(org_id: str, buckets: int) -> int:
+    if org_id.isdigit():
+        return int(org_id) % buckets
+    return zlib.crc32(org_id.encode("utf-8")) % buckets
+
+
+class BucketSpillHandler:
+    """
+    Handler, ktorý riadky jednej COPY sekcie nespracúva, len ich podľa
+    stĺpca `key_column` (organization_id) rozdelí do `buckets` súborov v `spill_dir`.
+    Súbor bucketu je postupnosť gzip členov (zapisuje sa po JOIN_SPILL_CHUNK bajtoch),
+    poradie riadkov v rámci bucketu ostáva ako v dumpe.
+
+    S numbered=True sa pred riadok pridá jeho poradové číslo v sekcii
+    ("<seq>\t<riadok>"), podľa ktorého sa výsledky bucketov spätne zlúčia.
+    """
+
+    def __init__(self, table: str, key_column: str, spill_dir: Path, buckets: int, numbered: bool = False):
+        self.table = table
+        self.key_column = key_column
+        self.buckets = buckets
+        self.paths = [spill_dir / f"{table}_{b:04d}.txt.gz" for b in range(buckets)]
+        self.numbered = numbered
+        self.col_order = None
+        self.rows = 0
+        self.done = False
+        self._key_idx = None
+        self._buffers = [[] for _ in range(buckets)]
+        self._sizes = [0] * buckets
+
+    def start(self, col_order):
+        self.col_order = col_order
+        self._key_idx = _column_index([c.lower() for c in col_order], self.key_column)
+        print(f"🧱 rpo.{self.table}: {len(col_order)} stĺpcov, delím do {self.buckets} bucketov ...")
+
+    def feed(self, line):
+        idx = self._key_idx
+        if idx is None:
+            return
+        parts = line.split("\t", idx + 1)
+        if len(parts) <= idx:
+            return
+        b = _bucket_of(parts[idx], self.buckets)
+        if self.numbered:
+            line = f"{self.rows}\t{line}"
+        self.rows += 1
+        self._buffers[b].append(line)
+        self._sizes[b] += len(line) + 1
+        if self._sizes[b] >= JOIN_SPILL_CHUNK:
+            self._write(b)
+
+    def _write(self, b: int):
+        lines = self._buffers[b]
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with self.paths[b].open("ab") as f:
+            f.write(gzip.compress(data, compresslevel=1, mtime=0))
+        self._buffers[b] = []
+        self._sizes[b] = 0
+
+    def finish(self):
+        for b in range(self.buckets):
+            self._write(b)
+        self.done = True
+
+    def flush(self):
+        pass
+
+
+def _read_bucket_lines(path: Path):
+    if not path.exists():
+        return
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        for raw in f:
+            yield raw.rstrip("\n")
+
+
+class _BucketRows:
+    """Náhrada RowSorter pre OrganizationsHandler v buckete: zbiera (seq, sort_key, row_values)."""
+
+    def __init__(self):
+        self.seq = 0
+        self.items = []
+
+    def add(self, sort_key, row_values):
+        self.items.append((self.seq, sort_key, row_values))
+
+
+def _join_bucket(entry_inputs, org_input, city_region_map, out_path: Path):
+    """
+    Zredukuje entry tabuľky jedného bucketu do máp a spojí s organizáciami bucketu.
+    entry_inputs = {tabuľka: (col_order, cesta)}, org_input = (col_order, cesta).
+    Výsledok (seq, sort_key, row_values) v poradí seq zapíše ako pickle dávky do out_path;
+    vráti (počet riadkov, počet org. v mapách, Counter miest bez kraja).
+    Beží v hlavnom procese aj vo worker procese.
+    """
+    maps = []
+    for table in ENTRY_TABLES:
+        best = EntryReducer(table)
+        col_order, path = entry_inputs.get(table, (None, None))
+        decoder = _entry_decoder(table, col_order) if col_order is not None else None
+        if decoder is not None:
+            _reduce_entry_lines(table, decoder, _read_bucket_lines(path), best)
+        maps.append(best.freeze())
+    map_rows = sum(len(m) for m in maps)
+
+    before = Counter(getattr(city_region_map, "unresolved", None) or {})
+    orgs = OrganizationsHandler(
+        maps[list(ENTRY_TABLES).index("organization_name_entries")],
+        maps[list(ENTRY_TABLES).index("organization_address_entries")],
+        maps[list(ENTRY_TABLES).index("organization_identifier_entries")],
+        city_region_map,
+    )
+    rows = orgs.rows = _BucketRows()
+    col_order, path = org_input
+    if col_order is not None:
+        orgs.col_order = col_order
+        process = orgs._compile_join()
+        for raw in _read_bucket_lines(path):
+            seq, line = raw.split("\t", 1)
+            rows.seq = int(seq)
+            process(line)
+
+    # menšie dávky ako pri runoch RowSorter – pri zlučovaní je naraz otvorený každý bucket
+    with out_path.open("wb") as f:
+        for i in range(0, len(rows.items), 1_000):
+            pickle.dump(rows.items[i:i + 1_000], f, protocol=pickle.HIGHEST_PROTOCOL)
+    unresolved = Counter(getattr(city_region_map, "unresolved", None) or {})
+    unresolved.subtract(before)
+    return len(rows.items), map_rows, +unresolved
+
+
+class PartitionedJoin:
+    """
+    Join entry tabuliek s rpo.organizations po bucketoch (RPO_JOIN_BUCKETS).
+
+    Počas prechodu dumpom `handlers` len rozdelia riadky všetkých štyroch
+    tabuliek podľa organization_id do bucketov na disku. run() potom
+    každý bucket zredukuje na mapy a spojí s jeho organizáciami (s `executor`
+    paralelne vo worker procesoch) a výsledky zlúči podľa poradia organizácií
+    v dumpe do RowSorter – výstup je rovnaký ako pri joine s celými mapami.
+    Špička pamäte pri joine závisí od veľkosti bucketu, nie celého registra
+    (finálne riadky drží RowSorter, na disk ich odkladá RPO_SORT_MEMORY_MB).
+    """
+
+    def __init__(self, buckets: int, city_region_map, executor=None):
+        self.buckets = buckets
+        self.city_region_map = city_region_map
+        self.executor = executor
+        self.spill_dir = Path(tempfile.mkdtemp(prefix="rpo_join_"))
+        self.handlers = {
+            table: BucketSpillHandler(table, "organization_id", self.spill_dir, buckets)
+            for table in ENTRY_TABLES
+        }
+        self.handlers["organizations"] = BucketSpillHandler(
+            "organizations", "id", self.spill_dir, buckets, numbered=True
+        )
+
+    def _inputs(self, b: int):
+        entry_inputs = {
+            table: (self.handlers[table].col_order, self.handlers[table].paths[b])
+            for table in ENTRY_TABLES
+        }
+        orgs = self.handlers["organizations"]
+        return entry_inputs, (orgs.col_order, orgs.paths[b])
+
+    def run(self) -> "RowSorter":
+        for table, h in self.handlers.items():
+            if not h.done:
+                print(f"⚠️ V dumpe chýba sekcia rpo.{table}")
+        print(f"🔗 Spájam {self.buckets} bucketov ...")
+        crm = self.city_region_map
+        out_paths = [self.spill_dir / f"joined_{b:04d}.pickle" for b in range(self.buckets)]
+        with RUN_STATS.phase("bucket_join") as ph:
+            if self.executor is None:
+                results = [
+                    _join_bucket(*self._inputs(b), crm, out_paths[b]) for b in range(self.buckets)
+                ]
+            else:
+                futures = [
+                    self.executor.submit(_timed_call, _join_bucket, *self._inputs(b), crm, out_paths[b])
+                    for b in range(self.buckets)
+                ]
+                results = []
+                for f in futures:
+                    cpu, result = f.result()
+                    RUN_STATS.add_worker_cpu(cpu)
+                    results.append(result)
+                if isinstance(crm, CityRegionIndex):
+                    for _, _, unresolved in results:
+                        crm.unresolved.update(unresolved)
+            ph["buckets"] = self.buckets
+            ph["max_bucket_rows"] = max(n + m for n, m, _ in results)
+
+            # poradie ako v dumpe → RowSorter dostane riadky presne ako pri joine bez bucketov
+            rows = RowSorter()
+            merged = heapq.merge(*(RowSorter._read_run(p) for p in out_paths), key=itemgetter(0))
+            for _, sort_key, row_values in merged:
+                rows.add(sort_key, row_values)
+            ph["rows"] = len(rows)
+        return rows
+
+    def cleanup(self):
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+# --------- checkpoint máp (podľa SHA-256 dumpu) ---------
+#
+# CACHE_DIR/checkpoints/<sha256>_v<CHECKPOINT_VERSION>/
+#   maps.pickle           {tabuľka: CompactEntryMap} z ENTRY_TABLES
+#   organizations.txt.gz  prvý riadok = stĺpce COPY, potom surové riadky sekcie
+#   meta.json             url, etag, last_modified, size, sha256 (zapisuje sa posledný)
+#
+# Mapa obcí sa sem neukladá – má vlastnú cache podľa obsahu data/obce.csv.
+
+def checkpoint_root() -> Path:
+    return CACHE_DIR / "checkpoints"
+
+
+def checkpoint_dir(sha256: str) -> Path:
+    return checkpoint_root() / f"{sha256}_v{CHECKPOINT_VERSION}"
+
+
+def _checkpoint_metas():
+    root = checkpoint_root()
+    if not root.is_dir():
+        return
+    for d in root.iterdir():
+        try:
+            meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if meta.get("version") == CHECKPOINT_VERSION:
+            yield d, meta
+
+
+def find_checkpoint(sha256: str = None, probe=None, url: str = None):
+    """
+    (adresár, meta) hotového checkpointu pre dump – podľa SHA-256, alebo (ešte
+    pred stiahnutím) podľa ETag, prípadne Last-Modified + veľkosti z probe_dump.
+    Ak je zadané RPO_DUMP_SHA256, musí sedieť aj to. Inak None.
+    """
+    for d, meta in _checkpoint_metas():
+        if DUMP_SHA256 and meta.get("sha256") != DUMP_SHA256.lower():
+            continue
+        if sha256:
+            if meta.get("sha256") == sha256:
+                return d, meta
+            continue
+        if not probe or meta.get("url") != url:
+            continue
+        if probe.get("etag"):
+            if meta.get("etag") == probe["etag"]:
+                return d, meta
+        elif probe.get("last_modified") and (
+            meta.get("last_modified"), meta.get("size")
+        ) == (probe["last_modified"], probe.get("size")):
+            return d, meta
+    return None
+
+
+class _TeeHandler:
+    """Obal handlera, ktorý riadky sekcie zároveň zapisuje do gzip súboru (pre checkpoint)."""
+
+    def __init__(self, handler, path: Path):
+        self.handler = handler
+        self.path = path
+        self._out = None
+
+    def start(self, col_order):
+        self._out = gzip.open(self.path, "wt", encoding="utf-8", compresslevel=1)
+        self._out.write("\t".join(col_order) + "\n")
+        self.handler.start(col_order)
+
+    def feed(self, line):
+        self._out.write(line)
+        self._out.write("\n")
+        self.handler.feed(line)
+
+    def finish(self):
+        self._out.close()
+        self.handler.finish()
+
+    def flush(self):
+        self.handler.flush()
+
+
+def save_checkpoint(dump_meta, maps, orgs_path: Path, history=None):
+    """
+    Uloží mapy (už zmrazené CompactEntryMap) a odložené riadky organizácií,
+    s `history` ({tabuľka: EntryHistory}, RPO_HISTORY=1) aj history.pickle.
+    Zapisuje sa do dočasného adresára a premenuje sa až celý; potom sa
+    prekročený strop RPO_CHECKPOINT_MAX_MB rieši mazaním najstarších.
+    """
+    final = checkpoint_dir(dump_meta["sha256"])
+    tmp = final.with_name(final.name + ".tmp")
+    with RUN_STATS.phase("checkpoint_save") as ph:
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        with (tmp / "maps.pickle").open("wb") as f:
+            pickle.dump(maps, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if history:
+            with (tmp / "history.pickle").open("wb") as f:
+                pickle.dump(history, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if orgs_path is not None and orgs_path.exists():
+            shutil.move(str(orgs_path), tmp / "organizations.txt.gz")
+        size = sum(p.stat().st_size for p in tmp.iterdir())
+        meta = {
+            "version": CHECKPOINT_VERSION,
+            **{k: dump_meta.get(k) for k in ("url", "etag", "last_modified", "size", "sha256")},
+            "bytes": size,
+            "history": bool(history),
+            "created": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta, indent=2) + "\n", encoding="utf-8")
+        shutil.rmtree(final, ignore_errors=True)
+        tmp.rename(final)
+        ph["bytes_written"] = size
+    print(f"💾 Checkpoint máp uložený do {final} ({size / 1e6:.1f} MB)")
+    prune_checkpoints(keep=final)
+
+
+def prune_checkpoints(max_mb: int = None, keep: Path = None):
+    """Zmaže najdlhšie nepoužité checkpointy (podľa mtime meta.json), kým je súčet nad stropom."""
+    budget = (CHECKPOINT_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    root = checkpoint_root()
+    if not root.is_dir():
+        return
+    entries = []
+    for d in root.iterdir():
+        if not d.is_dir():
+            continue
+        size = sum(p.stat().st_size for p in d.iterdir() if p.is_file())
+        marker = d / "meta.json"
+        # nedokončené (bez meta.json) idú na rad ako prvé
+        used = marker.stat().st_mtime if marker.exists() else 0.0
+        entries.append((used, d, size))
+    total = sum(size for _, _, size in entries)
+    for _, d, size in sorted(entries, key=lambda t: t[0]):
+        if total <= budget:
+            break
+        if keep is not None and d == keep:
+            continue
+        shutil.rmtree(d, ignore_errors=True)
+        total -= size
+        print(f"🧹 Zmazaný starý checkpoint {d.name} ({size / 1e6:.1f} MB)")
+
+
+def parse_checkpoint(ckpt: Path, city_region_map, date_str: str = "", base_name: str = "firms"):
+    """
+    Join a export z checkpointu: mapy sa len načítajú, organizácie sa čítajú
+    z odloženej sekcie – dump netreba sťahovať ani parsovať.
+    """
+    print(f"♻️ Načítavam checkpoint máp {ckpt} ...")
+    with RUN_STATS.phase("checkpoint_load") as ph:
+        with (ckpt / "maps.pickle").open("rb") as f:
+            maps = pickle.load(f)
+        ph["rows"] = sum(len(m) for m in maps.values())
+    # nové mtime = naposledy použitý (pre prune_checkpoints)
+    os.utime(ckpt / "meta.json")
+    for table, spec in ENTRY_TABLES.items():
+        print(spec["summary"].format(n=len(maps.get(table, {}))))
+
+    orgs = OrganizationsHandler(
+        maps.get("organization_name_entries", {}),
+        maps.get("organization_address_entries", {}),
+        maps.get("organization_identifier_entries", {}),
+        city_region_map,
+    )
+    _replay_checkpoint_orgs(ckpt, orgs)
+    report_unresolved_cities(city_region_map)
+    return write_slim_parts(orgs.rows, base_name, date_str, city_region_map=city_region_map)
+
+
+def _replay_checkpoint_orgs(ckpt: Path, orgs):
+    """Prehrá odloženú sekciu organizácií z checkpointu do OrganizationsHandler-a."""
+    orgs_path = ckpt / "organizations.txt.gz"
+    if not orgs_path.exists():
+        return
+    with RUN_STATS.phase("organizations") as ph, \
+            gzip.open(orgs_path, "rt", encoding="utf-8", newline="") as f:
+        orgs.start(f.readline().rstrip("\n").split("\t"))
+        for raw in f:
+            orgs.feed(raw.rstrip("\n"))
+            ph["rows"] += 1
+        orgs.finish()
+        orgs.flush()
+
+
+# --------- snapshot k dátumu (as-of) ---------
+
+def asof_base_name(as_of: str) -> str:
+    """Base name partov snapshotu k dátumu: snapshots/asof/<YYYY-MM-DD>/firms_part01.csv.gz ..."""
+    return f"asof/{as_of}/firms"
+
+
+def find_history_checkpoint():
+    """
+    Checkpoint s históriou (history.pickle): prednostne pre dump z dump_meta.json,
+    inak naposledy použitý. Bez neho None.
+    """
+    meta = load_dump_meta() or {}
+    candidates = [
+        (d, m) for d, m in _checkpoint_metas() if (d / "history.pickle").exists()
+    ]
+    for d, m in candidates:
+        if meta.get("sha256") and m.get("sha256") == meta["sha256"]:
+            return d, m
+    if not candidates:
+        return None
+    return max(candidates, key=lambda t: (t[0] / "meta.json").stat().st_mtime)
+
+
+def export_as_of(as_of: str, city_region_map, ckpt: Path = None):
+    """
+    Snapshot stavu k dňu as_of (YYYY-MM-DD) z checkpointu s históriou (RPO_HISTORY=1):
+    hodnoty entry tabuliek platné v ten deň, len firmy založené do toho dňa.
+    Zapisuje do snapshots/asof/<as_of>/ (party, manifest.json, rollupy); hlavný
+    snapshot, jeho stav ani delta sa nemenia.
+    """
+    if ckpt is None:
+        found = find_history_checkpoint()
+        if found is None:
+            raise SystemExit("❌ chýba checkpoint s históriou – najprv beh s RPO_CHECKPOINT=1 RPO_HISTORY=1")
+        ckpt = found[0]
+    print(f"🕰️ Snapshot k {as_of} z checkpointu {ckpt.name} ...")
+    with RUN_STATS.phase("checkpoint_load") as ph:
+        with (ckpt / "history.pickle").open("rb") as f:
+            history = pickle.load(f)
+        ph["rows"] = sum(h.intervals() for h in history.values())
+    os.utime(ckpt / "meta.json")
+
+    views = {table: history[table].view(as_of) for table in ENTRY_TABLES if table in history}
+    orgs = OrganizationsHandler(
+        views.get("organization_name_entries", {}),
+        views.get("organization_address_entries", {}),
+        views.get("organization_identifier_entries", {}),
+        city_region_map,
+        as_of=as_of,
+    )
+    _replay_checkpoint_orgs(ckpt, orgs)
+
+    base_name = asof_base_name(as_of)
+    # v manifeste a rollupoch rovnaký formát dátumu ako hlavný snapshot (DD-MM-YYYY)
+    date_str = date.fromisoformat(as_of).strftime("%d-%m-%Y")
+    out_dir = SNAP_DIR / "asof" / as_of
+    shutil.rmtree(out_dir, ignore_errors=True)
+    out_dir.mkdir(parents=True)
+    sinks = [ManifestBuilder(base_name, date_str, path=out_dir / "manifest.json")]
+    if ROLLUPS:
+        sinks.append(RollupBuilder(base_name, date_str, city_region_map))
+    return write_slim_parts(
+        orgs.rows, base_name, date_str, incremental=False, sinks=sinks, city_region_map=city_region_map
+    )
+
+
+# --------- parsovanie jednotlivých tabuliek ---------
+
+def _parse_entry_map(dump_path: Path, table: str):
+    handler = EntryMapHandler(table)
+    scan_dump_file(dump_path, {table: handler})
+    if not handler.done:
+        # tabuľka v dumpe chýba – správame sa ako pri prázdnej sekcii
+        print(handler.spec["summary"].format(n=0))
+    return handler.best
+
+
+def parse_names_map(dump_path: Path):
+    return _parse_entry_map(dump_path, "organization_name_entries")
+
+
+def parse_address_map(dump_path: Path):
+    return _parse_entry_map(dump_path, "organization_address_entries")
+
+
+def parse_identifier_map(dump_path: Path):
+    """
+    Načíta IČO (IPO) z rpo.organization_identifier_entries.
+
+    Štruktúra tabuľky podľa dokumentácie:
+      id, organization_id, ipo, effective_from, effective_to, created_at, updated_at
+
+    ipo používame ako IČO.
+    """
+    return _parse_entry_map(dump_path, "organization_identifier_entries")
+
+
+# --------- zápis partov (SORT podľa established_on) ---------
+
+SLIM_HEADER = [
+    "organization_id",
+    "ico",
+    "name",
+    "city",
+    "region",
+    "established_on",
+    "terminated_on",
+    "last_modified",
+    "source_register",
+]
+
+
+class RowSorter:
+    """
+    Zbiera riadky (sort_key, row_values) a vráti ich zoradené podľa sort_key
+    zostupne (najnovšie prvé), stabilne – rovnaké poradie ako list.sort(reverse=True).
+
+    S memory_mb > 0 sa pri prekročení odhadovanej veľkosti v pamäti
+    aktuálna dávka zoradí a odloží na disk ako "run"; na konci sa runy
+    zlúčia k-cestným merge-om. Výstup je identický s triedením v pamäti.
+    """
+
+    def __init__(self, memory_mb: int = None):
+        memory_mb = SORT_MEMORY_MB if memory_mb is None else memory_mb
+        self.budget = memory_mb * 1024 * 1024
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.runs = []
+        self.count = 0
+        self._tmp_dir = None
+
+    def __len__(self):
+        return self.count
+
+    def add(self, sort_key, row_values):
+        self.buffer.append((sort_key, row_values))
+        self.count += 1
+        if self.budget:
+            # hrubý odhad: tuple + list + 10 str objektov + ich obsah
+            self.buffer_bytes += 600 + len(sort_key) + sum(map(len, row_values))
+            if self.buffer_bytes >= self.budget:
+                self._spill()
+
+    def _spill(self):
+        if self._tmp_dir is None:
+            self._tmp_dir = Path(tempfile.mkdtemp(prefix="rpo_sort_"))
+        self.buffer.sort(key=_sort_key, reverse=True)
+        path = self._tmp_dir / f"run{len(self.runs):04d}.pickle"
+        with path.open("wb") as f:
+            for i in range(0, len(self.buffer), 10_000):
+                pickle.dump(self.buffer[i:i + 10_000], f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        print(f"💽 Odložený zoradený run {path.name} ({len(self.buffer)} riadkov)")
+        self.buffer = []
+        self.buffer_bytes = 0
+
+    @staticmethod
+    def _read_run(path: Path):
+        with path.open("rb") as f:
+            while True:
+                try:
+                    chunk = pickle.load(f)
+                except EOFError:
+                    return
+                yield from chunk
+
+    def sorted(self):
+        """
+        Zoradí riadky (v pamäti hneď, pri runoch odloží posledný buffer)
+        a vráti iterátor zoradených riadkov; dočasné runy po dočítaní zmaže.
+        """
+        if not self.runs:
+            self.buffer.sort(key=_sort_key, reverse=True)
+            return iter(self.buffer)
+        if self.buffer:
+            self._spill()
+        print(f"🔀 Zlučujem {len(self.runs)} zoradených runov ...")
+        return self._merge_runs()
+
+    def _merge_runs(self):
+        try:
+            # heapq.merge je pri zhode kľúčov stabilný (skorší run má prednosť)
+            yield from heapq.merge(
+                *(self._read_run(p) for p in self.runs), key=_sort_key, reverse=True
+            )
+        finally:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self.runs = []
+            self._tmp_dir = None
+
+
+def _sort_key(t):
+    return t[0]
+
+
+def render_part_csv(part_rows) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(SLIM_HEADER)
+    writer.writerows(part_rows)
+    return buf.getvalue()
+
+
+def write_slim_parts(
+    rows,
+    base_name: str = "firms",
+    date_str: str = "",
+    incremental: bool = INCREMENTAL,
+    columnar: bool = COLUMNAR,
+    partition: str = PARTITION,
+    sinks=None,
+    city_region_map=None,
+):
+    """
+    ZORADÍ riadky (sort_key, row_values) podľa established_on (najnovšie prvé)
+    a rozseká ich do partov:
+
+      snapshots/<base_name>_part01.csv.gz, part02...
+
+    S partition="year"/"month" (RPO_PARTITION) sa party režú podľa obdobia
+    established_on a v rámci obdobia po PARTITION_MAX_ROWS riadkoch:
+
+      snapshots/<base_name>_2026-07_part01.csv.gz, ..._undated_part01.csv.gz
+
+    Nová firma tak zmení len party svojho obdobia, nie posun všetkých hraníc.
+
+    V inkrementálnom režime (RPO_INCREMENTAL=1) sa prepíšu len party, ktorých
+    obsah sa od minulého behu zmenil, nadbytočné staré party sa zmažú
+    a vznikne delta súbor so zmenami voči minulému snapshotu.
+
+    S columnar=True (RPO_COLUMNAR=1) vznikne ku každému partu aj <...>.col.gz.
+
+    sinks – objekty s add_part(cesta, riadky) a finish(), ktoré dostanú každý
+    part (aj nezmenený); predvolene default_part_sinks() podľa env prepínačov
+    (city_region_map potrebujú rollupy na okres a súradnice obce).
+    """
+    print(f"📊 Načítaných {len(rows)} organizácií, triedim podľa established_on ...")
+    with RUN_STATS.phase("sort") as ph:
+        ph["rows"] = len(rows)
+        if isinstance(rows, RowSorter):
+            # pri runoch na disku sa samotný merge zarátava až do fázy zápisu
+            sorted_rows = rows.sorted()
+            ph["spilled_runs"] = len(rows.runs)
+        else:
+            # formát je YYYY-MM-DD, takže stringovo triedenie funguje
+            rows.sort(key=lambda t: t[0], reverse=True)  # najnovšie založené prvé
+            sorted_rows = rows
+
+    prev_state = load_snapshot_state(base_name) if incremental else None
+    prev_parts = prev_state["parts"] if prev_state else {}
+    prev_hashes = prev_state["rows"] if prev_state else {}
+    row_hashes = {}
+    part_digests = {}
+    delta = None
+    if incremental:
+        # pri prvom behu (bez stavu) sa delta nezapisuje ani nezbiera
+        if prev_state is not None:
+            delta = SnapshotDeltaWriter(base_name, prev_state, date_str)
+        elif delta_path(base_name).exists():
+            delta_path(base_name).unlink()
+
+    # {názov súboru: (veľkosť, sha256, nekomprimovaná veľkosť)} – zapísané teraz
+    # (PartCompressor) aj nezmenené zo stavu minulého behu
+    file_info = {}
+    prev_files = prev_state.get("files", {}) if prev_state else {}
+    if sinks is None:
+        sinks = default_part_sinks(base_name, date_str, city_region_map, file_info)
+    compressor = PartCompressor(files=file_info)
+
+    def part_files(p):
+        files = [p if codec == "gzip" else codec_path(p, codec) for codec, _ in compressor.codecs]
+        if columnar:
+            files.append(columnar_path_for(p))
+        return files
+
+    written = []
+    period_parts = Counter()
+    wrote_total = 0
+    rewritten = 0
+
+    def emit_part(period, part_rows):
+        nonlocal wrote_total, rewritten
+        if period is None:
+            out_path = part_path(base_name, len(written) + 1)
+        else:
+            # to isté obdobie sa môže objaviť znova (nečakané sort_key), číslujeme ďalej
+            period_parts[period] += 1
+            out_path = part_path(base_name, period_parts[period], period)
+        col_path = columnar_path_for(out_path)
+        written.append(out_path)
+        for sink in sinks:
+            sink.add_part(out_path, part_rows)
+        text = render_part_csv(part_rows)
+        data = text.encode("utf-8")
+        wrote_total += len(part_rows)
+
+        if incremental:
+            for row_values in part_rows:
+                org_id = row_values[0]
+                h = row_hashes[org_id] = _row_hash(row_values)
+                if delta is not None:
+                    old = prev_hashes.get(org_id)
+                    if old is None:
+                        delta.insert(row_values)
+                    elif old != h:
+                        delta.update(row_values)
+            digest = hashlib.sha256(data).hexdigest()
+            part_digests[out_path.name] = digest
+            if prev_parts.get(out_path.name) == digest and all(
+                p.exists() for p in part_files(out_path)
+            ):
+                for p in part_files(out_path):
+                    if p.name in prev_files:
+                        file_info[p.name] = tuple(prev_files[p.name])
+                print(f"♻️ {out_path.name} bez zmeny ({len(part_rows)} riadkov)")
+                return
+
+        compressor.submit(out_path, data)
+        if columnar:
+            compressor.submit(
+                col_path, encode_columnar_part(part_rows), [("gzip", GZIP_LEVEL)], kind="col"
+            )
+        rewritten += 1
+        print(f"📝 zapísaný {out_path} ({len(part_rows)} riadkov, spolu {wrote_total})")
+
+    write_phase = RUN_STATS.begin("write")
+    max_rows = PARTITION_MAX_ROWS if partition else ROWS_PER_PART
+    part_rows = []
+    current = None
+    for sort_key, row_values in sorted_rows:
+        period = partition_period(sort_key, partition) if partition else None
+        if part_rows and (period != current or len(part_rows) >= max_rows):
+            emit_part(current, part_rows)
+            part_rows = []
+        current = period
+        part_rows.append(row_values)
+    if part_rows:
+        emit_part(current, part_rows)
+
+    compressor.close()
+    for sink in sinks:
+        sink.finish()
+    RUN_STATS.end(
+        write_phase,
+        rows=wrote_total,
+        bytes_uncompressed=sum(compressor.raw_bytes.values()),
+        bytes_written=sum(compressor.compressed_bytes.values()),
+        parts=len(written),
+        parts_rewritten=rewritten,
+    )
+
+    if incremental:
+        keep = {f.name for p in written for f in part_files(p)}
+        for p in list_part_files(base_name):
+            if p.name not in keep:
+                p.unlink()
+                print(f"🧹 Zmazaný nepotrebný part {p.name}")
+
+        if delta is not None:
+            removed = sorted(o for o in prev_hashes if o not in row_hashes)
+            print(
+                f"🔀 Zmeny: {delta.inserted} nových, {delta.updated} zmenených, {len(removed)} odstránených"
+            )
+            delta.finish(removed)
+        save_snapshot_state(
+            base_name, row_hashes, part_digests, date_str,
+            {name: info for name, info in file_info.items() if name in keep},
+        )
+        print(f"♻️ Prepísaných partov: {rewritten} z {len(written)}")
+
+    print(f"🎉 Celkovo zapísaných {wrote_total} riadkov, počet partov: {len(written)}")
+    return wrote_total
+
+
+_PERIOD_RE = re.compile(r"^(\d{4})-(\d{2})-\d{2}")
+
+
+def partition_period(sort_key: str, partition: str) -> str:
+    """Obdobie partu podľa sort_key (YYYY-MM-DD...): "2026" / "2026-07", inak "undated"."""
+    m = _PERIOD_RE.match(sort_key or "")
+    if not m:
+        return "undated"
+    return m.group(1) if partition == "year" else f"{m.group(1)}-{m.group(2)}"
+
+
+# --------- kompresia partov ---------
+
+CODEC_SUFFIX = {"gzip": ".gz", "zstd": ".zst", "br": ".br"}
+
+
+def parse_codecs(spec: str):
+    """
+    "gzip:9,zstd:19,br:11" → [("gzip", 9), ("zstd", 19), ("br", 11)].
+    gzip ostáva vždy (party .csv.gz číta app.js), nedostupné knižnice sa vynechajú.
+    """
+    codecs = []
+    for item in filter(None, (x.strip() for x in spec.split(","))):
+        name, _, level = item.partition(":")
+        name = name.lower()
+        if name not in CODEC_SUFFIX:
+            raise SystemExit(f"❌ neznámy kodek v RPO_CODECS: {name!r} (gzip | zstd | br)")
+        if name == "zstd" and zstandard is None:
+            print("⚠️ RPO_CODECS: zstd požadovaný, ale balík zstandard nie je nainštalovaný – vynechávam")
+            continue
+        if name == "br" and brotli is None:
+            print("⚠️ RPO_CODECS: br požadovaný, ale balík brotli nie je nainštalovaný – vynechávam")
+            continue
+        default_level = {"gzip": 9, "zstd": 19, "br": 11}[name]
+        codecs.append((name, int(level) if level else default_level))
+    if not any(name == "gzip" for name, _ in codecs):
+        codecs.insert(0, ("gzip", GZIP_LEVEL))
+    return codecs
+
+
+def compress_bytes(codec: str, level: int, data: bytes) -> bytes:
+    if codec == "gzip":
+        # mtime=0 a bez názvu súboru → deterministické bajty
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == "br":
+        return brotli.compress(data, quality=level)
+    raise ValueError(f"neznámy kodek {codec}")
+
+
+def codec_path(gz_path: Path, codec: str) -> Path:
+    """Cesta výstupu pre kodek: firms_part01.csv.gz → firms_part01.csv.zst / .br"""
+    return gz_path.with_name(gz_path.name[: -len(".gz")] + CODEC_SUFFIX[codec])
+
+
+def _compress_to_file(path: Path, codec: str, level: int, data: bytes):
+    """Zapíše skomprimované dáta (tmp + replace); vráti (veľkosť, sha256) súboru."""
+    out = compress_bytes(codec, level, data)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(out)
+    tmp.replace(path)
+    return len(out), hashlib.sha256(out).hexdigest()
+
+
+class PartCompressor:
+    """
+    Komprimuje hotové buffre partov v poole vlákien (zlib, zstd aj brotli
+    uvoľňujú GIL), takže formátovanie ďalšieho partu beží súbežne s kompresiou.
+    close() počká na všetky úlohy a vypíše veľkosti po kodekoch.
+
+    Do `files` zaznamená každý zapísaný súbor:
+      {názov: (veľkosť, sha256, nekomprimovaná veľkosť)}
+    (manifest ich tak nemusí znova čítať a hashovať).
+    """
+
+    def __init__(self, codecs=None, workers: int = None, files=None):
+        self.codecs = codecs if codecs is not None else parse_codecs(CODECS_SPEC)
+        workers = COMPRESS_WORKERS if workers is None else workers
+        self.pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.max_pending = 2 * workers
+        self.pending = deque()
+        self.raw_bytes = Counter()
+        self.compressed_bytes = Counter()
+        self.files = {} if files is None else files
+
+    def submit(self, gz_path: Path, data: bytes, codecs=None, kind: str = "csv"):
+        for codec, level in codecs or self.codecs:
+            path = gz_path if codec == "gzip" else codec_path(gz_path, codec)
+            label = f"{kind} {codec}:{level}"
+            self.raw_bytes[label] += len(data)
+            if self.pool is None:
+                self._record(label, path, len(data), _compress_to_file(path, codec, level, data))
+                continue
+            fut = self.pool.submit(_compress_to_file, path, codec, level, data)
+            self.pending.append((label, path, len(data), fut))
+            while len(self.pending) > self.max_pending:
+                self._collect()
+
+    def _record(self, label, path: Path, raw_size: int, result):
+        size, digest = result
+        self.compressed_bytes[label] += size
+        self.files[path.name] = (size, digest, raw_size)
+
+    def _collect(self):
+        label, path, raw_size, fut = self.pending.popleft()
+        self._record(label, path, raw_size, fut.result())
+
+    def close(self):
+        while self.pending:
+            self._collect()
+        if self.pool:
+            self.pool.shutdown()
+        for label, raw in sorted(self.raw_bytes.items()):
+            packed = self.compressed_bytes[label]
+            ratio = packed / raw if raw else 0
+            print(f"🗜️ {label}: {raw / 1e6:.1f} MB → {packed / 1e6:.1f} MB ({ratio:.1%})")
+
+
+# --------- stĺpcový binárny formát partov ---------
+#
+# <base>_partNN.col.gz = gzip (mtime=0) súbor s rozložením:
+#
+#   "RPOC"            4 B magic
+#   verzia            u8 (= 1)
+#   3 B               nuly (zarovnanie)
+#   dĺžka hlavičky    u32
+#   hlavička          UTF-8 JSON, doplnená medzerami na násobok 4 B:
+#     {"rows": n, "columns": [{"name", "type", "offset", "length", ...}]}
+#     offset je od začiatku tela (hneď za hlavičkou), bloky sú zarovnané na 4 B
+#
+# Všetky čísla sú little-endian. Typy stĺpcov:
+#   "str"   – u32[n + 1] offsety, potom UTF-8 bajty všetkých hodnôt
+#   "dict"  – u32 počet k, u32[k + 1] offsety, UTF-8 bajty slovníka,
+#             potom kódy: u16[n] (k <= 65535, "code_width": 2) alebo u32[n] ("code_width": 4)
+#   "date"  – i32[n] počet dní od 1970-01-01, prázdna hodnota = -2^31
+#             (ak niektorý dátum nie je DD.MM.YYYY, stĺpec sa uloží ako "str")
+
+COLUMNAR_MAGIC = b"RPOC"
+COLUMNAR_VERSION = 1
+_COL_NULL_DAY = -(2 ** 31)
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+COLUMNAR_TYPES = {
+    "organization_id": "str",
+    "ico": "str",
+    "name": "str",
+    "city": "dict",
+    "region": "dict",
+    "established_on": "date",
+    "terminated_on": "date",
+    "last_modified": "date",
+    "source_register": "dict",
+}
+
+
+def _dmy_to_day(val: str):
+    if not val:
+        return _COL_NULL_DAY
+    try:
+        dd, mm, yyyy = val.split(".")
+        return date(int(yyyy), int(mm), int(dd)).toordinal() - _EPOCH_ORDINAL
+    except ValueError:
+        return None
+
+
+def _day_to_dmy(day: int) -> str:
+    if day == _COL_NULL_DAY:
+        return ""
+    return date.fromordinal(day + _EPOCH_ORDINAL).strftime("%d.%m.%Y")
+
+
+def _pad4(b: bytes) -> bytes:
+    return b + b"\0" * (-len(b) % 4)
+
+
+def _encode_strings(values):
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = array("I", [0])
+    size = 0
+    for b in encoded:
+        size += len(b)
+        offsets.append(size)
+    return _as_le(offsets) + b"".join(encoded)
+
+
+def _as_le(arr: array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def encode_columnar_part(part_rows) -> bytes:
+    """Zakóduje riadky partu (v poradí SLIM_HEADER) do stĺpcového formátu (bez gzip)."""
+    columns = []
+    blocks = []
+    offset = 0
+    for ci, name in enumerate(SLIM_HEADER):
+        values = [r[ci] for r in part_rows]
+        col = {"name": name, "type": COLUMNAR_TYPES[name]}
+
+        if col["type"] == "date":
+            days = array("i")
+            for v in values:
+                d = _dmy_to_day(v)
+                if d is None:
+                    break
+                days.append(d)
+            else:
+                block = _as_le(days)
+            if len(days) != len(values):
+                col["type"] = "str"
+
+        if col["type"] == "dict":
+            dictionary, codes_of = [], {}
+            for v in values:
+                if v not in codes_of:
+                    codes_of[v] = len(dictionary)
+                    dictionary.append(v)
+            col["code_width"] = 2 if len(dictionary) <= 0xFFFF else 4
+            col["cardinality"] = len(dictionary)
+            codes = array("H" if col["code_width"] == 2 else "I", (codes_of[v] for v in values))
+            block = (
+                _pad4(struct.pack("<I", len(dictionary)) + _encode_strings(dictionary))
+                + _as_le(codes)
+            )
+        elif col["type"] == "str":
+            block = _encode_strings(values)
+
+        block = _pad4(block)
+        col["offset"] = offset
+        col["length"] = len(block)
+        offset += len(block)
+        columns.append(col)
+        blocks.append(block)
+
+    header = json.dumps(
+        {"rows": len(part_rows), "columns": columns}, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    header += b" " * (-len(header) % 4)
+    return (
+        COLUMNAR_MAGIC
+        + struct.pack("<B3xI", COLUMNAR_VERSION, len(header))
+        + header
+        + b"".join(blocks)
+    )
+
+
+def decode_columnar_part(data: bytes):
+    """
+    Opak encode_columnar_part: vráti (hlavička, {stĺpec: zoznam hodnôt}).
+    Dátumy sa vrátia ako DD.MM.YYYY reťazce (rovnako ako v CSV).
+    """
+    if data[:4] != COLUMNAR_MAGIC:
+        raise ValueError("Nie je to stĺpcový part (chýba RPOC magic)")
+    version, header_len = struct.unpack_from("<B3xI", data, 4)
+    if version != COLUMNAR_VERSION:
+        raise ValueError(f"Nepodporovaná verzia stĺpcového partu: {version}")
+    header = json.loads(data[12:12 + header_len])
+    body = memoryview(data)[12 + header_len:]
+    n = header["rows"]
+
+    def strings(buf, count):
+        offsets = array("I")
+        offsets.frombytes(bytes(buf[:4 * (count + 1)]))
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        raw = bytes(buf[4 * (count + 1):4 * (count + 1) + offsets[-1]])
+        return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)], \
+            4 * (count + 1) + offsets[-1]
+
+    out = {}
+    for col in header["columns"]:
+        buf = body[col["offset"]:col["offset"] + col["length"]]
+        if col["type"] == "str":
+            out[col["name"]] = strings(buf, n)[0]
+        elif col["type"] == "date":
+            days = array("i")
+            days.frombytes(bytes(buf[:4 * n]))
+            if sys.byteorder != "little":
+                days.byteswap()
+            out[col["name"]] = [_day_to_dmy(d) for d in days]
+        else:
+            (k,) = struct.unpack_from("<I", buf, 0)
+            dictionary, used = strings(buf[4:], k)
+            start = 4 + used
+            start += -start % 4
+            codes = array("H" if col["code_width"] == 2 else "I")
+            codes.frombytes(bytes(buf[start:start + col["code_width"] * n]))
+            if sys.byteorder != "little":
+                codes.byteswap()
+            out[col["name"]] = [dictionary[c] for c in codes]
+    return header, out
+
+
+def read_columnar_part(path: Path):
+    with gzip.open(path, "rb") as f:
+        return decode_columnar_part(f.read())
+
+
+# --------- vyhľadávacie indexy k partom ---------
+#
+# <base>_index_<druh>.bin.gz = gzip (mtime=0) súbor:
+#
+#   "RPOI"            4 B magic
+#   verzia            u8 (= 1)
+#   3 B               nuly
+#   dĺžka hlavičky    u32 (little-endian)
+#   hlavička          UTF-8 JSON:
+#     {"kind", "rows", "keys", "normalize",
+#      "parts": [{"name", "first_row", "rows"}]}   – mapovanie row_id → part
+#   potom pre každý kľúč (zoradené):
+#     varint dĺžka kľúča, UTF-8 kľúč,
+#     varint počet row_id, varint dĺžka postingov v bajtoch,
+#     postingy – rastúce row_id ako varint rozdiely (prvé od 0)
+#
+# row_id je poradie riadku cez všetky party v poradí "parts" (od 0).
+# Druhy:
+#   city      – normalizované mesto (ako normalizeText v app.js) → riadky
+#   region    – kraj (presne ako v CSV) → riadky
+#   category  – orsr / zrsr / other (ako classifyRow v app.js) → riadky
+#   name3     – trigramy normalizovaného názvu firmy → riadky
+# Filter sa potom zodpovie prienikom postingov namiesto prechodu všetkými riadkami
+# (podreťazec mesta: zjednotenie postingov kľúčov, ktoré ho obsahujú).
+
+SEARCH_INDEX_MAGIC = b"RPOI"
+SEARCH_INDEX_VERSION = 1
+SEARCH_INDEX_KINDS = ("city", "region", "category", "name3")
+
+
+def normalize_search_text(s: str) -> str:
+    """To isté ako normalizeText v app.js: NFD, bez diakritiky (U+0300–U+036F), lower."""
+    if not s:
+        return ""
+    s = unicodedata.normalize("NFD", s)
+    return "".join(ch for ch in s if not "\u0300" <= ch <= "\u036f").lower()
+
+
+def classify_source_register(source_register: str) -> str:
+    """To isté ako classifyRow v app.js."""
+    norm = normalize_search_text(source_register)
+    if "obchodny" in norm:
+        return "orsr"
+    if "zivnost" in norm:
+        return "zrsr"
+    return "other"
+
+
+def name_trigrams(name: str):
+    norm = normalize_search_text(name)
+    return {norm[i:i + 3] for i in range(len(norm) - 2)}
+
+
+def _varint(n: int, out: bytearray):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf, pos: int):
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def search_index_path(base_name: str, kind: str) -> Path:
+    return SNAP_DIR / f"{base_name}_index_{kind}.bin.gz"
+
+
+class SearchIndexBuilder:
+    """
+    Part sink (add_part / finish), ktorý počas zápisu partov zbiera postingy
+    pre SEARCH_INDEX_KINDS a na konci ich zapíše vedľa partov.
+    """
+
+    def __init__(self, base_name: str):
+        self.base_name = base_name
+        self.rows = 0
+        self.parts = []
+        self.postings = {kind: defaultdict(lambda: array("I")) for kind in SEARCH_INDEX_KINDS}
+        self._city_keys = {}
+        self._categories = {}
+
+    def add_part(self, out_path: Path, part_rows):
+        self.parts.append({"name": out_path.name, "first_row": self.rows, "rows": len(part_rows)})
+        city_p = self.postings["city"]
+        region_p = self.postings["region"]
+        category_p = self.postings["category"]
+        name_p = self.postings["name3"]
+        for row_id, r in enumerate(part_rows, start=self.rows):
+            city = r[3]
+            if city:
+                key = self._city_keys.get(city)
+                if key is None:
+                    key = self._city_keys[city] = normalize_search_text(city)
+                city_p[key].append(row_id)
+            if r[4]:
+                region_p[r[4]].append(row_id)
+            cat = self._categories.get(r[8])
+            if cat is None:
+                cat = self._categories[r[8]] = classify_source_register(r[8])
+            category_p[cat].append(row_id)
+            for tri in name_trigrams(r[2]):
+                name_p[tri].append(row_id)
+        self.rows += len(part_rows)
+
+    def finish(self):
+        for kind in SEARCH_INDEX_KINDS:
+            path = search_index_path(self.base_name, kind)
+            postings = self.postings[kind]
+            header = json.dumps(
+                {
+                    "kind": kind,
+                    "rows": self.rows,
+                    "keys": len(postings),
+                    "normalize": "NFD, bez U+0300–U+036F, lower" if kind in ("city", "name3") else "",
+                    "parts": self.parts,
+                },
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode("utf-8")
+            with open_deterministic_gzip(path) as f:
+                f.write(SEARCH_INDEX_MAGIC + struct.pack("<B3xI", SEARCH_INDEX_VERSION, len(header)))
+                f.write(header)
+                for key in sorted(postings):
+                    ids = postings[key]
+                    enc = bytearray()
+                    prev = 0
+                    for row_id in ids:
+                        _varint(row_id - prev, enc)
+                        prev = row_id
+                    out = bytearray()
+                    kb = key.encode("utf-8")
+                    _varint(len(kb), out)
+                    out += kb
+                    _varint(len(ids), out)
+                    _varint(len(enc), out)
+                    f.write(out)
+                    f.write(enc)
+            print(f"🔍 Zapísaný index {path.name} ({len(postings)} kľúčov)")
+        self.postings = None
+
+
+def read_search_index(path: Path):
+    """Načíta index → (hlavička, {kľúč: array('I') row_id})."""
+    with gzip.open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != SEARCH_INDEX_MAGIC:
+        raise ValueError("Nie je to vyhľadávací index (chýba RPOI magic)")
+    version, header_len = struct.unpack_from("<B3xI", data, 4)
+    if version != SEARCH_INDEX_VERSION:
+        raise ValueError(f"Nepodporovaná verzia indexu: {version}")
+    header = json.loads(data[12:12 + header_len])
+    pos = 12 + header_len
+    postings = {}
+    for _ in range(header["keys"]):
+        klen, pos = _read_varint(data, pos)
+        key = data[pos:pos + klen].decode("utf-8")
+        pos += klen
+        count, pos = _read_varint(data, pos)
+        _, pos = _read_varint(data, pos)
+        ids = array("I")
+        row_id = 0
+        for _ in range(count):
+            delta, pos = _read_varint(data, pos)
+            row_id += delta
+            ids.append(row_id)
+        postings[key] = ids
+    return header, postings
+
+
+def default_part_sinks(base_name: str, date_str: str = "", city_region_map=None, files=None):
+    """
+    Doplnkové výstupy, ktoré sa budujú z hotových partov (podľa env prepínačov).
+    files = záznamy zapísaných súborov (PartCompressor.files) pre manifest.
+    """
+    sinks = []
+    if SEARCH_INDEX:
+        sinks.append(SearchIndexBuilder(base_name))
+    if MANIFEST:
+        sinks.append(ManifestBuilder(base_name, date_str, files=files))
+    if SQLITE_PATH:
+        sinks.append(SqliteExportBuilder(SQLITE_PATH, date_str))
+    if ROLLUPS:
+        sinks.append(RollupBuilder(base_name, date_str, city_region_map))
+    return sinks
+
+
+# --------- manifest snapshotu ---------
+
+MANIFEST_VERSION = 1
+
+
+def _dmy_to_iso(val: str) -> str:
+    if not val:
+        return ""
+    dd, _, rest = val.partition(".")
+    mm, _, yyyy = rest.partition(".")
+    return f"{yyyy}-{mm}-{dd}" if yyyy else val
+
+
+def _file_digest(path: Path):
+    """(veľkosť, sha256) súboru."""
+    h = hashlib.sha256()
+    size = 0
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+            size += len(chunk)
+    return size, h.hexdigest()
+
+
+def _gunzipped_size(path: Path) -> int:
+    size = 0
+    with gzip.open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            size += len(chunk)
+    return size
+
+
+class ManifestBuilder:
+    """
+    Part sink, ktorý zapíše snapshots/manifest.json – jeden záznam na part:
+      name, rows, compressed_size, uncompressed_size, sha256,
+      established_on_min / established_on_max (YYYY-MM-DD),
+      regions {kraj: počet}, source_registers {register: počet},
+      columnar {name, size, sha256} – ak k partu existuje .col.gz
+      variants {zstd|br: {name, size, sha256}} – ďalšie kodeky (RPO_CODECS)
+    Spotrebiteľ tak vie preskočiť party, ktoré filtru nevyhovujú, ukázať
+    súčty hneď a overiť / kešovať party podľa hashu.
+
+    Veľkosti a hashe berie z `files` ({názov: (veľkosť, sha256, nekomprimovaná
+    veľkosť)} – PartCompressor a stav minulého behu); súbory, ktoré tam nie sú,
+    prečíta z disku.
+    """
+
+    def __init__(self, base_name: str, date_str: str = "", path: Path = None, files=None):
+        self.base_name = base_name
+        self.date_str = date_str
+        # vedľa partov (base_name môže byť aj v podadresári, napr. v/<verzia>/firms)
+        self.path = path or SNAP_DIR / Path(base_name).parent / "manifest.json"
+        self.files = {} if files is None else files
+        self.parts = []
+
+    def _file_info(self, path: Path):
+        """(veľkosť, sha256, nekomprimovaná veľkosť alebo None), None ak súbor nie je."""
+        info = self.files.get(path.name)
+        if info is not None:
+            return info
+        if not path.exists():
+            return None
+        size, digest = _file_digest(path)
+        return size, digest, _gunzipped_size(path) if path.name.endswith(".csv.gz") else None
+
+    def add_part(self, out_path: Path, part_rows):
+        regions = Counter(r[4] for r in part_rows)
+        registers = Counter(r[8] for r in part_rows)
+        established = [iso for iso in (_dmy_to_iso(r[5]) for r in part_rows) if iso]
+        self.parts.append({
+            "path": out_path,
+            "name": out_path.name,
+            "rows": len(part_rows),
+            "established_on_min": min(established) if established else "",
+            "established_on_max": max(established) if established else "",
+            "regions": dict(sorted(regions.items())),
+            "source_registers": dict(sorted(registers.items())),
+        })
+
+    def finish(self):
+        # party sú už zapísané (alebo nezmenené na disku) – doplníme veľkosti a hashe
+        total_regions, total_registers = Counter(), Counter()
+        for part in self.parts:
+            path = part.pop("path")
+            part["compressed_size"], part["sha256"], part["uncompressed_size"] = self._file_info(path)
+            col_path = columnar_path_for(path)
+            info = self._file_info(col_path)
+            if info is not None:
+                part["columnar"] = {"name": col_path.name, "size": info[0], "sha256": info[1]}
+            for codec in ("zstd", "br"):
+                alt = codec_path(path, codec)
+                info = self._file_info(alt)
+                if info is not None:
+                    part.setdefault("variants", {})[codec] = {
+                        "name": alt.name, "size": info[0], "sha256": info[1]
+                    }
+            total_regions.update(part["regions"])
+            total_registers.update(part["source_registers"])
+
+        doc = {
+            "version": MANIFEST_VERSION,
+            "base_name": self.base_name,
+            "updated": self.date_str,
+            "header": SLIM_HEADER,
+            "rows": sum(p["rows"] for p in self.parts),
+            "regions": dict(sorted(total_regions.items())),
+            "source_registers": dict(sorted(total_registers.items())),
+            "parts": self.parts,
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(doc, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+        tmp.replace(self.path)
+        print(f"📒 Zapísaný {self.path.name} ({len(self.parts)} partov)")
+
+
+# --------- SQLite export ---------
+#
+# Tabuľka firms má stĺpce SLIM_HEADER, dátumy sú ISO (YYYY-MM-DD), aby sa dali
+# triediť a porovnávať v SQL. firms_fts je bezobsahová FTS5 tabuľka (rowid = firms.rowid)
+# nad normalizovaným názvom (normalize_search_text). Príklady:
+#
+#   SELECT * FROM firms WHERE ico = '12345678';
+#   SELECT f.* FROM firms_fts JOIN firms f ON f.rowid = firms_fts.rowid
+#    WHERE firms_fts MATCH 'novak* stav*' LIMIT 50;
+
+SQLITE_VERSION = 1
+SQLITE_INDEXES = ("ico", "organization_id", "region", "city", "established_on")
+SQLITE_DATE_COLUMNS = ("established_on", "terminated_on", "last_modified")
+
+
+class SqliteExportBuilder:
+    """
+    Part sink, ktorý počas zápisu partov plní SQLite databázu: jedna transakcia
+    a executemany na part, indexy a FTS optimize až na konci (rýchlejšie ako
+    udržiavať ich počas vkladania). Databáza vzniká ako <path>.tmp a na miesto
+    sa presunie až po dokončení.
+    """
+
+    def __init__(self, path: Path, date_str: str = ""):
+        self.path = Path(path)
+        self.date_str = date_str
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self.tmp.unlink(missing_ok=True)
+        self.rows = 0
+        self.db = sqlite3.connect(self.tmp)
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute("PRAGMA cache_size = -65536")  # 64 MB
+        cols = ", ".join(f"{c} TEXT" for c in SLIM_HEADER)
+        self.db.execute(f"CREATE TABLE firms ({cols})")
+        self.db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        try:
+            self.db.execute(
+                "CREATE VIRTUAL TABLE firms_fts USING fts5("
+                "name, content='', prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+            )
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ SQLite bez FTS5 ({e}), fulltext nad názvami vynechávam")
+            self.fts = False
+        self._date_idx = [SLIM_HEADER.index(c) for c in SQLITE_DATE_COLUMNS]
+        self._name_idx = SLIM_HEADER.index("name")
+        self._insert = f"INSERT INTO firms VALUES ({', '.join('?' * len(SLIM_HEADER))})"
+
+    def add_part(self, out_path: Path, part_rows):
+        date_idx = self._date_idx
+        name_idx = self._name_idx
+        first = self.rows + 1  # rowid v prázdnej tabuľke bez mazania ide od 1 po poradí
+        records = []
+        for r in part_rows:
+            r = list(r)
+            for i in date_idx:
+                r[i] = _dmy_to_iso(r[i])
+            records.append(r)
+        with self.db:
+            self.db.executemany(self._insert, records)
+            if self.fts:
+                self.db.executemany(
+                    "INSERT INTO firms_fts (rowid, name) VALUES (?, ?)",
+                    (
+                        (rowid, normalize_search_text(r[name_idx]))
+                        for rowid, r in enumerate(records, start=first)
+                    ),
+                )
+        self.rows += len(records)
+
+    def finish(self):
+        print(f"🗄️ Dopĺňam indexy SQLite ({self.rows} riadkov) ...")
+        with self.db:
+            for col in SQLITE_INDEXES:
+                self.db.execute(f"CREATE INDEX firms_{col} ON firms ({col})")
+            if self.fts:
+                self.db.execute("INSERT INTO firms_fts (firms_fts) VALUES ('optimize')")
+            self.db.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [
+                    ("version", str(SQLITE_VERSION)),
+                    ("updated", self.date_str),
+                    ("rows", str(self.rows)),
+                    ("fts", "1" if self.fts else "0"),
+                ],
+            )
+        self.db.execute("ANALYZE")
+        self.db.close()
+        self.tmp.replace(self.path)
+        print(f"🗄️ Zapísaná SQLite databáza {self.path} ({self.path.stat().st_size / 1e6:.1f} MB)")
+
+
+# --------- agregácie (rollupy) ---------
+#
+# snapshots/<base>_rollup_<druh>.json – malé predpočítané súčty, aby dashboard či mapa
+# nemuseli sťahovať všetky party. Stĺpcový JSON:
+#
+#   {"version", "kind", "updated", "rows", "dimensions": [...],
+#    "dictionaries": {<dimenzia>: [hodnoty]},
+#    "columns": {<dimenzia>: [...], ..., "count": [...]}}
+#
+# i-ty prvok každého stĺpca patrí i-tej kombinácii, kombinácie sú zoradené podľa dimenzií.
+# Dimenzie v "dictionaries" (kraj, okres, kategória) majú v stĺpci len index do slovníka.
+# Druhy:
+#   established  – kraj × okres × mesiac založenia (YYYY-MM, "" = bez dátumu)
+#   terminated   – kategória registra (orsr / zrsr / other ako v app.js)
+#                  × mesiac zániku ("" = aktívne)
+#   municipality – obec z data/obce.csv (name, district, region, lat, lon) → count, active
+# Okres a súradnice dodá CityRegionIndex – mesto sa rozlíši rovnako ako pri kraji;
+# nerozlíšené mestá majú okres "" a v municipality chýbajú.
+
+ROLLUP_VERSION = 1
+ROLLUP_KINDS = ("established", "terminated", "municipality")
+
+
+def rollup_path(base_name: str, kind: str) -> Path:
+    return SNAP_DIR / f"{base_name}_rollup_{kind}.json"
+
+
+def _dmy_month(val: str) -> str:
+    """DD.MM.YYYY -> YYYY-MM, inak ""."""
+    return f"{val[6:10]}-{val[3:5]}" if len(val) == 10 else ""
+
+
+class RollupBuilder:
+    """Part sink, ktorý počas zápisu partov počíta ROLLUP_KINDS a na konci ich zapíše."""
+
+    def __init__(self, base_name: str, date_str: str = "", city_region_map=None):
+        self.base_name = base_name
+        self.date_str = date_str
+        self.resolve = city_region_map.resolve if isinstance(city_region_map, CityRegionIndex) else None
+        self.rows = 0
+        self.established = Counter()
+        self.terminated = Counter()
+        self.municipality = {}
+        self._cities = {}
+        self._categories = {}
+
+    def _city(self, city: str):
+        try:
+            return self._cities[city]
+        except KeyError:
+            pass
+        rec = self.resolve(city) if city and self.resolve else None
+        out = self._cities[city] = (rec.district if rec else "", rec)
+        return out
+
+    def add_part(self, out_path: Path, part_rows):
+        established, terminated, municipality = self.established, self.terminated, self.municipality
+        categories = self._categories
+        for r in part_rows:
+            district, rec = self._city(r[3])
+            established[(r[4], district, _dmy_month(r[5]))] += 1
+            cat = categories.get(r[8])
+            if cat is None:
+                cat = categories[r[8]] = classify_source_register(r[8])
+            terminated[(cat, _dmy_month(r[6]))] += 1
+            if rec is not None:
+                counts = municipality.get(rec)
+                if counts is None:
+                    counts = municipality[rec] = [0, 0]
+                counts[0] += 1
+                if not r[6]:
+                    counts[1] += 1
+        self.rows += len(part_rows)
+
+    def _write(self, kind: str, dimensions, items, values=("count",), dict_dims=()):
+        columns = {d: [key[i] for key, _ in items] for i, d in enumerate(dimensions)}
+        dictionaries = {}
+        for d in dict_dims:
+            dictionaries[d] = sorted(set(columns[d]))
+            codes = {v: i for i, v in enumerate(dictionaries[d])}
+            columns[d] = [codes[v] for v in columns[d]]
+        for j, v in enumerate(values):
+            columns[v] = [vals[j] for _, vals in items]
+        doc = {
+            "version": ROLLUP_VERSION,
+            "kind": kind,
+            "updated": self.date_str,
+            "rows": self.rows,
+            "dimensions": list(dimensions),
+            "dictionaries": dictionaries,
+            "columns": columns,
+        }
+        path = rollup_path(self.base_name, kind)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(doc, ensure_ascii=False, separators=(",", ":")) + "\n", encoding="utf-8")
+        tmp.replace(path)
+        print(f"📐 Zapísaný rollup {path.name} ({len(items)} kombinácií)")
+
+    def finish(self):
+        self._write(
+            "established", ("region", "district", "month"),
+            sorted((k, (n,)) for k, n in self.established.items()),
+            dict_dims=("region", "district"),
+        )
+        self._write(
+            "terminated", ("category", "month"),
+            sorted((k, (n,)) for k, n in self.terminated.items()),
+            dict_dims=("category",),
+        )
+        self._write(
+            "municipality", ("name", "district", "region", "lat", "lon"),
+            sorted(
+                ((tuple(rec), tuple(counts)) for rec, counts in self.municipality.items()),
+                key=lambda t: (t[0][2], t[0][1], t[0][0]),
+            ),
+            values=("count", "active"),
+            dict_dims=("district", "region"),
+        )
+
+
+# --------- inkrementálny snapshot (stav + delta) ---------
+
+def _row_hash(row_values) -> str:
+    return hashlib.blake2b("\x1f".join(row_values).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def state_path(base_name: str) -> Path:
+    return SNAP_DIR / f"{base_name}_state.tsv.gz"
+
+
+def delta_path(base_name: str) -> Path:
+    return SNAP_DIR / f"{base_name}_delta.json.gz"
+
+
+def load_snapshot_state(base_name: str):
+    """
+    Načíta stav minulého behu:
+      prvý riadok  – JSON {version, date, parts: {názov partu: sha256},
+                     files: {názov súboru: [veľkosť, sha256, nekomprimovaná veľkosť]}}
+      ďalšie riadky – organization_id \\t hash riadku
+    Ak stav neexistuje (prvý beh), vráti None.
+    """
+    path = state_path(base_name)
+    if not path.exists():
+        print(f"ℹ️ {path.name} neexistuje, inkrementálny beh začína od nuly")
+        return None
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        meta = json.loads(f.readline())
+        if meta.get("version") != STATE_VERSION:
+            print(f"⚠️ {path.name} má inú verziu ({meta.get('version')}), ignorujem ho")
+            return None
+        hashes = {}
+        for line in f:
+            org_id, _, h = line.rstrip("\n").partition("\t")
+            hashes[org_id] = h
+    meta["rows"] = hashes
+    print(f"♻️ Načítaný stav z {meta.get('date') or '?'}: {len(hashes)} organizácií")
+    return meta
+
+
+def save_snapshot_state(base_name: str, row_hashes, part_digests, date_str: str, files=None):
+    path = state_path(base_name)
+    meta = {"version": STATE_VERSION, "date": date_str, "parts": part_digests}
+    if files:
+        # veľkosti a hashe súborov partov pre manifest nezmenených partov v ďalšom behu
+        meta["files"] = {name: list(info) for name, info in sorted(files.items())}
+    tmp = path.with_name(path.name + ".tmp")
+    with open_deterministic_gzip(tmp) as raw:
+        with io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+            f.write(json.dumps(meta, ensure_ascii=False, sort_keys=True) + "\n")
+            for org_id in sorted(row_hashes):
+                f.write(f"{org_id}\t{row_hashes[org_id]}\n")
+    tmp.replace(path)
+    print(f"💾 Zapísaný stav {path.name} ({len(row_hashes)} organizácií)")
+
+
+class SnapshotDeltaWriter:
+    """
+    Delta súbor voči minulému snapshotu, zapisovaný priebežne počas zápisu partov:
+      {"from": dátum minulého behu, "to": dátum tohto behu, "header": [...],
+       "inserted": [riadky], "updated": [riadky], "removed": [organization_id]}
+    Nové riadky idú rovno do gzipu delty, zmenené do dočasného gzipu, ktorý sa
+    vo finish() pripojí za ne – zoznamy riadkov sa nedržia v pamäti.
+    Riadky sú v poradí ako v partoch.
+    """
+
+    def __init__(self, base_name: str, prev_state, date_str: str):
+        self.path = delta_path(base_name)
+        self.inserted = self.updated = 0
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._out = io.TextIOWrapper(open_deterministic_gzip(self._tmp), encoding="utf-8", newline="")
+        head = json.dumps(
+            {"from": prev_state.get("date") or "", "to": date_str, "header": SLIM_HEADER},
+            ensure_ascii=False,
+        )
+        self._out.write(head[:-1] + ', "inserted": [')
+        fd, path = tempfile.mkstemp(prefix="rpo_delta_", suffix=".json.gz")
+        os.close(fd)
+        self._spool_path = Path(path)
+        self._spool = gzip.open(self._spool_path, "wt", encoding="utf-8", compresslevel=1)
+
+    def insert(self, row_values):
+        self._out.write((", " if self.inserted else "") + json.dumps(row_values, ensure_ascii=False))
+        self.inserted += 1
+
+    def update(self, row_values):
+        self._spool.write((", " if self.updated else "") + json.dumps(row_values, ensure_ascii=False))
+        self.updated += 1
+
+    def finish(self, removed):
+        self._spool.close()
+        self._out.write('], "updated": [')
+        with gzip.open(self._spool_path, "rt", encoding="utf-8") as f:
+            shutil.copyfileobj(f, self._out)
+        self._spool_path.unlink()
+        self._out.write('], "removed": ' + json.dumps(removed, ensure_ascii=False) + "}")
+        self._out.close()
+        self._tmp.replace(self.path)
+        print(f"🧩 Zapísaná delta {self.path.name}")
+
+
+# --------- publikovanie verzií (nemenné adresáre + current.json) ---------
+
+PUBLISH_VERSION = 1
+
+
+def versions_root() -> Path:
+    return SNAP_DIR / "v"
+
+
+def load_current_pointer(snap_dir: Path = None):
+    """Obsah snapshots/current.json (práve zverejnená verzia), inak None."""
+    path = (snap_dir or SNAP_DIR) / "current.json"
+    try:
+        doc = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if doc.get("version") != PUBLISH_VERSION or not doc.get("id"):
+        return None
+    return doc
+
+
+def published_dir(snap_dir: Path = None):
+    """Adresár verzie, na ktorú ukazuje current.json (ak existuje), inak None."""
+    snap_dir = snap_dir or SNAP_DIR
+    doc = load_current_pointer(snap_dir)
+    if doc is None:
+        return None
+    d = snap_dir / doc["path"]
+    return d if d.is_dir() else None
+
+
+def _link_or_copy(src: Path, dst: Path):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def start_publish_build() -> str:
+    """
+    Pripraví prázdny adresár snapshots/v/.build-<pid>/ a vráti base_name partov v ňom.
+
+    V inkrementálnom režime sa doň nalinkujú party a stav zverejnenej verzie
+    (pri prvom behu starého plochého rozloženia), aby sa prepísali len zmenené
+    party. Party aj stav sa zapisujú cez .tmp + rename, hardlink tak obsah
+    starej verzie nezmení.
+    """
+    staging = versions_root() / f".build-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    if INCREMENTAL:
+        current = published_dir()
+        prev_base = f"{current.relative_to(SNAP_DIR).as_posix()}/firms" if current else "firms"
+        for src in list_part_files(prev_base) + [state_path(prev_base)]:
+            if src.exists():
+                _link_or_copy(src, staging / src.name)
+    return f"{staging.relative_to(SNAP_DIR).as_posix()}/firms"
+
+
+def publish_build(base_name: str, date_str: str, rows: int) -> str:
+    """
+    Zverejní hotový build z start_publish_build():
+      - id verzie = 16 znakov SHA-256 cez názvy a hashe všetkých súborov buildu
+        (party, manifest, rollupy, stav, delta; gzip je deterministický,
+        rovnaký obsah = rovnaké id)
+      - adresár sa premenuje na snapshots/v/<id>/; ak už existuje, má presne
+        ten istý obsah a build sa len zahodí
+      - current.json sa prepíše atomicky (.tmp + os.replace)
+    Súbory vo verzii sa už nikdy nemenia, takže sa dajú kešovať natrvalo;
+    revalidovať treba len current.json. Vráti id verzie.
+    """
+    staging = SNAP_DIR / Path(base_name).parent
+    parts = list_part_files(base_name)
+    h = hashlib.sha256()
+    for p in sorted(p for p in staging.rglob("*") if p.is_file()):
+        h.update(f"{p.relative_to(staging).as_posix()}\t{_file_digest(p)[1]}\n".encode("utf-8"))
+    version_id = h.hexdigest()[:16]
+    final = versions_root() / version_id
+    if final.exists():
+        shutil.rmtree(staging)
+        # mtime = naposledy zverejnená (pre prune_versions)
+        os.utime(final)
+        print(f"♻️ Verzia {version_id} s rovnakým obsahom už existuje, použijem ju")
+    else:
+        staging.rename(final)
+
+    doc = {
+        "version": PUBLISH_VERSION,
+        "id": version_id,
+        "path": f"v/{version_id}/",
+        "updated": date_str,
+        "rows": rows,
+        "published": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "manifest": "manifest.json" if (final / "manifest.json").exists() else None,
+        "parts": sorted(p.name for p in parts if p.name.endswith(".csv.gz")),
+    }
+    path = SNAP_DIR / "current.json"
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(doc, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    tmp.replace(path)
+    print(f"🚀 Zverejnená verzia {version_id} ({len(doc['parts'])} partov) → snapshots/current.json")
+
+    remove_flat_snapshot()
+    prune_versions(keep=final)
+    return version_id
+
+
+def remove_flat_snapshot():
+    """Po prvom zverejnení zmaže snapshot zo starého plochého rozloženia snapshots/firms_*."""
+    stale = list_part_files("firms") + [
+        p for p in (
+            state_path("firms"), delta_path("firms"), SNAP_DIR / "manifest.json",
+            *(rollup_path("firms", kind) for kind in ROLLUP_KINDS),
+        ) if p.exists()
+    ] + sorted(SNAP_DIR.glob("firms_index_*"))
+    for p in stale:
+        p.unlink()
+    if stale:
+        print(f"🧹 Zmazaných {len(stale)} súborov plochého snapshotu (nahradila ich verzia v snapshots/v/)")
+
+
+def prune_versions(max_versions: int = None, keep: Path = None):
+    """
+    Ponechá max_versions (RPO_PUBLISH_KEEP) naposledy zverejnených verzií – klient,
+    ktorý práve dočítava predošlú, ju tak nestratí. Nedokončené .build-* adresáre
+    z padnutých behov sa mažú vždy.
+    """
+    max_versions = PUBLISH_KEEP if max_versions is None else max_versions
+    root = versions_root()
+    if not root.is_dir():
+        return
+    versions = []
+    for d in root.iterdir():
+        if not d.is_dir():
+            continue
+        if d.name.startswith(".build-"):
+            shutil.rmtree(d, ignore_errors=True)
+            continue
+        versions.append(d)
+    versions.sort(key=lambda d: d.stat().st_mtime, reverse=True)
+    if keep is not None and keep in versions:
+        versions.remove(keep)
+        max_versions -= 1
+    for d in versions[max(0, max_versions):]:
+        shutil.rmtree(d, ignore_errors=True)
+        print(f"🧹 Zmazaná stará verzia snapshotu {d.name}")
+
+
+def parse_dump_to_slim_csv(
+    dump_path: Path, date_str: str, names_map, addr_map, ident_map, city_region_map
+):
+    """
+    Prečíta rpo.organizations, poskladá finálne riadky do pamäte,
+    ZORADÍ ich podľa established_on (najnovšie prvé) a až potom
+    ich rozseká do partov:
+
+      snapshots/firms_<date>_part01.csv.gz, part02...
+
+    stĺpce:
+      organization_id, ico, name, city, region,
+      established_on, terminated_on, last_modified, source_register
+    """
+    print(f"🔎 Parsujem organizácie z {dump_path} (slim export, sort podľa established_on) ...")
+    orgs = OrganizationsHandler(names_map, addr_map, ident_map, city_region_map)
+    scan_dump_file(dump_path, {"organizations": orgs})
+    report_unresolved_cities(city_region_map)
+
+    # Bez dátumu v názve – držíme vždy len jeden aktuálny snapshot
+    return write_slim_parts(orgs.rows, "firms", date_str, city_region_map=city_region_map)
+
+
+def parse_dump_single_pass(
+    dump_path: Path, city_region_map, workers: int = PARSE_WORKERS, date_str: str = "",
+    join_buckets: int = JOIN_BUCKETS, checkpoint_meta=None, base_name: str = "firms",
+):
+    """
+    To isté ako parse_*_map + parse_dump_to_slim_csv, ale dump sa
+    dekomprimuje a prečíta iba raz: všetky štyri COPY sekcie idú
+    v jednom prechode do svojich handlerov.
+
+    Pri workers > 0 hlavný proces len číta dump a posiela dávky riadkov
+    entry tabuliek do poolu procesov, ktoré ich parsujú a redukujú.
+
+    Pri join_buckets > 0 sa tabuľky počas prechodu len rozdelia do bucketov
+    a join prebehne po bucketoch (PartitionedJoin), pri workers > 0 paralelne.
+
+    S checkpoint_meta (metadáta dumpu so sha256) sa mapy a sekcia organizácií
+    pred zápisom partov uložia ako checkpoint (len pri joine s celými mapami).
+
+    pg_dump custom archív (-Fc) sa rozpozná podľa hlavičky a číta sa z neho
+    len dáta štyroch tabuliek (scan_custom_dump).
+    """
+    print(f"🔎 Parsujem {dump_path} v jednom prechode (slim export, sort podľa established_on) ...")
+    return _parse_single_pass(
+        lambda handlers: scan_dump_file(dump_path, handlers),
+        city_region_map, workers, date_str, join_buckets, checkpoint_meta, base_name,
+    )
+
+
+def stream_dump_single_pass(
+    url: str, city_region_map, workers: int = PARSE_WORKERS, date_str: str = "", tee_path: Path = None,
+    base_name: str = "firms",
+):
+    """
+    Ako parse_dump_single_pass, ale dump sa parsuje priamo počas sťahovania
+    (bez dočasného súboru, ak nie je zadaný tee_path).
+    """
+    lines = iter_remote_dump_lines(url, tee_path)
+    try:
+        return parse_lines_single_pass(lines, city_region_map, workers, date_str, base_name=base_name)
+    finally:
+        lines.close()
+
+
+def parse_lines_single_pass(
+    lines, city_region_map, workers: int = PARSE_WORKERS, date_str: str = "",
+    join_buckets: int = JOIN_BUCKETS, checkpoint_meta=None, base_name: str = "firms",
+):
+    return _parse_single_pass(
+        lambda handlers: scan_dump(lines, handlers),
+        city_region_map, workers, date_str, join_buckets, checkpoint_meta, base_name,
+    )
+
+
+def _parse_single_pass(scan, city_region_map, workers, date_str, join_buckets, checkpoint_meta, base_name):
+    """Spoločné jadro: scan(handlers) je jeden prechod dumpom (plain riadky alebo custom archív)."""
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    if executor:
+        print(f"🧵 Entry tabuľky parsuje {workers} worker procesov")
+    if join_buckets > 0:
+        join = PartitionedJoin(join_buckets, city_region_map, executor)
+        try:
+            scan(join.handlers)
+            rows = join.run()
+        finally:
+            join.cleanup()
+            if executor:
+                executor.shutdown()
+        report_unresolved_cities(city_region_map)
+        return write_slim_parts(rows, base_name, date_str, city_region_map=city_region_map)
+
+    tee_path = None
+    try:
+        entries = {
+            table: EntryMapHandler(
+                table, executor, workers=workers, history=HISTORY and bool(checkpoint_meta)
+            )
+            for table in ENTRY_TABLES
+        }
+        orgs = OrganizationsHandler(
+            entries["organization_name_entries"],
+            entries["organization_address_entries"],
+            entries["organization_identifier_entries"],
+            city_region_map,
+        )
+        orgs_handler = orgs
+        if checkpoint_meta and checkpoint_meta.get("sha256"):
+            checkpoint_root().mkdir(parents=True, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix="orgs_", suffix=".txt.gz", dir=checkpoint_root())
+            os.close(fd)
+            tee_path = Path(path)
+            orgs_handler = _TeeHandler(orgs, tee_path)
+        scan({**entries, "organizations": orgs_handler})
+        if tee_path is not None:
+            # ešte pred zápisom partov – pád pri zápise sa dá zopakovať z checkpointu
+            try:
+                save_checkpoint(
+                    checkpoint_meta, {t: h.best for t, h in entries.items()}, tee_path,
+                    history={t: h.history for t, h in entries.items() if h.history is not None},
+                )
+            except OSError as e:
+                print(f"⚠️ Nepodarilo sa uložiť checkpoint máp: {e}")
+    finally:
+        if executor:
+            executor.shutdown()
+        if tee_path is not None:
+            tee_path.unlink(missing_ok=True)
+    report_unresolved_cities(city_region_map)
+
+    return write_slim_parts(orgs.rows, base_name, date_str, city_region_map=city_region_map)
+
+
+def main():
+    if AS_OF:
+        # RPO_AS_OF: len snapshoty k dátumom z checkpointu s históriou, bez sťahovania
+        for day in AS_OF:
+            try:
+                date.fromisoformat(day)
+            except ValueError:
+                raise SystemExit(f"❌ neplatný dátum v RPO_AS_OF: {day!r} (čakám YYYY-MM-DD)")
+        with RUN_STATS.phase("obce") as ph:
+            city_region_map = load_city_region_map()
+            ph["rows"] = len(city_region_map.records)
+        for day in AS_OF:
+            total = export_as_of(day, city_region_map)
+            print(f"🎉 Snapshot k {day}: {total} riadkov v {SNAP_DIR / 'asof' / day}")
+        return
+
+    if not RPO_DUMP_URL:
+        raise SystemExit("❌ chýba env RPO_DUMP_URL")
+
+    today_date = datetime.utcnow().date()
+    today_dmy = today_date.strftime("%d-%m-%Y")
+
+    # Nezmenený dump (304 na If-None-Match / If-Modified-Since, alebo rovnaký
+    # SHA-256 po stiahnutí) = nič neprepisujeme, pokiaľ snapshot existuje.
+    prev_meta = None if FORCE_REBUILD else load_dump_meta()
+    have_snapshot = published_dir() is not None if PUBLISH else bool(list_part_files("firms"))
+    probe = probe_dump(RPO_DUMP_URL, prev_meta)
+    if probe["unchanged"] and have_snapshot:
+        print("⏭️ Dump sa od posledného behu nezmenil (304), rebuild preskakujem.")
+        return
+    # Checkpoint máp z behu nad tým istým dumpom (napr. padol až zápis) = bez sťahovania
+    # a parsovania; po stiahnutí sa ešte skúsi nájsť podľa SHA-256.
+    dump_meta = None
+    checkpoint = find_checkpoint(probe=probe, url=RPO_DUMP_URL) if CHECKPOINT else None
+    stream = STREAM_DUMP
+    if stream and probe["custom"]:
+        print("⚠️ RPO_STREAM: dump je pg_dump custom archív (-Fc), ten sa číta podľa TOC – sťahujem ho na disk")
+        stream = False
+    if checkpoint is not None:
+        print(f"♻️ Dump zodpovedá checkpointu {checkpoint[0].name}, sťahovanie preskakujem.")
+        dump_meta = {k: checkpoint[1].get(k) for k in ("url", "etag", "last_modified", "size", "sha256")}
+    elif not stream:
+        dump_meta = download_dump(RPO_DUMP_URL, TMP_DUMP_PATH, probe)
+        if CHECKPOINT:
+            checkpoint = find_checkpoint(sha256=dump_meta["sha256"])
+    if dump_meta and prev_meta and have_snapshot and prev_meta.get("sha256") == dump_meta["sha256"]:
+        print("⏭️ Dump je zhodný s minulým (SHA-256), rebuild preskakujem.")
+        save_dump_meta({**prev_meta, **dump_meta})
+        return
+
+    # Pred generovaním vyčisti existujúce part súbory (držíme iba jeden snapshot).
+    # V inkrementálnom režime ich potrebujeme na porovnanie, nadbytočné sa zmažú po zápise.
+    # S RPO_PUBLISH sa stavia do nového adresára a zverejnený snapshot ostáva, kým build nedobehne.
+    removed = 0
+    for p in ([] if INCREMENTAL or PUBLISH else list_part_files("firms")):
+        try:
+            p.unlink()
+            removed += 1
+        except Exception as e:
+            print(f"⚠️ Nepodarilo sa zmazať {p}: {e}")
+    if removed:
+        print(f"🧹 Vymazaných starých partov: {removed}")
+
+    with RUN_STATS.phase("obce") as ph:
+        city_region_map = load_city_region_map()
+        ph["rows"] = len(city_region_map.records)
+    base_name = start_publish_build() if PUBLISH else "firms"
+    try:
+        if checkpoint is not None:
+            total = parse_checkpoint(checkpoint[0], city_region_map, date_str=today_dmy, base_name=base_name)
+        elif stream:
+            total = stream_dump_single_pass(
+                RPO_DUMP_URL, city_region_map, date_str=today_dmy, tee_path=STREAM_TEE_PATH,
+                base_name=base_name,
+            )
+            dump_meta = {
+                "url": RPO_DUMP_URL,
+                "etag": probe["etag"],
+                "last_modified": probe["last_modified"],
+                "size": probe["size"],
+                "sha256": None,
+            }
+        else:
+            total = parse_dump_single_pass(
+                TMP_DUMP_PATH, city_region_map, date_str=today_dmy,
+                checkpoint_meta=dump_meta if CHECKPOINT else None, base_name=base_name,
+            )
+    except BaseException:
+        if PUBLISH:
+            # zverejnená verzia ostáva nedotknutá, polovičný build zahodíme
+            shutil.rmtree(SNAP_DIR / Path(base_name).parent, ignore_errors=True)
+        raise
+    print(f"🎉 Hotovo. Spolu {total} riadkov, vytvorených viacero part súborov.")
+    version_id = publish_build(base_name, today_dmy, total) if PUBLISH else None
+    # až po úspešnom zápise – nedokončený beh sa pri ďalšom spustí celý znova
+    save_dump_meta({**dump_meta, "date": today_dmy})
+
+    # Zapíš posledný dátum aktualizácie (DD-MM-YYYY)
+    try:
+        (SNAP_DIR / "last_updated.txt").write_text(f"{today_dmy}\n", encoding="utf-8")
+        print("🕒 Zapísané snapshots/last_updated.txt")
     except Exception as e:
         print(f"⚠️ Nepodarilo sa zapísať last_updated.txt: {e}")
 
+    if RUN_REPORT:
+        try:
+            RUN_STATS.write_report(
+                date=today_dmy,
+                mode="checkpoint" if checkpoint is not None else "stream" if stream else "download",
+                workers=PARSE_WORKERS,
+                rows=total,
+                version=version_id,
+            )
+        except OSError as e:
+            print(f"⚠️ Nepodarilo sa zapísať run_report.json: {e}")
+
 
 if __name__ == "__main__":
     main()
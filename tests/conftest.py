@@ -0,0 +1,108 @@
+"""Spoločné fixtures: malé syntetické dumpy (bench/generate_dump.py) a export do dočasného adresára."""
+import argparse
+import gzip
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import sync_rpo_full as s  # noqa: E402
+from generate_dump import write_plain_dump  # noqa: E402
+from serve_dump import make_handler  # noqa: E402
+
+# dosť na viac partov a dávok, ale test beží pod sekundu
+ORGS = 3000
+ROWS_PER_PART = 1000
+
+
+@pytest.fixture(scope="session")
+def dump_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("dumps")
+
+
+@pytest.fixture(scope="session")
+def plain_dump(dump_dir):
+    path = dump_dir / "rpo.sql.gz"
+    write_plain_dump(path, ORGS, seed=7)
+    return path
+
+
+@pytest.fixture(scope="session")
+def orgs_first_dump(dump_dir):
+    # rpo.organizations pred entry tabuľkami → OrganizationsHandler odkladá na disk
+    path = dump_dir / "rpo_orgs_first.sql.gz"
+    write_plain_dump(path, ORGS, seed=7, orgs_first=True)
+    return path
+
+
+@pytest.fixture(scope="session")
+def city_region_map(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(s, "CACHE_DIR", tmp_path_factory.mktemp("cache"))
+        return s.load_city_region_map()
+
+
+def read_parts(snap_dir: Path, base_name: str = "firms"):
+    """{názov partu: rozbalené CSV} všetkých gzip partov snapshotu."""
+    return {
+        p.name: gzip.decompress(p.read_bytes()).decode("utf-8")
+        for p in sorted(snap_dir.glob(f"{base_name}_*part*.csv.gz"))
+    }
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    """
+    snapshot(názov, funkcia, *args, **kwargs) spustí export s SNAP_DIR = tmp_path/názov
+    a vráti read_parts() výsledku – rôzne režimy sa tak dajú porovnať priamo.
+    """
+    monkeypatch.setattr(s, "ROWS_PER_PART", ROWS_PER_PART)
+    monkeypatch.setattr(s, "CACHE_DIR", tmp_path / "cache")
+
+    def run(name, fn, *args, **kwargs):
+        out = tmp_path / name
+        out.mkdir()
+        monkeypatch.setattr(s, "SNAP_DIR", out)
+        fn(*args, **kwargs)
+        return read_parts(out)
+
+    return run
+
+
+@pytest.fixture
+def dump_server():
+    """
+    dump_server(cesta, **voľby) spustí bench/serve_dump.py server vo vlákne a vráti URL dumpu.
+    Voľby ako na príkazovom riadku: drop_every, drop_after, no_range, no_validators.
+    S port=<port> predošlého servera vznikne rovnaká URL (napr. "oprava" výpadkov).
+    """
+    servers = []
+
+    def start(path: Path, port: int = 0, **options):
+        args = argparse.Namespace(
+            drop_every=0, drop_after=1_000_000, no_range=False, no_validators=False, verbose=False
+        )
+        for key, value in options.items():
+            if not hasattr(args, key):
+                raise TypeError(f"neznáma voľba servera {key}")
+            setattr(args, key, value)
+        for server in servers:
+            if port and server.server_port == port:
+                server.shutdown()
+                server.server_close()
+        server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(Path(path), args))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/{Path(path).name}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,72 @@
+"""Regresné testy dekódovania COPY text formátu (copy_unescape, CopyRowDecoder)."""
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sync_rpo_full import CopyRowDecoder, copy_unescape  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("bez escapov", "bez escapov"),
+        (r"a\tb", "a\tb"),
+        (r"riadok\nďalší", "riadok\nďalší"),
+        (r"\r\b\f\v", "\r\b\f\v"),
+        (r"c:\\temp", "c:\\temp"),
+        (r"\\N", "\\N"),
+        (r"\101\60", "A0"),
+        (r"\x41\x4a", "AJ"),
+        (r"\xc5\xa1", "š"),         # UTF-8 bajty po jednom
+        (r"\305\241kola", "škola"),
+        (r"\q", "q"),                # neznámy escape = samotný znak
+        (r"\1012", "A2"),            # najviac tri osmičkové číslice
+    ],
+)
+def test_copy_unescape(raw, expected):
+    assert copy_unescape(raw) == expected
+
+
+def test_copy_unescape_invalid_utf8_is_replaced():
+    assert copy_unescape(r"a\xffb") == "a\ufffdb"
+
+
+COLS = ["id", "organization_id", "name", "effective_from", "effective_to"]
+
+
+def test_decoder_plain_row_selects_columns():
+    dec = CopyRowDecoder(COLS, ["organization_id", "name", "effective_to"])
+    assert dec("1\t42\tFirma s.r.o.\t2020-01-01\t\\N") == ("42", "Firma s.r.o.", None)
+
+
+def test_decoder_unescapes_only_values():
+    dec = CopyRowDecoder(COLS, ["organization_id", "name"])
+    # \t v hodnote je escape, nie oddeľovač stĺpcov
+    assert dec("1\t42\tA\\tB\\\\C\\nD\t\\N\t\\N") == ("42", "A\tB\\C\nD")
+
+
+def test_decoder_null_value_and_escaped_null_text():
+    dec = CopyRowDecoder(COLS, ["name", "effective_from"], null="")
+    # \N je NULL, \\N je text "\N"
+    assert dec("1\t42\t\\\\N\t\\N\t\\N") == ("\\N", "")
+
+
+def test_decoder_missing_and_short_columns_are_null():
+    dec = CopyRowDecoder(COLS, ["organization_id", "ico", "effective_to"])
+    assert not dec.has("ico")
+    assert dec("1\t42\tX\t2020-01-01") == ("42", None, None)
+
+
+def test_decoder_column_names_are_case_insensitive():
+    dec = CopyRowDecoder(["ID", "Name"], ["name"])
+    assert dec("7\tX") == ("X",)
+
+
+def test_decoder_survives_pickle():
+    # posiela sa do worker procesov
+    dec = pickle.loads(pickle.dumps(CopyRowDecoder(COLS, ["name", "effective_to"])))
+    assert dec("1\t42\tA\\\\B\t\\N\t\\N") == ("A\\B", None)
@@ -0,0 +1,52 @@
+"""pg_dump custom archív (-Fc) musí dať rovnaké party ako plain SQL dump."""
+import pytest
+
+import sync_rpo_full as s
+from conftest import ORGS
+from generate_dump import write_custom_dump
+
+
+@pytest.mark.parametrize(
+    "version, offsets, level",
+    [
+        ("1.14", True, 6),
+        ("1.15", True, 6),
+        ("1.16", True, 6),
+        ("1.14", False, 6),  # ako pg_dump do rúry – offsety sa hľadajú prechodom blokov
+        ("1.16", True, 0),   # bez kompresie
+    ],
+)
+def test_custom_dump_matches_plain(version, offsets, level, plain_dump, tmp_path, city_region_map, snapshot):
+    custom = tmp_path / "rpo.dump"
+    write_custom_dump(custom, ORGS, seed=7, offsets=offsets, version=version, level=level)
+    assert s.is_custom_dump(custom) and not s.is_custom_dump(plain_dump)
+
+    plain = snapshot("plain", s.parse_dump_single_pass, plain_dump, city_region_map)
+    from_custom = snapshot("custom", s.parse_dump_single_pass, custom, city_region_map)
+
+    assert len(plain) == 3
+    assert from_custom == plain
+
+
+def test_custom_dump_with_workers(plain_dump, tmp_path, city_region_map, snapshot):
+    custom = tmp_path / "rpo.dump"
+    write_custom_dump(custom, ORGS, seed=7, orgs_first=True)
+
+    plain = snapshot("plain", s.parse_dump_single_pass, plain_dump, city_region_map)
+    from_custom = snapshot("custom", s.parse_dump_single_pass, custom, city_region_map, workers=2, join_buckets=4)
+
+    assert from_custom == plain
+
+
+def test_readers_are_closed_when_handler_fails(tmp_path):
+    custom = tmp_path / "rpo.dump"
+    write_custom_dump(custom, 200, seed=7)
+
+    class Boom:
+        def start(self, col_order):
+            raise RuntimeError("boom")
+
+    handlers = {table: Boom() for table in list(s.ENTRY_TABLES) + ["organizations"]}
+    with pytest.raises(RuntimeError, match="boom"):
+        s.scan_custom_dump(custom, handlers)
+    assert not [t for t in s.threading.enumerate() if t.name == "rpo-inflate"]
@@ -0,0 +1,101 @@
+"""Sťahovanie dumpu: podmienené požiadavky (304), paralelné Range segmenty a obnovenie po výpadku."""
+import hashlib
+import json
+from urllib.parse import urlsplit
+
+import pytest
+
+import sync_rpo_full as s
+
+
+@pytest.fixture(autouse=True)
+def fast_download(monkeypatch):
+    # malé segmenty aj pri malom dumpe, bez čakania medzi pokusmi
+    monkeypatch.setattr(s, "DOWNLOAD_MIN_SEGMENT", 16 * 1024)
+    monkeypatch.setattr(s, "DOWNLOAD_BACKOFF", 0)
+
+
+def test_probe_size_validators_and_304(plain_dump, dump_server):
+    url = dump_server(plain_dump)
+    probe = s.probe_dump(url)
+    assert probe["size"] == plain_dump.stat().st_size
+    assert probe["ranges"] and probe["etag"] and probe["last_modified"]
+    assert not probe["unchanged"]
+
+    prev_meta = {"url": url, "etag": probe["etag"], "last_modified": probe["last_modified"], "size": probe["size"]}
+    again = s.probe_dump(url, prev_meta)
+    assert again["unchanged"]
+    assert again["size"] == probe["size"]
+    # validátory z iného URL sa neposielajú
+    assert not s.probe_dump(url, {**prev_meta, "url": url + "?iny"})["unchanged"]
+
+
+def test_probe_without_validators_is_never_unchanged(plain_dump, dump_server):
+    url = dump_server(plain_dump, no_validators=True)
+    assert not s.probe_dump(url, {"url": url, "etag": '"x"', "last_modified": "Thu, 01 Jan 2026 00:00:00 GMT"})["unchanged"]
+
+
+def test_parallel_ranges_survive_dropped_connections(plain_dump, dump_server, tmp_path):
+    url = dump_server(plain_dump, drop_every=2, drop_after=20_000)
+    dest = tmp_path / "dump.sql.gz"
+
+    meta = s.download_dump(url, dest, segments=4)
+
+    assert dest.read_bytes() == plain_dump.read_bytes()
+    assert meta["sha256"] == hashlib.sha256(plain_dump.read_bytes()).hexdigest()
+    assert not s._progress_path(dest).exists()
+
+
+def test_resume_continues_from_saved_progress(plain_dump, dump_server, tmp_path, monkeypatch):
+    size = plain_dump.stat().st_size
+    # každá odpoveď sa preruší po viac ako jednom 64 KB chunku → beh padne s rozpracovanými segmentmi
+    url = dump_server(plain_dump, drop_every=1, drop_after=70_000)
+    port = urlsplit(url).port
+    dest = tmp_path / "dump.sql.gz"
+    monkeypatch.setattr(s, "DOWNLOAD_RETRIES", 2)
+    probe = s.probe_dump(url)
+    with pytest.raises(RuntimeError):
+        s._download_ranges(url, dest, probe, 4, lambda n: None)
+
+    progress = json.loads(s._progress_path(dest).read_text(encoding="utf-8"))
+    done = sum(seg[2] for seg in progress["segments"])
+    assert 0 < done < size
+
+    # ďalší beh proti tomu istému (už funkčnému) serveru stiahne len zvyšok
+    url = dump_server(plain_dump, port=port)
+    fetched = []
+    s._download_ranges(url, dest, s.probe_dump(url), 4, fetched.append)
+
+    assert sum(fetched) == size - done
+    assert dest.read_bytes() == plain_dump.read_bytes()
+    assert not s._progress_path(dest).exists()
+
+
+def test_changed_dump_restarts_download(plain_dump, dump_server, tmp_path, monkeypatch):
+    url = dump_server(plain_dump, drop_every=1, drop_after=10_000)
+    port = urlsplit(url).port
+    dest = tmp_path / "dump.sql.gz"
+    monkeypatch.setattr(s, "DOWNLOAD_RETRIES", 1)
+    with pytest.raises(RuntimeError):
+        s._download_ranges(url, dest, s.probe_dump(url), 4, lambda n: None)
+
+    # iný obsah na tej istej URL → iný ETag, rozpracovaný progress sa zahodí
+    changed = tmp_path / "changed.sql.gz"
+    changed.write_bytes(plain_dump.read_bytes()[::-1])
+    url = dump_server(changed, port=port)
+    fetched = []
+    s._download_ranges(url, dest, s.probe_dump(url), 4, fetched.append)
+
+    assert sum(fetched) == changed.stat().st_size
+    assert dest.read_bytes() == changed.read_bytes()
+
+
+def test_single_connection_without_range_support(plain_dump, dump_server, tmp_path):
+    url = dump_server(plain_dump, no_range=True, drop_every=2, drop_after=20_000)
+    assert not s.probe_dump(url)["ranges"]
+    dest = tmp_path / "dump.sql.gz"
+
+    # probe je 1. odpoveď, 2. sa preruší → _download_single začne odznova
+    s.download_dump(url, dest, segments=4)
+
+    assert dest.read_bytes() == plain_dump.read_bytes()
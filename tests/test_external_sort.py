@@ -0,0 +1,30 @@
+"""External sort (RPO_SORT_MEMORY_MB) musí dať rovnaké party ako triedenie v pamäti."""
+import pytest
+
+import sync_rpo_full as s
+
+
+def _spilled_runs():
+    return [p for p in s.RUN_STATS.phases if p["name"] == "sort"][-1]["spilled_runs"]
+
+
+@pytest.mark.parametrize("buckets", [0, 4])
+def test_tiny_sort_memory_matches_in_memory(buckets, plain_dump, city_region_map, snapshot, monkeypatch):
+    in_memory = snapshot("memory", s.parse_dump_single_pass, plain_dump, city_region_map, join_buckets=buckets)
+
+    # 1 MB ≈ 1500 riadkov na run → pri 3000 organizáciách aspoň dva runy na disku
+    monkeypatch.setattr(s, "SORT_MEMORY_MB", 1)
+    spilled = snapshot("spilled", s.parse_dump_single_pass, plain_dump, city_region_map, join_buckets=buckets)
+
+    assert _spilled_runs() >= 2
+    assert spilled == in_memory
+
+
+def test_row_sorter_is_stable_like_list_sort():
+    rows = [(f"2020-01-{i % 7:02d}", [str(i)]) for i in range(5000)]
+    sorter = s.RowSorter(memory_mb=1)
+    for key, values in rows:
+        sorter.add(key, values)
+    assert len(sorter.runs) >= 2
+    expected = sorted(rows, key=lambda t: t[0], reverse=True)
+    assert list(sorter.sorted()) == expected
@@ -0,0 +1,31 @@
+"""Paralelné parsovanie (RPO_WORKERS, RPO_JOIN_BUCKETS) musí dať rovnaké party ako sériový beh."""
+import pytest
+
+import sync_rpo_full as s
+
+
+@pytest.mark.parametrize("workers, buckets", [(2, 0), (0, 4), (2, 4)])
+@pytest.mark.parametrize("dump", ["plain_dump", "orgs_first_dump"])
+def test_parallel_matches_serial(request, dump, workers, buckets, city_region_map, snapshot, monkeypatch):
+    dump_path = request.getfixturevalue(dump)
+    # viac dávok na tabuľku → čiastkové výsledky workerov sa naozaj zlučujú
+    monkeypatch.setattr(s, "PARSE_BATCH_LINES", 500)
+
+    serial = snapshot("serial", s.parse_dump_single_pass, dump_path, city_region_map, workers=0, join_buckets=0)
+    parallel = snapshot(
+        "parallel", s.parse_dump_single_pass, dump_path, city_region_map, workers=workers, join_buckets=buckets
+    )
+
+    assert len(serial) == 3
+    assert parallel == serial
+
+
+def test_single_pass_matches_per_table_parse(plain_dump, city_region_map, snapshot):
+    # pôvodná cesta: každá entry tabuľka zvlášť, potom organizácie
+    def legacy(dump_path):
+        maps = [s.parse_names_map(dump_path), s.parse_address_map(dump_path), s.parse_identifier_map(dump_path)]
+        s.parse_dump_to_slim_csv(dump_path, "", *maps, city_region_map)
+
+    assert snapshot("legacy", legacy, plain_dump) == snapshot(
+        "single", s.parse_dump_single_pass, plain_dump, city_region_map, workers=2
+    )
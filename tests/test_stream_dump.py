@@ -0,0 +1,50 @@
+"""Parsovanie dumpu počas sťahovania (RPO_STREAM) proti parsovaniu stiahnutého súboru."""
+import pytest
+
+import sync_rpo_full as s
+from conftest import ORGS
+from generate_dump import write_custom_dump
+
+
+def test_stream_matches_file(plain_dump, dump_server, city_region_map, snapshot):
+    url = dump_server(plain_dump)
+
+    from_file = snapshot("file", s.parse_dump_single_pass, plain_dump, city_region_map)
+    streamed = snapshot("stream", s.stream_dump_single_pass, url, city_region_map, workers=2)
+
+    assert len(from_file) == 3
+    assert streamed == from_file
+
+
+def test_stream_tee_saves_whole_dump(plain_dump, dump_server, city_region_map, snapshot, tmp_path):
+    url = dump_server(plain_dump)
+    tee = tmp_path / "tee.sql.gz"
+
+    streamed = snapshot("stream", s.stream_dump_single_pass, url, city_region_map, tee_path=tee)
+
+    # parsovanie končí po poslednej potrebnej sekcii, tee dočíta aj zvyšok dumpu
+    assert tee.read_bytes() == plain_dump.read_bytes()
+    assert not tee.with_name(tee.name + ".part").exists()
+    assert snapshot("file", s.parse_dump_single_pass, tee, city_region_map) == streamed
+
+
+def test_stream_stops_download_when_consumer_stops(plain_dump, dump_server):
+    lines = s.iter_remote_dump_lines(dump_server(plain_dump))
+    assert next(lines).startswith("--")
+    lines.close()
+    assert not [t for t in s.threading.enumerate() if t.name == "rpo-download"]
+
+
+def test_custom_dump_is_detected_before_streaming(dump_server, tmp_path):
+    custom = tmp_path / "rpo.dump"
+    write_custom_dump(custom, ORGS, seed=7)
+    url = dump_server(custom)
+
+    # main() podľa probe prepne na stiahnutie a parsovanie súboru
+    assert s.probe_dump(url)["custom"]
+    with pytest.raises(ValueError, match="custom"):
+        list(s.iter_remote_dump_lines(url))
+
+
+def test_probe_plain_dump_is_not_custom(plain_dump, dump_server):
+    assert not s.probe_dump(dump_server(plain_dump))["custom"]